@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import json
+import math
+import platform
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.csr import CSRGraph
+from routeopt.core.improve import improve_plan
+from routeopt.core.ingest import iter_segments_geojson
+from routeopt.core.matrix import build_matrix
+from routeopt.core.solver import build_engine, greedy_plan
+from routeopt.core.split import split_segments
+from routeopt.core.tasks import build_block_table
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon, haversine_miles_array
+
+LAYOUTS = ("grid", "radial")
+STAGES = ("ingest", "blocks", "matrix", "construct", "improve")
+ENGINES = ("euclidean", "csr")
+
+# USF CUTR, the default depot.
+CENTER = (28.0585626, -82.4163460)
+_MILES_PER_DEG_LAT = 69.0
+
+_LANES = (1, 2, 2, 3, 4, 4, 6)
+_SPEEDS = (25, 35, 45, 55, 65)
+_ONEWAY_SHARE = 0.2
+# Share of the network's streets that are input segments.
+_SERVED_SHARE = 0.8
+
+
+@dataclass
+class SyntheticNetwork:
+    """Road network as node lon/lat plus undirected edges (pairs of node positions)."""
+
+    x: np.ndarray
+    y: np.ndarray
+    edges: np.ndarray  # (m, 2) int64
+    served: np.ndarray  # edge rows that become input segments
+
+
+def _offsets_to_lonlat(dx: np.ndarray, dy: np.ndarray, center: tuple[float, float]):
+    lat0, lon0 = center
+    kx = _MILES_PER_DEG_LAT * math.cos(math.radians(lat0))
+    return lon0 + dx / kx, lat0 + dy / _MILES_PER_DEG_LAT
+
+
+def synthetic_network(
+    layout: str,
+    segments: int,
+    *,
+    seed: int = 0,
+    center: tuple[float, float] = CENTER,
+    spacing_miles: float = 0.5,
+) -> SyntheticNetwork:
+    """Reproducible street network with about `segments` served road pieces.
+
+    ``grid`` is a square street lattice; ``radial`` is concentric rings joined by
+    spokes around `center`. Streets not chosen as segments stay in the network
+    so the drive graph has detours, like a real one.
+    """
+
+    rng = np.random.default_rng(seed)
+    streets = segments / _SERVED_SHARE
+    if layout == "grid":
+        n = max(2, math.ceil(0.5 + math.sqrt(0.25 + streets / 2.0)))
+        i, j = np.divmod(np.arange(n * n), n)
+        dx, dy = (j - (n - 1) / 2) * spacing_miles, (i - (n - 1) / 2) * spacing_miles
+        node = np.arange(n * n).reshape(n, n)
+        horiz = np.column_stack((node[:, :-1].ravel(), node[:, 1:].ravel()))
+        vert = np.column_stack((node[:-1, :].ravel(), node[1:, :].ravel()))
+        edges = np.vstack((horiz, vert))
+    elif layout == "radial":
+        rings = max(1, math.ceil(math.sqrt(streets / 3.0)))
+        spokes = max(4, math.ceil(1.5 * rings))
+        r, s = np.divmod(np.arange(rings * spokes), spokes)
+        radius = (r + 1) * spacing_miles
+        angle = 2 * math.pi * s / spokes
+        dx = np.concatenate(([0.0], radius * np.cos(angle)))
+        dy = np.concatenate(([0.0], radius * np.sin(angle)))
+        node = 1 + np.arange(rings * spokes).reshape(rings, spokes)
+        arcs = np.column_stack((node.ravel(), np.roll(node, -1, axis=1).ravel()))
+        inner = np.column_stack((np.zeros(spokes, dtype=np.int64), node[0]))
+        outward = np.column_stack((node[:-1].ravel(), node[1:].ravel()))
+        edges = np.vstack((inner, outward, arcs))
+    else:
+        raise ValueError(f"Unknown layout: {layout}")
+
+    x, y = _offsets_to_lonlat(dx, dy, center)
+    served = np.sort(rng.choice(len(edges), size=min(segments, len(edges)), replace=False))
+    return SyntheticNetwork(x=x, y=y, edges=edges.astype(np.int64), served=served)
+
+
+def edge_miles(net: SyntheticNetwork) -> np.ndarray:
+    a, b = net.edges[:, 0], net.edges[:, 1]
+    return haversine_miles_array(net.y[a], net.x[a], net.y[b], net.x[b])
+
+
+def write_geojson(net: SyntheticNetwork, path: str | Path, *, seed: int = 0) -> Path:
+    """Write the served edges as a FeatureCollection with mixed lanes, speeds and oneways."""
+    rng = np.random.default_rng(seed + 1)
+    rows = net.served
+    lanes = rng.choice(_LANES, size=len(rows))
+    speed = rng.choice(_SPEEDS, size=len(rows))
+    oneway = rng.random(len(rows)) < _ONEWAY_SHARE
+    lanes = np.where(oneway, np.minimum(lanes, 3), lanes)
+    miles = edge_miles(net)[rows]
+
+    path = Path(path)
+    with path.open("w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for i, e in enumerate(rows.tolist()):
+            a, b = net.edges[e]
+            feat = {
+                "type": "Feature",
+                "properties": {
+                    "roadway_id": f"S{e}",
+                    "bmp": 0.0,
+                    "emp": round(float(miles[i]), 4),
+                    "total_lanes": int(lanes[i]),
+                    "speed_limit": int(speed[i]),
+                    "oneway": bool(oneway[i]),
+                },
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [
+                        [float(net.x[a]), float(net.y[a])],
+                        [float(net.x[b]), float(net.y[b])],
+                    ],
+                },
+            }
+            f.write(("," if i else "") + json.dumps(feat) + "\n")
+        f.write("]}\n")
+    return path
+
+
+def drive_graph(net: SyntheticNetwork, deadhead_speed_mph: float = 45.0) -> CSRGraph:
+    """Offline stand-in for the OSM drive graph: every street, both directions."""
+    miles = edge_miles(net)
+    rows = np.concatenate((net.edges[:, 0], net.edges[:, 1]))
+    cols = np.concatenate((net.edges[:, 1], net.edges[:, 0]))
+    return CSRGraph.from_edges(
+        np.arange(len(net.x)), net.x, net.y, rows, cols, np.tile(miles, 2), deadhead_speed_mph
+    )
+
+
+@dataclass
+class Case:
+    name: str
+    layout: str
+    segments: int
+    engine: str = "euclidean"
+    stages: list[str] = field(default_factory=lambda: list(STAGES))  # a prefix of STAGES
+    improve_seconds: float = 5.0
+    seed: int = 0
+
+
+def load_suite(path: str | Path) -> list[Case]:
+    cases = [Case(**c) for c in json.loads(Path(path).read_text(encoding="utf-8"))]
+    for c in cases:
+        if c.layout not in LAYOUTS or c.engine not in ENGINES:
+            raise ValueError(f"Bench case {c.name}: unknown layout or engine")
+        if list(c.stages) != list(STAGES[: len(c.stages)]):
+            # Each stage consumes the previous one's output.
+            raise ValueError(f"Bench case {c.name}: stages must be a prefix of {list(STAGES)}")
+    return cases
+
+
+class _Stage:
+    """Times a block of work, or (in a memory pass) records its tracemalloc peak instead."""
+
+    def __init__(self, out: dict, name: str, memory: bool):
+        self.out, self.name, self.memory = out, name, memory
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.start()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        rec = self.out.setdefault(self.name, {})
+        if self.memory:
+            rec["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+        else:
+            rec["seconds"] = round(time.perf_counter() - self.t0, 4)
+        return False
+
+
+def _quality(nights) -> dict:
+    return {
+        "nights": len(nights),
+        "deadhead_miles": round(sum(n.deadhead_miles for n in nights), 4),
+    }
+
+
+def _run_stages(case: Case, geojson: Path, constraints: Constraints, res: dict, memory: bool):
+    depot = LatLon(lat=CENTER[0], lon=CENTER[1])
+    stages = res["stages"]
+    segments = blocks = matrix = nights = None
+    for name in case.stages:
+        with _Stage(stages, name, memory):
+            if name == "ingest":
+                segments = list(iter_segments_geojson(geojson, default_oneway=False))
+            elif name == "blocks":
+                if segments is None:
+                    segments = iter_segments_geojson(geojson, default_oneway=False)
+                blocks = build_block_table(split_segments(segments, constraints))
+            elif name == "matrix":
+                engine = build_engine(constraints, depot, blocks)
+                matrix = build_matrix(engine, depot, blocks)
+            elif name == "construct":
+                nights = greedy_plan(constraints, blocks, matrix)
+            elif name == "improve":
+                nights, stats = improve_plan(
+                    constraints, nights, matrix, time_limit=case.improve_seconds
+                )
+        if memory:
+            continue
+        if name == "blocks":
+            res["blocks"] = len(blocks)
+        elif name == "matrix":
+            res["points"] = matrix.size
+        elif name == "construct":
+            res["quality"]["construct"] = _quality(nights)
+        elif name == "improve":
+            # A search cut off by its time limit depends on machine speed; only a
+            # converged one is comparable between runs.
+            converged = stats.elapsed_s < case.improve_seconds
+            res["quality"]["improve"] = {**_quality(nights), "converged": converged}
+
+
+def run_case(case: Case, workdir: str | Path, *, memory: bool = True) -> dict:
+    """Generate the case's network and run its stages; returns timings and plan quality.
+
+    Timings come from an untraced run; with `memory`, the stages run a second time
+    under tracemalloc for their peak allocations (tracing slows Python code several-fold).
+    """
+
+    workdir = Path(workdir)
+    net = synthetic_network(case.layout, case.segments, seed=case.seed)
+    geojson = write_geojson(net, workdir / f"{case.name}.geojson", seed=case.seed)
+    data: dict = {"depot": {"lat": CENTER[0], "lon": CENTER[1]}}
+    data.update(
+        limits={"max_hours_per_night": 4.0, "max_nights": 1_000_000},
+        routing_cache_path=None,
+        osm_cache_dir=None,
+        routing_engine=case.engine,
+    )
+    if case.engine == "csr":
+        graph = workdir / f"{case.name}.graph.npz"
+        drive_graph(net).save(graph)
+        data["osm_graph_path"] = str(graph)
+    constraints = Constraints.model_validate(data)
+
+    res: dict = {"segments": int(len(net.served)), "stages": {}, "quality": {}}
+    _run_stages(case, geojson, constraints, res, memory=False)
+    if memory:
+        _run_stages(case, geojson, constraints, res, memory=True)
+    return res
+
+
+def run_suite(
+    cases: list[Case], *, memory: bool = True, workdir: str | Path | None = None, log=print
+) -> dict:
+    out = {
+        "version": 1,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "memory": memory,
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="routeopt-bench-") as tmp:
+        for case in cases:
+            t0 = time.perf_counter()
+            res = out["cases"][case.name] = run_case(case, workdir or tmp, memory=memory)
+            q = res["quality"].get("improve") or res["quality"].get("construct")
+            quality = f", {q['nights']} nights, {q['deadhead_miles']:.1f} mi" if q else ""
+            log(f"{case.name}: {time.perf_counter() - t0:.2f}s{quality}")
+    return out
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    *,
+    time_tol: float = 0.25,
+    memory_tol: float = 0.25,
+    quality_tol: float = 0.01,
+    min_seconds: float = 0.05,
+    min_mb: float = 1.0,
+) -> list[str]:
+    """Regressions of `results` against `baseline`, as readable lines (empty = none).
+
+    Timings and peaks may grow by the given share (and at least `min_seconds` /
+    `min_mb`, to ignore noise on tiny cases); deadhead by `quality_tol`; nights
+    may not grow at all. Improve results are compared only when both searches
+    converged. Cases and stages missing from either side are skipped.
+    """
+
+    out = []
+    for name, cur in results.get("cases", {}).items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        for stage, rec in cur["stages"].items():
+            old = base["stages"].get(stage)
+            if old is None:
+                continue
+            s, s0 = rec["seconds"], old["seconds"]
+            if s > s0 * (1 + time_tol) and s - s0 > min_seconds:
+                out.append(f"{name}/{stage}: {s0:.3f}s -> {s:.3f}s")
+            m, m0 = rec.get("peak_mb"), old.get("peak_mb")
+            if m is not None and m0 is not None and m > m0 * (1 + memory_tol) and m - m0 > min_mb:
+                out.append(f"{name}/{stage}: peak {m0:.1f} MB -> {m:.1f} MB")
+        for stage, q in cur.get("quality", {}).items():
+            q0 = base.get("quality", {}).get(stage)
+            if q0 is None or not (q.get("converged", True) and q0.get("converged", True)):
+                continue
+            d, d0 = q["deadhead_miles"], q0["deadhead_miles"]
+            if d > d0 * (1 + quality_tol) + 1e-6:
+                out.append(f"{name}/{stage}: deadhead {d0:.1f} -> {d:.1f} mi")
+            if q["nights"] > q0["nights"]:
+                out.append(f"{name}/{stage}: nights {q0['nights']} -> {q['nights']}")
+    return out
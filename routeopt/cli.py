@@ -2,13 +2,278 @@ from __future__ import annotations
 
 import argparse
 import json
+from itertools import chain
 from pathlib import Path
 
+from routeopt.bench import compare, load_suite, run_suite
+from routeopt.core import instrument
 from routeopt.core.config import load_constraints
-from routeopt.core.ingest import load_segments_geojson
-from routeopt.core.output import routes_to_json
-from routeopt.core.solver import greedy_plan
-from routeopt.core.tasks import build_service_blocks
+from routeopt.core.decompose import METHODS, decomposed_plan
+from routeopt.core.geometry import write_geometry
+from routeopt.core.improve import improve_plan
+from routeopt.core.ingest import iter_segments_geojson
+from routeopt.core.instrument import PROFILERS, Profiler, code_profiler, profiling
+from routeopt.core.lns import lns_plan, read_checkpoint
+from routeopt.core.matrix import DistanceMatrix, build_matrix
+from routeopt.core.multistart import multi_start
+from routeopt.core.output import FORMATS, iter_routes, plan_meta, write_plan
+from routeopt.core.replan import (
+    load_previous,
+    parse_night_list,
+    pending_rows,
+    replan,
+    split_frozen,
+    with_frozen,
+)
+from routeopt.core.routing import RoutingEngine
+from routeopt.core.solver import build_engine, greedy_plan
+from routeopt.core.split import split_segments
+from routeopt.core.tasks import BlockTable, build_block_table
+from routeopt.server import serve
+from routeopt.sweep import format_table, parse_vary, result_rows, sweep, write_csv
+from routeopt.utils.geo import LatLon
+
+
+def _load_blocks(path: str, constraints) -> BlockTable:
+    # Stream features straight into blocks; the raw segments are never all held at once.
+    with instrument.span("ingest"):
+        segments = iter_segments_geojson(path, default_oneway=constraints.oneway.default)
+        segments = split_segments(segments, constraints)
+        blocks = build_block_table(segments)
+    instrument.count("ingest.blocks", len(blocks))
+    return blocks
+
+
+def _build_matrix(constraints, blocks: BlockTable) -> tuple[DistanceMatrix, RoutingEngine]:
+    depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
+    # Route every deadhead leg once; solver and writer share the matrix by index.
+    with instrument.span("matrix"):
+        with instrument.span("engine"):
+            engine = build_engine(constraints, depot, blocks)
+        with instrument.span("fill"):
+            matrix = build_matrix(engine, depot, blocks)
+        if hasattr(engine, "cache_stats"):
+            st = engine.cache_stats()
+            instrument.count("routing_cache.hits", st["hits"])
+            instrument.count("routing_cache.misses", st["misses"])
+            print(
+                f"routing cache: {st['hits']} hits ({st['hits_memory']} memory, "
+                f"{st['hits_disk']} disk), {st['misses']} misses"
+            )
+        if hasattr(engine, "close"):
+            engine.close()
+    instrument.count("matrix.points", matrix.size)
+    # Closed engines still snap and expose their graph; --geometry draws paths with them.
+    return matrix, engine
+
+
+def _improve(constraints, nights, matrix, time_limit: float, gap_tolerance: float = 0.0):
+    with instrument.span("improve"):
+        nights, stats = improve_plan(
+            constraints, nights, matrix, time_limit=time_limit, gap_tolerance=gap_tolerance
+        )
+    before = stats.deadhead_before
+    pct = 100.0 * stats.deadhead_removed / before if before else 0.0
+    print(
+        f"improve: deadhead {stats.deadhead_before:.2f} -> {stats.deadhead_after:.2f} mi "
+        f"(-{stats.deadhead_removed:.2f} mi, {pct:.1f}%), "
+        f"nights {stats.nights_before} -> {stats.nights_after}, "
+        f"{sum(stats.moves.values())} moves in {stats.elapsed_s:.1f}s"
+        + (" (within gap tolerance)" if stats.stopped_at_gap else "")
+    )
+    return nights
+
+
+def _write(args, constraints, nights, matrix, engine, frozen: list[dict] | None = None) -> None:
+    # Nights are written as they are built; only the meta totals take a pass up front.
+    frozen = frozen or []
+    with instrument.span("output"):
+        head = with_frozen({"meta": plan_meta(constraints, nights, matrix), "routes": []}, frozen)
+        routes = chain(
+            head["routes"], iter_routes(constraints, nights, matrix, start=len(frozen) + 1)
+        )
+        write_plan(args.output, head["meta"], routes, args.format)
+    if args.geometry:
+        with instrument.span("geometry"):
+            n = write_geometry(
+                args.geometry,
+                constraints,
+                nights,
+                matrix,
+                engine,
+                workers=getattr(args, "workers", 0),
+                start=len(frozen) + 1,
+            )
+        print(f"geometry: {n} features for {len(nights)} nights in {args.geometry}")
+
+
+def _bench(args) -> None:
+    cases = load_suite(args.suite)
+    if args.cases:
+        wanted = {c.strip() for c in args.cases.split(",") if c.strip()}
+        unknown = sorted(wanted - {c.name for c in cases})
+        if unknown:
+            raise ValueError(f"Unknown bench cases: {unknown}")
+        cases = [c for c in cases if c.name in wanted]
+    results = run_suite(cases, memory=not args.no_memory)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    baseline = Path(args.baseline)
+    if args.update_baseline:
+        baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote baseline: {baseline}")
+        return
+    if not baseline.exists():
+        print(f"No baseline at {baseline}; nothing to compare")
+        return
+    regressions = compare(results, json.loads(baseline.read_text(encoding="utf-8")))
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        raise SystemExit(1)
+    print(f"No regressions against {baseline}")
+
+
+def _sweep(args) -> None:
+    constraints = load_constraints(args.constraints)
+    stats = sweep(
+        args.input,
+        constraints,
+        [parse_vary(v) for v in args.vary],
+        workers=args.workers,
+        improve=args.improve,
+        time_limit=args.time_limit,
+        plans_dir=args.plans,
+    )
+    print(
+        f"sweep: {stats.scenarios} scenarios sharing {stats.block_tables} block table(s) and "
+        f"{stats.matrices} matrix(es), prepared in {stats.prepare_s:.1f}s, "
+        f"solved in {stats.solve_s:.1f}s"
+    )
+    rows = result_rows(stats)
+    print(format_table(rows))
+    if args.output:
+        write_csv(args.output, rows)
+        print(f"Wrote {args.output}")
+
+
+def _plan(args) -> None:
+    constraints = load_constraints(args.constraints)
+    blocks = _load_blocks(args.input, constraints)
+    if not len(blocks):
+        raise ValueError("GeoJSON contains no usable LineString features")
+    matrix, engine = _build_matrix(constraints, blocks)
+    with instrument.span("construct"):
+        if args.resume:
+            if not args.checkpoint:
+                raise ValueError("--resume requires --checkpoint")
+            nights = read_checkpoint(args.checkpoint, constraints, matrix)
+        elif args.decompose:
+            nights, clusters = decomposed_plan(
+                constraints,
+                matrix,
+                nights_per_cluster=args.cluster_nights,
+                method=args.decompose,
+                workers=args.workers,
+                seed=args.seed,
+                repair_time_limit=args.time_limit,
+            )
+            slowest = max(r.elapsed_s for r in clusters)
+            print(
+                f"decompose: {len(clusters)} clusters (slowest {slowest:.1f}s) -> "
+                f"{len(nights)} nights, {sum(n.deadhead_miles for n in nights):.2f} mi deadhead"
+            )
+        elif args.starts > 1:
+            nights, results = multi_start(
+                constraints, matrix, starts=args.starts, workers=args.workers, seed=args.seed
+            )
+            for r in results:
+                outcome = r.error or f"{r.nights} nights, {r.deadhead_miles:.2f} mi deadhead"
+                print(f"start {r.start} ({r.ordering}): {outcome} in {r.elapsed_s:.1f}s")
+        else:
+            nights = greedy_plan(constraints, blocks, matrix)
+    interrupted = False
+    if args.lns:
+        # Ctrl-C ends the search early; the best plan so far is still written out.
+        with instrument.span("lns"):
+            nights, lstats = lns_plan(
+                constraints,
+                nights,
+                matrix,
+                time_limit=args.time_limit,
+                max_iters=args.max_iters,
+                seed=args.seed,
+                checkpoint=args.checkpoint,
+                gap_tolerance=args.gap_tolerance,
+            )
+        interrupted = lstats.interrupted
+        print(
+            f"lns: deadhead {lstats.deadhead_before:.2f} -> {lstats.deadhead_after:.2f} mi, "
+            f"nights {lstats.nights_before} -> {lstats.nights_after}, "
+            f"{lstats.iterations} iterations ({lstats.accepted} accepted) "
+            f"in {lstats.elapsed_s:.1f}s"
+            + (" (interrupted)" if interrupted else "")
+            + (" (within gap tolerance)" if lstats.stopped_at_gap else "")
+        )
+    if args.improve and not interrupted:
+        nights = _improve(constraints, nights, matrix, args.time_limit, args.gap_tolerance)
+    _write(args, constraints, nights, matrix, engine)
+
+
+def _replan(args) -> None:
+    constraints = load_constraints(args.constraints)
+    frozen, routes = split_frozen(load_previous(args.previous), parse_night_list(args.frozen))
+    blocks = _load_blocks(args.input, constraints)
+    blocks = blocks.take(pending_rows(blocks, frozen))
+    matrix, engine = _build_matrix(constraints, blocks)
+    with instrument.span("construct"):
+        nights, st = replan(constraints, routes, matrix, reserved_nights=len(frozen))
+    print(
+        f"replan: {st.frozen_nights} frozen, {st.kept_nights} kept nights "
+        f"({st.kept_blocks} blocks unchanged), {st.changed_blocks} changed, "
+        f"{st.removed_blocks} removed, {st.inserted_blocks} inserted, "
+        f"{st.new_nights} new nights"
+    )
+    if args.improve:
+        nights = _improve(constraints, nights, matrix, args.time_limit)
+    _write(args, constraints, nights, matrix, engine, frozen)
+
+
+def _add_output_args(parser) -> None:
+    parser.add_argument("--output", default="routes.json", help="Output routes file")
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="json",
+        help="json (indented), compact JSON, ndjson (one night per line) or csv (one step per row)",
+    )
+    parser.add_argument(
+        "--geometry",
+        default=None,
+        metavar="DIR",
+        help="Also write each night's deadhead and loopback paths to DIR/night_NNN.geojson",
+    )
+
+
+def _add_profile_args(parser) -> None:
+    parser.add_argument(
+        "--profile", default=None, help="Write phase timings and event counters to this JSON file"
+    )
+    parser.add_argument(
+        "--profile-dump", default=None, help="Also profile the run with --profiler into this file"
+    )
+    parser.add_argument(
+        "--profiler",
+        choices=PROFILERS,
+        default="cprofile",
+        help="cprofile (pstats dump) or pyinstrument (HTML) for --profile-dump",
+    )
+    parser.add_argument(
+        "--progress",
+        type=float,
+        default=0.0,
+        help="Log solver progress every this many seconds (default: off)",
+    )
 
 
 def main(argv=None):
@@ -18,15 +283,150 @@ def main(argv=None):
     plan = sub.add_parser("plan", help="Generate nightly measurement routes")
     plan.add_argument("--input", required=True, help="Input GeoJSON file")
     plan.add_argument("--constraints", required=True, help="Constraints YAML")
-    plan.add_argument("--output", default="routes.json", help="Output routes JSON")
+    _add_output_args(plan)
+    plan.add_argument(
+        "--improve", action="store_true", help="Run local search after greedy construction"
+    )
+    plan.add_argument(
+        "--time-limit",
+        type=float,
+        default=30.0,
+        help="Seconds allowed for each of --lns and --improve (default: 30)",
+    )
+    plan.add_argument(
+        "--lns",
+        action="store_true",
+        help="Run ruin-and-recreate search (simulated annealing) after construction",
+    )
+    plan.add_argument(
+        "--max-iters", type=int, default=None, help="Stop --lns after this many iterations"
+    )
+    plan.add_argument(
+        "--gap-tolerance",
+        type=float,
+        default=0.0,
+        help="Stop --lns / --improve once deadhead is within this share of its lower bound "
+        "(e.g. 0.05; default: off)",
+    )
+    plan.add_argument(
+        "--checkpoint", default=None, help="Periodically save the best --lns plan to this file"
+    )
+    plan.add_argument(
+        "--resume",
+        action="store_true",
+        help="Start from the plan saved in --checkpoint instead of constructing one",
+    )
+
+    plan.add_argument(
+        "--starts",
+        type=int,
+        default=1,
+        help="Greedy constructions with different orderings; the least deadhead wins",
+    )
+    plan.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processes for --starts / --decompose (default: all CPUs)",
+    )
+    plan.add_argument("--seed", type=int, default=0, help="Seed for randomized --starts orderings")
+    plan.add_argument(
+        "--decompose",
+        choices=METHODS,
+        default=None,
+        help="Solve geographic clusters of blocks in parallel (--workers), then stitch them",
+    )
+    plan.add_argument(
+        "--cluster-nights",
+        type=int,
+        default=8,
+        help="Approximate nights of work per --decompose cluster (default: 8)",
+    )
+
+    _add_profile_args(plan)
+
+    rp = sub.add_parser("replan", help="Update a previous plan for a changed roadway network")
+    rp.add_argument("--previous", required=True, help="routes.json of the previous plan")
+    rp.add_argument("--input", required=True, help="New input GeoJSON file")
+    rp.add_argument("--constraints", required=True, help="Constraints YAML")
+    _add_output_args(rp)
+    rp.add_argument(
+        "--frozen",
+        default=None,
+        help="Nights already driven, e.g. 1-5,8; kept verbatim and their blocks count as done",
+    )
+    rp.add_argument(
+        "--improve", action="store_true", help="Lightly re-optimize the nights that are not frozen"
+    )
+    rp.add_argument(
+        "--time-limit", type=float, default=5.0, help="Seconds for --improve (default: 5)"
+    )
+    _add_profile_args(rp)
+
+    sw = sub.add_parser("sweep", help="Plan every combination of varied constraints and compare")
+    sw.add_argument("--input", required=True, help="Input GeoJSON file")
+    sw.add_argument("--constraints", required=True, help="Base constraints YAML")
+    sw.add_argument(
+        "--vary",
+        action="append",
+        required=True,
+        metavar="PATH=V1,V2",
+        help="Constraint to vary, e.g. limits.max_hours_per_night=3.5,4,4.5 (repeatable)",
+    )
+    sw.add_argument(
+        "--workers", type=int, default=0, help="Scenarios solved in parallel (default: all CPUs)"
+    )
+    sw.add_argument("--improve", action="store_true", help="Run local search on every scenario")
+    sw.add_argument(
+        "--time-limit", type=float, default=10.0, help="Seconds for --improve (default: 10)"
+    )
+    sw.add_argument("--output", default=None, help="Write the comparison table to this CSV file")
+    sw.add_argument(
+        "--plans", default=None, metavar="DIR", help="Also write each plan as DIR/scenario_NNN.json"
+    )
+
+    srv = sub.add_parser("serve", help="Run a local planning API with warm routing caches")
+    srv.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    srv.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    srv.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP")
+    srv.add_argument("--workers", type=int, default=0, help="Solve processes (default: all CPUs)")
+
+    bn = sub.add_parser("bench", help="Run the synthetic benchmark suite and check for regressions")
+    bn.add_argument("--suite", default="benchmarks/suite.json", help="Suite of bench cases")
+    bn.add_argument("--cases", default=None, help="Comma-separated case names (default: all)")
+    bn.add_argument(
+        "--baseline",
+        default="benchmarks/baseline.json",
+        help="Results to compare against; skipped when the file does not exist",
+    )
+    bn.add_argument("--output", default=None, help="Write this run's results to a JSON file")
+    bn.add_argument(
+        "--update-baseline", action="store_true", help="Overwrite --baseline with this run"
+    )
+    bn.add_argument(
+        "--no-memory", action="store_true", help="Skip the tracemalloc pass for peak memory"
+    )
 
     args = p.parse_args(argv)
 
-    if args.cmd == "plan":
-        constraints = load_constraints(args.constraints)
-        segments = load_segments_geojson(args.input, default_oneway=constraints.oneway.default)
-        blocks = build_service_blocks(segments)
-        nights = greedy_plan(constraints, blocks)
-        out = routes_to_json(constraints, nights)
-        Path(args.output).write_text(json.dumps(out, indent=2), encoding="utf-8")
+    if args.cmd == "bench":
+        _bench(args)
+        return
+
+    if args.cmd == "sweep":
+        _sweep(args)
+        return
+
+    if args.cmd == "serve":
+        serve(host=args.host, port=args.port, socket=args.socket, workers=args.workers)
         return
+
+    if args.cmd in ("plan", "replan"):
+        prof = Profiler(progress_every=args.progress) if args.profile or args.progress else None
+        with profiling(prof), code_profiler(args.profile_dump, args.profiler):
+            with instrument.span(args.cmd):
+                (_plan if args.cmd == "plan" else _replan)(args)
+        if args.profile:
+            report = prof.report()
+            Path(args.profile).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+            print(f"Wrote profile: {args.profile}")
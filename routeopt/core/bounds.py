@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.tasks import BlockTable
+from routeopt.models.constraints import Constraints
+
+# Columns of the (ends x starts) matrix slice scanned at a time; bounds memory stays O(n).
+_CHUNK = 1024
+
+
+@dataclass
+class PlanBounds:
+    """Lower bounds every feasible plan meets (so no plan can beat them)."""
+
+    nights: int
+    deadhead_miles: float
+    deadhead_hours: float
+
+
+def _between_blocks(matrix: DistanceMatrix, weight: str) -> tuple[np.ndarray, np.ndarray]:
+    """Per block: cheapest `weight` leg into its start from another block's end, and out of its end.
+
+    This scan over every block pair is the costly part of the bounds and does not
+    depend on the constraints, so it runs once per matrix (kept in ``matrix.cache``).
+    """
+    key = ("between_blocks", weight)
+    if key in matrix.cache:
+        return matrix.cache[key]
+    m = getattr(matrix, weight)
+    starts, ends = np.asarray(matrix.block_start), np.asarray(matrix.block_end)
+    n = len(starts)
+    into = np.full(n, np.inf)
+    out = np.full(n, np.inf)
+    for lo in range(0, n, _CHUNK):
+        hi = min(n, lo + _CHUNK)
+        # sub[j, c]: end of block j -> start of block lo + c; a block never follows itself.
+        sub = np.array(m[np.ix_(ends, starts[lo:hi])], dtype=np.float64)
+        sub[np.arange(lo, hi), np.arange(hi - lo)] = np.inf
+        into[lo:hi] = sub.min(axis=0)
+        np.minimum(out, sub.min(axis=1), out=out)
+    matrix.cache[key] = into, out
+    return into, out
+
+
+def _finite(a: np.ndarray) -> np.ndarray:
+    # Unreachable legs are reported by the solver; bound them by 0 rather than by inf.
+    return np.where(np.isfinite(a), a, 0.0)
+
+
+def _deadhead_by_nights(matrix: DistanceMatrix, weight: str) -> np.ndarray:
+    """``out[N - 1]``: a lower bound on the `weight` deadhead of any plan with exactly N nights.
+
+    Each block is entered by one leg: from the depot for the N first blocks of the
+    nights, from another block's end otherwise. Taking each block's cheapest such
+    leg, and the N blocks for which the depot costs least extra, bounds the legs
+    into blocks; the N legs back to the depot cost at least the N cheapest returns.
+    The same argument run on the legs out of blocks gives a second bound.
+    """
+
+    m = getattr(matrix, weight)
+    starts, ends = np.asarray(matrix.block_start), np.asarray(matrix.block_end)
+    leave = _finite(m[DEPOT, starts].astype(np.float64))
+    back = _finite(m[ends, DEPOT].astype(np.float64))
+    into, out = (_finite(a) for a in _between_blocks(matrix, weight))
+    by_in = into.sum() + np.cumsum(np.sort(leave - into)) + np.cumsum(np.sort(back))
+    by_out = out.sum() + np.cumsum(np.sort(back - out)) + np.cumsum(np.sort(leave))
+    return np.maximum(by_in, by_out)
+
+
+def _nights(
+    constraints: Constraints, matrix: DistanceMatrix, table: BlockTable
+) -> tuple[int, np.ndarray, np.ndarray]:
+    """Nights lower bound, the deadhead-hours bound per night count, and the counts that fit."""
+    n = len(table)
+    starts, ends = np.asarray(matrix.block_start), np.asarray(matrix.block_end)
+    work = np.asarray(table.service_hours + table.loopback_hours, dtype=np.float64)
+    cap = constraints.limits.max_hours_per_night
+
+    hours = _deadhead_by_nights(matrix, "time")
+    counts = np.arange(1, n + 1)
+    fits = counts[counts * cap >= work.sum() + hours - 1e-9]
+    # No count fits when a block cannot fit on its own; the solver reports which one.
+    nights = int(fits[0]) if len(fits) else n
+    round_trip = float(
+        _finite(matrix.time[DEPOT, starts]).min() + _finite(matrix.time[ends, DEPOT]).min()
+    )
+    # Any two of these blocks together already overrun a night.
+    nights = max(nights, min(n, int(np.count_nonzero(2 * work + round_trip > cap))))
+    return nights, hours, fits
+
+
+def nights_lower_bound(constraints: Constraints, matrix: DistanceMatrix, table: BlockTable) -> int:
+    """Fewest nights any feasible plan needs; `table` comes from ``service_table``."""
+    return _nights(constraints, matrix, table)[0] if len(table) else 0
+
+
+def lower_bounds(constraints: Constraints, matrix: DistanceMatrix, table: BlockTable) -> PlanBounds:
+    """Bounds on nights and deadhead from the matrix and `table` (from ``service_table``).
+
+    Deadhead is bounded per night count N by `_deadhead_by_nights`: an assignment
+    relaxation where every block keeps its cheapest way in (or out) and the nights'
+    depot legs go to the N blocks nearest the depot. Nights are bounded like bin
+    packing: N nights of ``max_hours_per_night`` must hold the service and loopback
+    hours plus that deadhead, and blocks too long to share a night need one each.
+    The deadhead bounds take the least value over the night counts that pass that
+    check (not over every count from the nights bound up).
+    Takes O(blocks) memory; the block-pair scan behind it is done once per matrix.
+    """
+
+    if not len(table):
+        return PlanBounds(0, 0.0, 0.0)
+    nights, hours, fits = _nights(constraints, matrix, table)
+    counts = fits[fits >= nights]
+    if not len(counts):  # no plan passes the check; keep the bound finite
+        counts = np.arange(nights, len(table) + 1)
+    miles = _deadhead_by_nights(matrix, "dist")
+    return PlanBounds(
+        nights=nights,
+        deadhead_miles=float(miles[counts - 1].min()),
+        deadhead_hours=float(hours[counts - 1].min()),
+    )
+
+
+def check_max_nights(constraints: Constraints, matrix: DistanceMatrix, table: BlockTable) -> None:
+    """Raise before any search when ``max_nights`` is provably too few."""
+    need = nights_lower_bound(constraints, matrix, table)
+    limit = constraints.limits.max_nights
+    if need > limit:
+        raise ValueError(
+            f"Cannot schedule within max_nights constraint: at least {need} nights are needed "
+            f"(max_nights={limit}, max_hours_per_night={constraints.limits.max_hours_per_night})"
+        )
+
+
+def gap(value: float, bound: float) -> float:
+    """Relative optimality gap of `value` over the lower `bound` (0 when it meets it)."""
+    if value <= 0.0 or value <= bound:
+        return 0.0
+    return (value - bound) / value
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+def array_digest(*arrays: np.ndarray, extra: object = None) -> str:
+    """Short SHA-1 of the arrays' bytes (and ``repr(extra)``); changes with any element."""
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a).tobytes())
+    if extra is not None:
+        h.update(repr(extra).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+@dataclass
+class CSRGraph:
+    """Directed road graph as CSR arrays (row = tail node, column = head node).
+
+    Parallel edges are collapsed to the shortest one. Node positions index
+    ``node_ids`` (original OSM ids, sorted) and the lon/lat arrays ``x``/``y``.
+    """
+
+    node_ids: np.ndarray  # int64, sorted
+    x: np.ndarray  # float64 lon
+    y: np.ndarray  # float64 lat
+    indptr: np.ndarray  # int64
+    indices: np.ndarray  # int32
+    length: np.ndarray  # float32 miles
+    time: np.ndarray  # float32 hours
+    speed_mph: float
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_networkx(cls, G, deadhead_speed_mph: float) -> CSRGraph:
+        node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+        pos = {int(n): i for i, n in enumerate(node_ids)}
+        x = np.array([float(G.nodes[n].get("x", 0.0)) for n in node_ids], dtype=np.float64)
+        y = np.array([float(G.nodes[n].get("y", 0.0)) for n in node_ids], dtype=np.float64)
+
+        m = G.number_of_edges()
+        rows = np.empty(m, dtype=np.int64)
+        cols = np.empty(m, dtype=np.int64)
+        miles = np.empty(m, dtype=np.float64)
+        for e, (u, v, data) in enumerate(G.edges(data=True)):
+            rows[e] = pos[int(u)]
+            cols[e] = pos[int(v)]
+            miles[e] = float(data.get("length", 0.0)) / 1609.344
+        return cls.from_edges(node_ids, x, y, rows, cols, miles, deadhead_speed_mph)
+
+    @classmethod
+    def from_edges(cls, node_ids, x, y, rows, cols, miles, deadhead_speed_mph: float) -> CSRGraph:
+        # Sort by (row, col, length) so the first of each (row, col) run is the shortest.
+        order = np.lexsort((miles, cols, rows))
+        rows, cols, miles = rows[order], cols[order], miles[order]
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows, cols, miles = rows[keep], cols[keep], miles[keep]
+
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.add.at(indptr, rows + 1, 1)
+        np.cumsum(indptr, out=indptr)
+        speed = max(1e-6, deadhead_speed_mph)
+        return cls(
+            node_ids=np.asarray(node_ids, dtype=np.int64),
+            x=np.asarray(x, dtype=np.float64),
+            y=np.asarray(y, dtype=np.float64),
+            indptr=indptr,
+            indices=cols.astype(np.int32),
+            length=miles.astype(np.float32),
+            time=(miles / speed).astype(np.float32),
+            speed_mph=speed,
+        )
+
+    def with_speed(self, deadhead_speed_mph: float) -> CSRGraph:
+        speed = max(1e-6, deadhead_speed_mph)
+        if speed == self.speed_mph:
+            return self
+        time = (self.length.astype(np.float64) / speed).astype(np.float32)
+        return CSRGraph(
+            self.node_ids, self.x, self.y, self.indptr, self.indices, self.length, time, speed
+        )
+
+    def position(self, node_id: int) -> int:
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i >= len(self.node_ids) or self.node_ids[i] != node_id:
+            raise KeyError(node_id)
+        return i
+
+    def matrix(self, weight: str = "length"):
+        sparse = _scipy_sparse()
+        data = self.length if weight == "length" else self.time
+        n = self.num_nodes
+        return sparse.csr_matrix((data, self.indices, self.indptr), shape=(n, n))
+
+    def fingerprint(self) -> str:
+        """Content hash of the nodes, edges, lengths, times and speed (keys the path cache)."""
+        return array_digest(
+            self.node_ids,
+            self.indptr,
+            self.indices,
+            self.length,
+            self.time,
+            extra=round(self.speed_mph, 6),
+        )
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                node_ids=self.node_ids,
+                x=self.x,
+                y=self.y,
+                indptr=self.indptr,
+                indices=self.indices,
+                length=self.length,
+                time=self.time,
+                speed_mph=np.float64(self.speed_mph),
+            )
+
+    @classmethod
+    def load(cls, path: str | Path) -> CSRGraph:
+        with np.load(Path(path).expanduser()) as z:
+            return cls(
+                node_ids=z["node_ids"],
+                x=z["x"],
+                y=z["y"],
+                indptr=z["indptr"],
+                indices=z["indices"],
+                length=z["length"],
+                time=z["time"],
+                speed_mph=float(z["speed_mph"]),
+            )
+
+
+def _scipy_sparse():
+    try:
+        return importlib.import_module("scipy.sparse")
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError(
+            "CSR routing requires scipy. Install with: pip install -e '.[osm]'"
+        ) from e
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from routeopt.core.bounds import check_max_nights
+from routeopt.core.improve import improve_plan, total_deadhead_miles
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.solver import Construction, NightRoute, greedy_plan, night_from_ids
+from routeopt.core.spatial import build_neighbors, project_miles
+from routeopt.models.constraints import Constraints
+
+METHODS = ("kmeans", "sweep")
+
+# Share of a night expected to go to service; the rest is deadhead.
+_SERVICE_SHARE = 0.75
+# Points x centroids handled per k-means distance block.
+_KMEANS_CHUNK = 1 << 22
+
+
+@dataclass
+class ClusterResult:
+    cluster: int
+    blocks: int
+    nights: int
+    deadhead_miles: float
+    elapsed_s: float
+
+
+def _block_xy(matrix: DistanceMatrix) -> tuple[np.ndarray, np.ndarray]:
+    """Projected block midpoints (miles), origin at the depot."""
+    lat = np.fromiter((p.lat for p in matrix.points), dtype=np.float64)
+    lon = np.fromiter((p.lon for p in matrix.points), dtype=np.float64)
+    x, y = project_miles(lat, lon, float(lat[DEPOT]))
+    x, y = x - x[DEPOT], y - y[DEPOT]
+    s, e = matrix.block_start, matrix.block_end
+    return (x[s] + x[e]) / 2.0, (y[s] + y[e]) / 2.0
+
+
+def _kmeans(xy: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator, iters: int = 25):
+    """Weighted Lloyd's k-means with k-means++ seeding; returns a label per point."""
+    n = len(xy)
+    k = min(k, n)
+    centers = np.empty((k, 2))
+    centers[0] = xy[rng.integers(n)]
+    d2 = ((xy - centers[0]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        p = d2 * w
+        centers[c] = xy[rng.choice(n, p=p / p.sum()) if p.sum() > 0 else rng.integers(n)]
+        d2 = np.minimum(d2, ((xy - centers[c]) ** 2).sum(axis=1))
+
+    labels = np.zeros(n, dtype=np.int64)
+    step = max(1, _KMEANS_CHUNK // k)
+    for _ in range(iters):
+        for lo in range(0, n, step):
+            part = xy[lo : lo + step]
+            dd = ((part[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+            labels[lo : lo + step] = dd.argmin(axis=1)
+        wsum = np.bincount(labels, weights=w, minlength=k)
+        new = np.column_stack(
+            (
+                np.bincount(labels, weights=w * xy[:, 0], minlength=k),
+                np.bincount(labels, weights=w * xy[:, 1], minlength=k),
+            )
+        )
+        live = wsum > 0
+        new[live] /= wsum[live, None]
+        new[~live] = centers[~live]
+        if np.allclose(new, centers):
+            break
+        centers = new
+    return labels
+
+
+def _sweep(xy: np.ndarray, w: np.ndarray, target: float) -> np.ndarray:
+    """Consecutive wedges around the depot holding about `target` work each."""
+    order = np.argsort(np.arctan2(xy[:, 1], xy[:, 0]), kind="stable")
+    cum = np.cumsum(w[order])
+    labels = np.empty(len(xy), dtype=np.int64)
+    labels[order] = ((cum - w[order]) // target).astype(np.int64)
+    return labels
+
+
+def cluster_blocks(
+    constraints: Constraints,
+    matrix: DistanceMatrix,
+    *,
+    nights_per_cluster: int = 8,
+    method: str = "kmeans",
+    seed: int = 0,
+) -> list[np.ndarray]:
+    """Partition blocks into geographic clusters of roughly `nights_per_cluster` nights of work.
+
+    Work is each block's service + loopback hours; a night is assumed to hold
+    max_hours_per_night x ``_SERVICE_SHARE`` of it. k-means clusters that still come
+    out more than twice the target are clustered again on their own.
+    """
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown cluster method: {method}")
+    svc_h = np.asarray(Construction(constraints, matrix).svc_h, dtype=np.float64)
+    n = len(svc_h)
+    if n == 0:
+        return []
+    target = max(1e-9, nights_per_cluster * constraints.limits.max_hours_per_night * _SERVICE_SHARE)
+    k = max(1, math.ceil(float(svc_h.sum()) / target))
+    xy = np.column_stack(_block_xy(matrix))
+    w = np.maximum(svc_h, 1e-6)
+
+    if method == "sweep":
+        labels = _sweep(xy, w, target)
+        groups = [np.flatnonzero(labels == c) for c in range(int(labels.max()) + 1)]
+        return [g for g in groups if len(g)]
+
+    rng = np.random.default_rng(seed)
+    labels = _kmeans(xy, w, k, rng)
+    out = []
+    for c in range(k):
+        rows = np.flatnonzero(labels == c)
+        work = float(w[rows].sum())
+        if len(rows) > 1 and work > 2 * target:
+            sub = _kmeans(xy[rows], w[rows], math.ceil(work / target), rng)
+            out.extend(rows[sub == s] for s in range(int(sub.max()) + 1))
+        else:
+            out.append(rows)
+    return [rows for rows in out if len(rows)]
+
+
+def _solve_cluster(args) -> tuple[list[list[int]], ClusterResult]:
+    constraints, sub, c, time_limit = args
+    t0 = time.perf_counter()
+    nights = greedy_plan(constraints, sub.blocks, sub)
+    if time_limit > 0:
+        nights, _ = improve_plan(constraints, nights, sub, time_limit=time_limit)
+    res = ClusterResult(
+        cluster=c,
+        blocks=len(sub.block_start),
+        nights=len(nights),
+        deadhead_miles=sum(n.deadhead_miles for n in nights),
+        elapsed_s=time.perf_counter() - t0,
+    )
+    return [n.ids for n in nights], res
+
+
+def merge_light_nights(
+    constraints: Constraints, nights: list[NightRoute], matrix: DistanceMatrix
+) -> int:
+    """Fold nights under half full into others when all their blocks fit without more deadhead.
+
+    Each cluster usually ends with one partly filled night; after stitching these
+    are often next to each other. Returns the number of nights removed.
+    """
+
+    build = Construction(
+        constraints,
+        matrix,
+        build_neighbors(matrix, constraints.search.neighbors_k, constraints.search.exhaustive),
+    )
+    light = 0.5 * build.max_h
+    failed: set[tuple[int, ...]] = set()
+    removed = 0
+    while len(nights) > 1:
+        cand = [n for n in nights if n.hours <= light and tuple(n.ids) not in failed]
+        if not cand:
+            break
+        night = min(cand, key=lambda n: n.hours)
+        rest = [replace(n, ids=list(n.ids)) for n in nights if n is not night]
+        build.load(rest)
+        for k in sorted(night.ids, key=build.svc_h.__getitem__, reverse=True):
+            opts = build.options(k)
+            if not opts:
+                break
+            build.place(k, opts[0])
+        else:
+            if total_deadhead_miles(rest) <= total_deadhead_miles(nights) + 1e-9:
+                nights[:] = rest
+                removed += 1
+                continue
+        failed.add(tuple(night.ids))
+    return removed
+
+
+def decomposed_plan(
+    constraints: Constraints,
+    matrix: DistanceMatrix,
+    *,
+    nights_per_cluster: int = 8,
+    method: str = "kmeans",
+    workers: int = 0,
+    seed: int = 0,
+    cluster_time_limit: float = 5.0,
+    repair_time_limit: float = 30.0,
+) -> tuple[list[NightRoute], list[ClusterResult]]:
+    """Cluster first, route second: solve each cluster on its own, then stitch and repair.
+
+    Clusters are solved in parallel (greedy construction, then local search for
+    up to `cluster_time_limit` seconds) on sub-matrices sliced from `matrix`. The
+    stitched plan is repaired by folding light nights into others and by the
+    local search's relocate/swap moves, which move blocks across cluster borders.
+    """
+
+    whole = Construction(constraints, matrix)
+    check_max_nights(constraints, matrix, whole.table)
+    clusters = cluster_blocks(
+        constraints, matrix, nights_per_cluster=nights_per_cluster, method=method, seed=seed
+    )
+    jobs = [
+        (constraints, matrix.submatrix(rows), c, cluster_time_limit)
+        for c, rows in enumerate(clusters)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        solved = [_solve_cluster(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solved = list(pool.map(_solve_cluster, jobs))
+
+    # Sub-matrix entries equal the full matrix's, so night totals are unchanged by the mapping.
+    svc_h = whole.svc_h
+    nights = [
+        night_from_ids(matrix, svc_h, rows[ids].tolist())
+        for rows, (night_ids, _) in zip(clusters, solved)
+        for ids in night_ids
+    ]
+
+    merge_light_nights(constraints, nights, matrix)
+    if repair_time_limit > 0:
+        nights, _ = improve_plan(constraints, nights, matrix, time_limit=repair_time_limit)
+    if len(nights) > constraints.limits.max_nights:
+        raise ValueError("Cannot schedule within max_nights constraint")
+    return nights, [res for _, res in solved]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# adjacency: node -> [(neighbor, miles, hours), ...] with parallel edges collapsed
+Adjacency = dict[int, list[tuple[int, float, float]]]
+
+_INF = float("inf")
+# Read-only adjacency installed once per worker process.
+_WORKER_ADJ: Adjacency | None = None
+
+
+def build_adjacency(G, *, dist_attr: str = "_dist_miles", time_attr: str = "_time_h") -> Adjacency:
+    """Compact adjacency of a (Multi)DiGraph keeping the shortest of any parallel edges."""
+    best: dict[tuple[int, int], tuple[float, float]] = {}
+    for u, v, data in G.edges(data=True):
+        d = float(data.get(dist_attr, 0.0))
+        cur = best.get((u, v))
+        if cur is None or d < cur[0]:
+            best[(u, v)] = (d, float(data.get(time_attr, 0.0)))
+    adj: Adjacency = {}
+    for (u, v), (d, t) in best.items():
+        adj.setdefault(u, []).append((v, d, t))
+    return adj
+
+
+def one_to_many(
+    adj: Adjacency, source: int, targets: set[int]
+) -> dict[int, tuple[float, float]]:
+    """Single-source Dijkstra on distance, accumulating time along the same paths.
+
+    Stops once every target is settled; unreachable targets are absent.
+    """
+
+    dist = {source: 0.0}
+    time = {source: 0.0}
+    remaining = set(targets)
+    out: dict[int, tuple[float, float]] = {}
+    heap = [(0.0, source)]
+    settled: set[int] = set()
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u in remaining:
+            remaining.discard(u)
+            out[u] = (d, time[u])
+        tu = time[u]
+        for v, w, t in adj.get(u, ()):
+            nd = d + w
+            if nd < dist.get(v, _INF):
+                dist[v] = nd
+                time[v] = tu + t
+                heapq.heappush(heap, (nd, v))
+    return out
+
+
+def _init_worker(adj: Adjacency) -> None:
+    global _WORKER_ADJ
+    _WORKER_ADJ = adj
+
+
+def _rows_worker(args: tuple[list[int], list[int]]) -> list[tuple[int, dict]]:
+    sources, targets = args
+    tset = set(targets)
+    return [(s, one_to_many(_WORKER_ADJ, s, tset)) for s in sources]
+
+
+def many_to_many(
+    adj: Adjacency,
+    sources: list[int],
+    targets: list[int],
+    *,
+    workers: int = 0,
+    chunk: int = 16,
+) -> dict[int, dict[int, tuple[float, float]]]:
+    """Run `one_to_many` for every source, spread over a process pool when worthwhile.
+
+    ``workers=0`` uses every CPU; 1 (or few sources) stays in-process.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(sources) < 2 * chunk:
+        tset = set(targets)
+        return {s: one_to_many(adj, s, tset) for s in sources}
+
+    batches = [(sources[i : i + chunk], targets) for i in range(0, len(sources), chunk)]
+    rows: dict[int, dict[int, tuple[float, float]]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(adj,)
+    ) as pool:
+        for part in pool.map(_rows_worker, batches):
+            rows.update(part)
+    return rows
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import heapq
+import importlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.routing import RoutingEngine
+from routeopt.core.solver import NightRoute
+from routeopt.core.tasks import DIRECTIONS
+from routeopt.models.constraints import Constraints
+
+# Shared, read-only state of a geometry export, installed once per worker process.
+_CTX: dict | None = None
+
+
+@dataclass
+class Leg:
+    kind: str  # deadhead | loopback | service_block
+    step: int  # index of the matching step in routes.json (loopbacks: their block's step)
+    a: int  # matrix point indices
+    b: int
+    source: str
+    target: str
+    miles: float
+    repeats: int = 1  # loopbacks are driven once per extra pass
+
+
+def night_legs(constraints: Constraints, matrix: DistanceMatrix, ids: list[int]) -> list[Leg]:
+    """Every deadhead, loopback and service leg of a night, in driving order."""
+    table = matrix.blocks
+    starts, ends = matrix.block_start, matrix.block_end
+    routed_loops = constraints.loopback.mode == "routing"
+
+    def label(k: int, end: str) -> str:
+        return f"{table.roadway_id(k)}:{DIRECTIONS[table.direction[k]]}:{end}"
+
+    def deadhead(step: int, a: int, b: int, source: str, target: str) -> Leg:
+        return Leg("deadhead", step, a, b, source, target, float(matrix.dist[a, b]))
+
+    legs: list[Leg] = []
+    if not ids:
+        return legs
+    legs.append(deadhead(1, DEPOT, starts[ids[0]], "Depot", label(ids[0], "start")))
+    for i, k in enumerate(ids):
+        step = 2 * i + 2
+        s, e = int(starts[k]), int(ends[k])
+        extra = int(table.passes[k]) - 1
+        if routed_loops and extra > 0:
+            # Pass, loop back, pass again: the service line is drawn once, the loop once.
+            miles = float(matrix.dist[e, s])
+            legs.append(
+                Leg("loopback", step, e, s, label(k, "end"), label(k, "start"), miles, extra)
+            )
+        miles = float(table.service_miles[k])
+        legs.append(Leg("service_block", step, s, e, label(k, "start"), label(k, "end"), miles))
+        if i + 1 < len(ids):
+            nxt = ids[i + 1]
+            legs.append(deadhead(step + 1, e, starts[nxt], label(k, "end"), label(nxt, "start")))
+    legs.append(deadhead(2 * len(ids) + 1, ends[ids[-1]], DEPOT, label(ids[-1], "end"), "Depot"))
+    return legs
+
+
+def _search(source: int, targets: set[int], limit: float) -> dict[int, int]:
+    """Dijkstra from `source` until every target is settled (or `limit` miles); parent links."""
+    indptr, indices, length = _CTX["indptr"], _CTX["indices"], _CTX["length"]
+    dist = {source: 0.0}
+    parent = {source: -1}
+    remaining = set(targets)
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > limit:
+            break
+        remaining.discard(u)
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + length[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = u
+                heapq.heappush(heap, (nd, v))
+    return parent
+
+
+def _chain(parent, node: int, stop: int) -> list[int] | None:
+    """Nodes from `node` following `parent` links to `stop` (inclusive), or None if cut off."""
+    out = [node]
+    while node != stop:
+        node = parent[node] if isinstance(parent, dict) else int(parent[node])
+        if node < 0:
+            return None
+        out.append(node)
+    return out
+
+
+def _leg_nodes(legs: list[Leg]) -> list[list[int] | None]:
+    """Drive-graph node path of every deadhead/loopback leg (None for service or unrouted)."""
+    node = _CTX["node"]
+    out: list[list[int] | None] = [None] * len(legs)
+    # Legs are grouped by source node so each search serves all of that node's targets.
+    by_source: dict[int, list[int]] = {}
+    for i, leg in enumerate(legs):
+        if leg.kind == "service_block" or not math.isfinite(leg.miles):
+            continue
+        if leg.a == DEPOT:
+            path = _chain(_CTX["from_depot"], int(node[leg.b]), int(node[DEPOT]))
+            out[i] = path[::-1] if path else None
+        elif leg.b == DEPOT:
+            out[i] = _chain(_CTX["to_depot"], int(node[leg.a]), int(node[DEPOT]))
+        else:
+            by_source.setdefault(int(node[leg.a]), []).append(i)
+    for src, rows in by_source.items():
+        targets = {int(node[legs[i].b]) for i in rows}
+        parent = _search(src, targets, max(legs[i].miles for i in rows) * (1 + 1e-6) + 1e-9)
+        for i in rows:
+            dst = int(node[legs[i].b])
+            path = _chain(parent, dst, src) if dst in parent else None
+            out[i] = path[::-1] if path else None
+    return out
+
+
+def _feature(night: int, leg: Leg, nodes: list[int] | None) -> dict:
+    lon, lat = _CTX["lon"], _CTX["lat"]
+    coords = [(lon[leg.a], lat[leg.a])]
+    if nodes is not None:
+        gx, gy = _CTX["x"], _CTX["y"]
+        coords.extend((gx[n], gy[n]) for n in nodes)
+    coords.append((lon[leg.b], lat[leg.b]))
+    props = {
+        "night_index": night,
+        "step": leg.step,
+        "type": leg.kind,
+        "from": leg.source,
+        "to": leg.target,
+        "distance_miles": round(leg.miles, 4),
+    }
+    if leg.kind == "loopback":
+        props["repeats"] = leg.repeats
+    if leg.kind != "service_block":
+        props["routed"] = nodes is not None or _CTX["x"] is None
+    return {
+        "type": "Feature",
+        "properties": props,
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[round(float(x), 7), round(float(y), 7)] for x, y in coords],
+        },
+    }
+
+
+def _write_nights(jobs: list[tuple[int, list[Leg]]]) -> int:
+    """Write one FeatureCollection file per night; returns the number of features."""
+    written = 0
+    for night, legs in jobs:
+        paths = _leg_nodes(legs) if _CTX["x"] is not None else [None] * len(legs)
+        features = [_feature(night, leg, nodes) for leg, nodes in zip(legs, paths)]
+        path = Path(_CTX["out_dir"]) / f"night_{night:03d}.geojson"
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f)
+        written += len(features)
+    return written
+
+
+def _init_worker(ctx: dict) -> None:
+    global _CTX
+    if ctx["x"] is not None:
+        # Plain sequences index to Python numbers, which keeps the search loop fast.
+        for key in ("indptr", "indices", "length"):
+            ctx[key] = memoryview(np.ascontiguousarray(ctx[key]))
+    _CTX = ctx
+
+
+def write_geometry(
+    out_dir: str | Path,
+    constraints: Constraints,
+    nights: list[NightRoute],
+    matrix: DistanceMatrix,
+    engine: RoutingEngine,
+    *,
+    workers: int = 0,
+    start: int = 1,
+) -> int:
+    """Write ``night_NNN.geojson`` (one FeatureCollection per night) into `out_dir`.
+
+    Each night's deadhead and loopback legs are drawn along the drive graph. The
+    paths come from searches with predecessor links: a full one from the depot in
+    each direction covers every night's first and last leg, and a search per other
+    leg source stops once that source's targets are settled. Service blocks are
+    straight lines between their endpoints. Engines without a drive graph
+    (``euclidean``) draw every leg straight. Nights are spread over `workers`
+    processes (0: every CPU). Returns the number of features written.
+    """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    lat = np.fromiter((p.lat for p in matrix.points), dtype=np.float64, count=matrix.size)
+    lon = np.fromiter((p.lon for p in matrix.points), dtype=np.float64, count=matrix.size)
+    ctx: dict = {"out_dir": str(out_dir), "lat": lat.tolist(), "lon": lon.tolist(), "x": None}
+
+    path_graph = getattr(engine, "path_graph", None)
+    if path_graph is not None:
+        # Snap each endpoint with the azimuth of its block, as the matrix fill did.
+        headings: list[float | None] = [None] * matrix.size
+        az = matrix.blocks.azimuth_deg.tolist()
+        for k, (s, e) in enumerate(zip(matrix.block_start.tolist(), matrix.block_end.tolist())):
+            headings[s] = headings[e] = az[k]
+        graph, node = path_graph(matrix.points, headings)
+        cs = importlib.import_module("scipy.sparse.csgraph")
+        W = graph.matrix("length")
+        depot = int(node[DEPOT])
+        _, from_depot = cs.dijkstra(W, indices=depot, return_predecessors=True)
+        _, to_depot = cs.dijkstra(W.T.tocsr(), indices=depot, return_predecessors=True)
+        ctx.update(
+            x=graph.x,
+            y=graph.y,
+            indptr=graph.indptr,
+            indices=graph.indices,
+            length=graph.length,
+            node=np.asarray(node, dtype=np.int64),
+            from_depot=from_depot,
+            to_depot=to_depot,
+        )
+
+    jobs = [
+        (i, night_legs(constraints, matrix, night.ids))
+        for i, night in enumerate(nights, start=start)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        prev = _CTX
+        _init_worker(dict(ctx))
+        try:
+            return _write_nights(jobs)
+        finally:
+            globals()["_CTX"] = prev
+    chunks = [jobs[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(ctx,)
+    ) as pool:
+        return sum(pool.map(_write_nights, chunks))
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+_INDEX = "index.json"
+
+
+@dataclass(frozen=True)
+class BBox:
+    north: float
+    south: float
+    east: float
+    west: float
+
+    def covers(self, other: BBox) -> bool:
+        return (
+            self.north >= other.north
+            and self.south <= other.south
+            and self.east >= other.east
+            and self.west <= other.west
+        )
+
+    @property
+    def area(self) -> float:
+        return (self.north - self.south) * (self.east - self.west)
+
+
+def graph_cache_key(bbox: BBox, network_type: str) -> str:
+    raw = json.dumps([network_type, *(round(v, 6) for v in asdict(bbox).values())])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class GraphCache:
+    """Directory of pickled, pre-processed OSM graphs keyed by bbox and network type.
+
+    A lookup succeeds when any cached graph of the same network type covers the
+    requested bbox; the smallest such graph is returned.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root).expanduser()
+
+    def _read_index(self) -> list[dict]:
+        p = self.root / _INDEX
+        if not p.exists():
+            return []
+        return json.loads(p.read_text(encoding="utf-8"))
+
+    def _write_index(self, entries: list[dict]) -> None:
+        tmp = self.root / f"{_INDEX}.tmp"
+        tmp.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+        os.replace(tmp, self.root / _INDEX)
+
+    def find(self, bbox: BBox, network_type: str, suffix: str = ".pkl") -> Path | None:
+        best = None
+        for e in self._read_index():
+            cached = BBox(**e["bbox"])
+            path = self.root / e["file"]
+            if e["network_type"] != network_type or path.suffix != suffix:
+                continue
+            if not cached.covers(bbox) or not path.exists():
+                continue
+            if best is None or cached.area < best[0]:
+                best = (cached.area, path)
+        return best[1] if best else None
+
+    def store(self, graph, bbox: BBox, network_type: str) -> Path:
+        def _pickle(path: Path) -> None:
+            with path.open("wb") as f:
+                pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return self.store_with(_pickle, bbox, network_type, ".pkl")
+
+    def store_with(
+        self, write: Callable[[Path], None], bbox: BBox, network_type: str, suffix: str
+    ) -> Path:
+        """Register a file produced by `write(path)` under this bbox/network type."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"{network_type}-{graph_cache_key(bbox, network_type)}{suffix}"
+        tmp = self.root / f"{name}.tmp"
+        write(tmp)
+        os.replace(tmp, self.root / name)
+
+        entries = [e for e in self._read_index() if e["file"] != name]
+        entries.append({"file": name, "network_type": network_type, "bbox": asdict(bbox)})
+        self._write_index(entries)
+        return self.root / name
+
+
+def load_graph_file(path: str | Path, ox=None):
+    """Load a graph saved as a pickle (.pkl/.pickle/.gpickle) or GraphML (needs osmnx)."""
+    p = Path(path).expanduser()
+    if not p.exists():
+        raise ValueError(f"OSM graph file not found: {p}")
+    if p.suffix.lower() in (".pkl", ".pickle", ".gpickle"):
+        with p.open("rb") as f:
+            return pickle.load(f)
+    if p.suffix.lower() == ".graphml":
+        if ox is None:
+            raise RuntimeError(
+                "Loading GraphML requires osmnx. Install with: pip install -e '.[osm]'"
+            )
+        return ox.load_graphml(p)
+    raise ValueError(f"Unsupported OSM graph file type: {p.suffix} (use .graphml or .pkl)")
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+from routeopt.core import instrument
+from routeopt.core.bounds import gap, lower_bounds
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.solver import NightRoute, block_service_hours, service_table
+from routeopt.core.spatial import BlockNeighbors, build_neighbors
+from routeopt.models.constraints import Constraints
+
+_EPS = 1e-9
+
+
+@dataclass
+class ImproveStats:
+    deadhead_before: float
+    deadhead_after: float
+    nights_before: int
+    nights_after: int
+    moves: dict[str, int] = field(default_factory=dict)
+    passes: int = 0
+    elapsed_s: float = 0.0
+    stopped_at_gap: bool = False  # deadhead came within gap_tolerance of its lower bound
+
+    @property
+    def deadhead_removed(self) -> float:
+        return self.deadhead_before - self.deadhead_after
+
+
+class _Search:
+    """First-improvement local search over a list of nights.
+
+    Every move is scored from the cached night totals plus the handful of legs it
+    touches, then checked against max_hours_per_night before it is applied.
+    """
+
+    def __init__(
+        self,
+        constraints: Constraints,
+        nights: list[NightRoute],
+        matrix: DistanceMatrix,
+        deadline: float,
+        neighbors: BlockNeighbors | None = None,
+    ):
+        self.nights = nights
+        self.neighbors = neighbors
+        self.night_of = {k: night for night in nights for k in night.ids}
+        self.max_h = constraints.limits.max_hours_per_night
+        self.deadline = deadline
+        self.starts = matrix.block_start.tolist()
+        self.ends = matrix.block_end.tolist()
+        self.D = matrix.dist
+        self.T = matrix.time
+        self.svc = block_service_hours(constraints, matrix)
+        self.moves = {"two_opt": 0, "or_opt": 0, "relocate": 0, "swap": 0}
+
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+    # Point indices around position `pos` of a night.
+    def _prev(self, ids: list[int], pos: int) -> int:
+        return self.ends[ids[pos - 1]] if pos > 0 else DEPOT
+
+    def _next(self, ids: list[int], pos: int) -> int:
+        return self.starts[ids[pos]] if pos < len(ids) else DEPOT
+
+    def _replace_cost(self, p: int, q: int, k: int) -> tuple[float, float]:
+        """Legs p->k.start + k.end->q."""
+        s, e = self.starts[k], self.ends[k]
+        return (
+            float(self.D[p, s] + self.D[e, q]),
+            float(self.T[p, s] + self.T[e, q]),
+        )
+
+    def two_opt(self, night: NightRoute) -> int:
+        """Reverse the visiting order of a run of blocks within one night."""
+        applied = 0
+        ids = night.ids
+        n = len(ids)
+        D, T, starts, ends = self.D, self.T, self.starts, self.ends
+        i = 0
+        while i < n - 1:
+            p = self._prev(ids, i)
+            old_in_mi = old_in_h = new_in_mi = new_in_h = 0.0
+            done = False
+            for j in range(i + 1, n):
+                q = self._next(ids, j + 1)
+                a, b = ids[j - 1], ids[j]
+                old_in_mi += float(D[ends[a], starts[b]])
+                old_in_h += float(T[ends[a], starts[b]])
+                new_in_mi += float(D[ends[b], starts[a]])
+                new_in_h += float(T[ends[b], starts[a]])
+                first, last = ids[i], ids[j]
+                d_mi = (
+                    float(D[p, starts[last]] + D[ends[first], q])
+                    + new_in_mi
+                    - float(D[p, starts[first]] + D[ends[last], q])
+                    - old_in_mi
+                )
+                if d_mi >= -_EPS:
+                    continue
+                d_h = (
+                    float(T[p, starts[last]] + T[ends[first], q])
+                    + new_in_h
+                    - float(T[p, starts[first]] + T[ends[last], q])
+                    - old_in_h
+                )
+                if night.hours + d_h > self.max_h:
+                    continue
+                ids[i : j + 1] = ids[i : j + 1][::-1]
+                night.deadhead_miles += d_mi
+                night.deadhead_hours += d_h
+                applied += 1
+                done = True
+                break
+            if not done:
+                i += 1
+        return applied
+
+    def or_opt(self, night: NightRoute, max_chain: int = 3) -> int:
+        """Move a chain of 1..max_chain consecutive blocks elsewhere in the same night."""
+        applied = 0
+        ids = night.ids
+        D, T, starts, ends = self.D, self.T, self.starts, self.ends
+        improved = True
+        while improved and not self.expired():
+            improved = False
+            n = len(ids)
+            for length in range(1, min(max_chain, n - 1) + 1):
+                for i in range(0, n - length + 1):
+                    first, last = ids[i], ids[i + length - 1]
+                    p, q = self._prev(ids, i), self._next(ids, i + length)
+                    gain_mi = float(D[p, starts[first]] + D[ends[last], q] - D[p, q])
+                    gain_h = float(T[p, starts[first]] + T[ends[last], q] - T[p, q])
+                    rest = ids[:i] + ids[i + length :]
+                    best = None
+                    for j in range(len(rest) + 1):
+                        if j == i:
+                            continue
+                        pp, qq = self._prev(rest, j), self._next(rest, j)
+                        d_mi = (
+                            float(D[pp, starts[first]] + D[ends[last], qq] - D[pp, qq]) - gain_mi
+                        )
+                        if d_mi < -_EPS and (best is None or d_mi < best[0]):
+                            d_h = (
+                                float(T[pp, starts[first]] + T[ends[last], qq] - T[pp, qq])
+                                - gain_h
+                            )
+                            if night.hours + d_h <= self.max_h:
+                                best = (d_mi, d_h, j)
+                    if best is None:
+                        continue
+                    d_mi, d_h, j = best
+                    chain_ids = ids[i : i + length]
+                    ids[:] = rest[:j] + chain_ids + rest[j:]
+                    night.deadhead_miles += d_mi
+                    night.deadhead_hours += d_h
+                    applied += 1
+                    improved = True
+                    break
+                if improved:
+                    break
+        return applied
+
+    def _removal_gain(self, ids: list[int], i: int) -> tuple[float, float]:
+        k = ids[i]
+        p, q = self._prev(ids, i), self._next(ids, i + 1)
+        out_mi, out_h = self._replace_cost(p, q, k)
+        return out_mi - float(self.D[p, q]), out_h - float(self.T[p, q])
+
+    def _relocate_slots(self, k: int, a_night: NightRoute):
+        """(night, position) targets for moving block `k` out of `a_night`."""
+        if self.neighbors is None:
+            for b_night in self.nights:
+                if b_night is not a_night and b_night.ids:
+                    for j in range(len(b_night.ids) + 1):
+                        yield b_night, j
+            return
+        for j, after in (
+            *((j, 1) for j in self.neighbors.predecessors(k)),
+            *((j, 0) for j in self.neighbors.successors(k)),
+        ):
+            b_night = self.night_of[j]
+            if b_night is not a_night:
+                yield b_night, b_night.ids.index(j) + after
+
+    def _swap_partners(self, k: int, ai: int):
+        """(night, position) of blocks that block `k` (in night `ai`) may trade places with."""
+        if self.neighbors is None:
+            for b_night in self.nights[ai + 1 :]:
+                for j in range(len(b_night.ids)):
+                    yield b_night, j
+            return
+        a_night = self.nights[ai]
+        for j in self.neighbors.similar(k):
+            b_night = self.night_of[j]
+            if b_night is not a_night:
+                yield b_night, b_night.ids.index(j)
+
+    def relocate(self) -> int:
+        """Move one block into the best position of another night."""
+        applied = 0
+        for a_night in self.nights:
+            i = 0
+            while i < len(a_night.ids):
+                if self.expired():
+                    return applied
+                k = a_night.ids[i]
+                gain_mi, gain_h = self._removal_gain(a_night.ids, i)
+                best = None
+                for b_night, j in self._relocate_slots(k, a_night):
+                    room = self.max_h - b_night.hours - self.svc[k]
+                    if room < 0:
+                        continue
+                    ids = b_night.ids
+                    p, q = self._prev(ids, j), self._next(ids, j)
+                    add_mi, add_h = self._replace_cost(p, q, k)
+                    add_mi -= float(self.D[p, q])
+                    d_mi = add_mi - gain_mi
+                    if d_mi >= -_EPS or (best is not None and d_mi >= best[0]):
+                        continue
+                    add_h -= float(self.T[p, q])
+                    if add_h > room:
+                        continue
+                    best = (d_mi, b_night, j, add_mi, add_h)
+                if best is None or a_night.hours - gain_h - self.svc[k] > self.max_h:
+                    i += 1
+                    continue
+                _, b_night, j, add_mi, add_h = best
+                a_night.ids.pop(i)
+                a_night.deadhead_miles -= gain_mi
+                a_night.deadhead_hours -= gain_h
+                a_night.service_hours -= self.svc[k]
+                b_night.ids.insert(j, k)
+                b_night.deadhead_miles += add_mi
+                b_night.deadhead_hours += add_h
+                b_night.service_hours += self.svc[k]
+                self.night_of[k] = b_night
+                applied += 1
+        return applied
+
+    def swap(self) -> int:
+        """Exchange two blocks between different nights, each taking the other's slot."""
+        applied = 0
+        for ai, a_night in enumerate(self.nights):
+            for i in range(len(a_night.ids)):
+                if self.expired():
+                    return applied
+                ka = a_night.ids[i]
+                pa, qa = self._prev(a_night.ids, i), self._next(a_night.ids, i + 1)
+                a_old_mi, a_old_h = self._replace_cost(pa, qa, ka)
+                for b_night, j in list(self._swap_partners(ka, ai)):
+                    kb = b_night.ids[j]
+                    pb, qb = self._prev(b_night.ids, j), self._next(b_night.ids, j + 1)
+                    b_old_mi, b_old_h = self._replace_cost(pb, qb, kb)
+                    a_new_mi, a_new_h = self._replace_cost(pa, qa, kb)
+                    b_new_mi, b_new_h = self._replace_cost(pb, qb, ka)
+                    d_a = a_new_mi - a_old_mi
+                    d_b = b_new_mi - b_old_mi
+                    if d_a + d_b >= -_EPS:
+                        continue
+                    dh_a = a_new_h - a_old_h
+                    dh_b = b_new_h - b_old_h
+                    svc_shift = self.svc[kb] - self.svc[ka]
+                    if a_night.hours + dh_a + svc_shift > self.max_h:
+                        continue
+                    if b_night.hours + dh_b - svc_shift > self.max_h:
+                        continue
+                    a_night.ids[i], b_night.ids[j] = kb, ka
+                    a_night.deadhead_miles += d_a
+                    a_night.deadhead_hours += dh_a
+                    a_night.service_hours += svc_shift
+                    b_night.deadhead_miles += d_b
+                    b_night.deadhead_hours += dh_b
+                    b_night.service_hours -= svc_shift
+                    self.night_of[ka], self.night_of[kb] = b_night, a_night
+                    applied += 1
+                    # The slot now holds kb; later partners are scored against it.
+                    ka = kb
+                    a_old_mi, a_old_h = a_new_mi, a_new_h
+        return applied
+
+
+def total_deadhead_miles(nights: list[NightRoute]) -> float:
+    return sum(n.deadhead_miles for n in nights)
+
+
+def improve_plan(
+    constraints: Constraints,
+    nights: list[NightRoute],
+    matrix: DistanceMatrix,
+    *,
+    time_limit: float = 10.0,
+    gap_tolerance: float = 0.0,
+) -> tuple[list[NightRoute], ImproveStats]:
+    """Improve a constructed plan with 2-opt, or-opt, relocate and swap moves.
+
+    Nights are modified in place; nights emptied by relocation are dropped.
+    Stops at a local optimum, when `time_limit` seconds have elapsed, or (with
+    `gap_tolerance` > 0) once deadhead is within that share of its lower bound.
+    """
+
+    t0 = time.perf_counter()
+    stats = ImproveStats(
+        deadhead_before=total_deadhead_miles(nights),
+        deadhead_after=0.0,
+        nights_before=len(nights),
+        nights_after=0,
+    )
+    neighbors = build_neighbors(
+        matrix, constraints.search.neighbors_k, constraints.search.exhaustive
+    )
+    search = _Search(constraints, nights, matrix, deadline=t0 + time_limit, neighbors=neighbors)
+    bound = None
+    if gap_tolerance > 0:
+        table = service_table(constraints, matrix)
+        bound = lower_bounds(constraints, matrix, table).deadhead_miles
+
+    improved = True
+    while improved and not search.expired():
+        if bound is not None and gap(total_deadhead_miles(nights), bound) <= gap_tolerance:
+            stats.stopped_at_gap = True
+            break
+        improved = False
+        stats.passes += 1
+        for night in nights:
+            if search.expired():
+                break
+            n = search.two_opt(night)
+            search.moves["two_opt"] += n
+            m = search.or_opt(night)
+            search.moves["or_opt"] += m
+            improved = improved or bool(n or m)
+            if instrument.due():
+                instrument.progress(
+                    f"improve: pass {stats.passes}, "
+                    f"{total_deadhead_miles(nights):.2f} mi deadhead, "
+                    f"{sum(search.moves.values())} moves"
+                )
+        for name, move in (("relocate", search.relocate), ("swap", search.swap)):
+            if search.expired():
+                break
+            n = move()
+            search.moves[name] += n
+            improved = improved or bool(n)
+        nights[:] = [n for n in nights if n.ids]
+
+    stats.moves = search.moves
+    for name, n in search.moves.items():
+        instrument.count(f"improve.moves.{name}", n)
+    stats.deadhead_after = total_deadhead_miles(nights)
+    stats.nights_after = len(nights)
+    stats.elapsed_s = time.perf_counter() - t0
+    return nights, stats
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
+import numpy as np
+
 from routeopt.models.network import Segment
-from routeopt.utils.geo import LatLon
 
 
 def _get(props: dict, *keys, default=None):
@@ -35,61 +37,201 @@ def _coerce_bool(value, *, default: bool) -> bool:
     raise ValueError(f"Invalid boolean type: {type(value)}")
 
 
-def load_segments_geojson(path: str | Path, *, default_oneway: bool) -> list[Segment]:
-    p = Path(path)
-    data = json.loads(p.read_text(encoding="utf-8"))
-    if data.get("type") != "FeatureCollection":
-        raise ValueError("GeoJSON must be a FeatureCollection")
+_CHUNK = 1 << 20
+# Newline-delimited variants: one Feature per line (RS-prefixed lines for RFC 8142).
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".geojsonl", ".geojsons", ".geojsonseq")
 
-    segs: list[Segment] = []
-    for feat in data.get("features", []):
-        if feat.get("type") != "Feature":
-            continue
-        props = feat.get("properties") or {}
-        geom = feat.get("geometry") or {}
 
-        roadway_id = _get(props, "roadway_id", "roadway id", "id")
-        if not roadway_id:
-            raise ValueError("Missing roadway_id in feature properties")
+class _Reader:
+    """Incremental JSON value reader over a text stream with a sliding buffer."""
 
-        total_lanes = int(_get(props, "total_lanes", "number_of_lanes", "lanes", default=0))
-        if total_lanes <= 0:
-            raise ValueError(f"Invalid total_lanes for roadway_id={roadway_id}: {total_lanes}")
+    def __init__(self, f):
+        self._f = f
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._dec = json.JSONDecoder()
 
-        speed_limit = float(_get(props, "speed_limit", "speed", "speedlimit", default=0))
-        if speed_limit <= 0:
-            raise ValueError(f"Invalid speed_limit for roadway_id={roadway_id}: {speed_limit}")
-
-        oneway_raw = _get(props, "oneway", default=None)
-        oneway = _coerce_bool(oneway_raw, default=default_oneway)
-        bmp = _get(props, "bmp")
-        emp = _get(props, "emp")
+    def _more(self) -> bool:
+        if self._eof:
+            return False
+        # Read at least as much as is buffered so re-decoding a large value stays linear.
+        chunk = self._f.read(max(_CHUNK, len(self._buf) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)."""
+        while True:
+            n = len(self._buf)
+            while self._pos < n and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < n:
+                return self._buf[self._pos]
+            if not self._more():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"Invalid GeoJSON: expected {ch!r}, found {got or 'end of file'!r}")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self._dec.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if not self._more():
+                    raise ValueError(f"Invalid GeoJSON: {e}") from e
+                continue
+            # A number (or literal) ending exactly at the buffer edge may be cut short.
+            if end == len(self._buf) and not isinstance(obj, (dict, list, str)) and self._more():
+                continue
+            self._pos = end
+            return obj
+
+
+def _iter_feature_collection(f) -> Iterator[dict]:
+    r = _Reader(f)
+    r.expect("{")
+    seen_type = None
+    if r.peek() == "}":
+        raise ValueError("GeoJSON must be a FeatureCollection")
+    while True:
+        key = r.value()
+        r.expect(":")
+        if key == "features":
+            r.expect("[")
+            if r.peek() == "]":
+                r.expect("]")
+            else:
+                n = 0
+                while True:
+                    try:
+                        feat = r.value()
+                    except ValueError as e:
+                        raise ValueError(f"Feature {n}: {e}") from e
+                    yield feat
+                    n += 1
+                    if r.peek() == "]":
+                        r.expect("]")
+                        break
+                    r.expect(",")
+        else:
+            val = r.value()
+            if key == "type":
+                if val != "FeatureCollection":
+                    raise ValueError("GeoJSON must be a FeatureCollection")
+                seen_type = val
+        if r.peek() == "}":
+            break
+        r.expect(",")
+    if seen_type is None:
+        raise ValueError("GeoJSON must be a FeatureCollection")
 
-        if geom.get("type") != "LineString":
-            raise ValueError(f"Only LineString supported (roadway_id={roadway_id})")
-        coords_raw = geom.get("coordinates")
-        if not coords_raw or len(coords_raw) < 2:
-            raise ValueError(f"LineString must have >=2 coordinates (roadway_id={roadway_id})")
 
-        coords: list[LatLon] = []
+def _iter_ndjson(f) -> Iterator[dict]:
+    n = 0
+    for line in f:
+        line = line.strip().lstrip("\x1e")
+        if not line:
+            continue
+        try:
+            feat = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Feature {n}: invalid JSON ({e})") from e
+        yield feat
+        n += 1
+
+
+def _segment(feat: dict, *, default_oneway: bool) -> Segment | None:
+    if feat.get("type") != "Feature":
+        return None
+    props = feat.get("properties") or {}
+    geom = feat.get("geometry") or {}
+
+    roadway_id = _get(props, "roadway_id", "roadway id", "id")
+    if not roadway_id:
+        raise ValueError("Missing roadway_id in feature properties")
+
+    total_lanes = int(_get(props, "total_lanes", "number_of_lanes", "lanes", default=0))
+    if total_lanes <= 0:
+        raise ValueError(f"Invalid total_lanes for roadway_id={roadway_id}: {total_lanes}")
+
+    speed_limit = float(_get(props, "speed_limit", "speed", "speedlimit", default=0))
+    if speed_limit <= 0:
+        raise ValueError(f"Invalid speed_limit for roadway_id={roadway_id}: {speed_limit}")
+
+    oneway_raw = _get(props, "oneway", default=None)
+    oneway = _coerce_bool(oneway_raw, default=default_oneway)
+    bmp = _get(props, "bmp")
+    emp = _get(props, "emp")
+
+    if geom.get("type") != "LineString":
+        raise ValueError(f"Only LineString supported (roadway_id={roadway_id})")
+    coords_raw = geom.get("coordinates")
+    if not coords_raw or len(coords_raw) < 2:
+        raise ValueError(f"LineString must have >=2 coordinates (roadway_id={roadway_id})")
+
+    try:
+        xy = np.asarray(coords_raw, dtype=np.float64)
+    except (TypeError, ValueError):
+        xy = None
+    if xy is None or xy.ndim != 2 or xy.shape[1] < 2:
         for c in coords_raw:
             if not isinstance(c, (list, tuple)) or len(c) < 2:
-                raise ValueError(f"Invalid coordinate in LineString (roadway_id={roadway_id}): {c}")
-            lon, lat = c[0], c[1]
-            coords.append(LatLon(lat=float(lat), lon=float(lon)))
-
-        segs.append(
-            Segment(
-                roadway_id=str(roadway_id),
-                bmp=float(bmp) if bmp is not None else None,
-                emp=float(emp) if emp is not None else None,
-                total_lanes=total_lanes,
-                speed_limit_mph=speed_limit,
-                oneway=oneway,
-                coords=coords,
-            )
-        )
+                raise ValueError(
+                    f"Invalid coordinate in LineString (roadway_id={roadway_id}): {c}"
+                )
+        xy = np.array([(float(c[0]), float(c[1])) for c in coords_raw], dtype=np.float64)
+    coords = np.ascontiguousarray(xy[:, :2])
+
+    return Segment(
+        roadway_id=str(roadway_id),
+        bmp=float(bmp) if bmp is not None else None,
+        emp=float(emp) if emp is not None else None,
+        total_lanes=total_lanes,
+        speed_limit_mph=speed_limit,
+        oneway=oneway,
+        coords=coords,
+    )
+
+
+def iter_segments_geojson(path: str | Path, *, default_oneway: bool) -> Iterator[Segment]:
+    """Yield segments one feature at a time without loading the whole file.
+
+    Reads a GeoJSON FeatureCollection, or newline-delimited features when the
+    file has one of ``NDJSON_SUFFIXES``. Errors name the offending feature index.
+    """
+
+    p = Path(path)
+    ndjson = p.suffix.lower() in NDJSON_SUFFIXES
+    with p.open("r", encoding="utf-8") as f:
+        features = _iter_ndjson(f) if ndjson else _iter_feature_collection(f)
+        yield from iter_segments_features(features, default_oneway=default_oneway)
 
+
+def iter_segments_features(features: Iterable, *, default_oneway: bool) -> Iterator[Segment]:
+    """Segments from already parsed GeoJSON features (e.g. a request body)."""
+    for i, feat in enumerate(features):
+        if not isinstance(feat, dict):
+            raise ValueError(f"Feature {i}: expected a JSON object")
+        try:
+            seg = _segment(feat, default_oneway=default_oneway)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Feature {i}: {e}") from e
+        if seg is not None:
+            yield seg
+
+
+def load_segments_geojson(path: str | Path, *, default_oneway: bool) -> list[Segment]:
+    segs = list(iter_segments_geojson(path, default_oneway=default_oneway))
     if not segs:
         raise ValueError("GeoJSON contains no usable LineString features")
     return segs
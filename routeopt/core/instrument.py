@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import importlib
+import math
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    """Nested phase timings, event counters and rate-limited progress lines.
+
+    Instrumented code reaches the active profiler through the module functions
+    (`span`, `count`, `due`, `progress`); with none active they return at once.
+    """
+
+    def __init__(self, *, progress_every: float = 0.0, log=print):
+        self.spans: dict[str, list] = {}  # "plan/matrix" -> [seconds, calls], in start order
+        self.counters: dict[str, int] = {}
+        self.progress_every = progress_every
+        self.log = log
+        self._stack: list[str] = []
+        self._t0 = time.perf_counter()
+        self._next = self._t0 + progress_every if progress_every > 0 else math.inf
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        path = "/".join((*self._stack, name))
+        rec = self.spans.setdefault(path, [0.0, 0])
+        self._stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            rec[0] += time.perf_counter() - t0
+            rec[1] += 1
+            self._stack.pop()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def due(self) -> bool:
+        now = time.perf_counter()
+        if now < self._next:
+            return False
+        self._next = now + self.progress_every
+        return True
+
+    def progress(self, message: str) -> None:
+        self.log(f"[{time.perf_counter() - self._t0:8.1f}s] {message}")
+
+    def report(self) -> dict:
+        return {
+            "version": 1,
+            "elapsed_s": round(time.perf_counter() - self._t0, 4),
+            "spans": [
+                {"name": path, "seconds": round(s, 4), "calls": calls}
+                for path, (s, calls) in self.spans.items()
+            ],
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+_active: Profiler | None = None
+
+
+@contextmanager
+def profiling(profiler: Profiler | None) -> Iterator[Profiler | None]:
+    """Make `profiler` the active one for the duration of the block (None: no-op)."""
+    global _active
+    prev, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = prev
+
+
+def span(name: str):
+    p = _active
+    return _NULL if p is None else p.span(name)
+
+
+def count(name: str, n: int = 1) -> None:
+    p = _active
+    if p is not None:
+        p.count(name, n)
+
+
+def due() -> bool:
+    """True when a progress line should be written; check it before formatting one."""
+    p = _active
+    return p is not None and p.due()
+
+
+def progress(message: str) -> None:
+    p = _active
+    if p is not None:
+        p.progress(message)
+
+
+@contextmanager
+def code_profiler(path: str | Path | None, kind: str = "cprofile") -> Iterator[None]:
+    """Profile the block with cProfile (pstats dump) or pyinstrument (HTML) into `path`."""
+    if path is None:
+        yield
+        return
+    if kind not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {kind}")
+    if kind == "pyinstrument":
+        try:
+            mod = importlib.import_module("pyinstrument")
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError(
+                "pyinstrument profiling requires optional dependencies. "
+                "Install with: pip install -e '.[profile]'"
+            ) from e
+        prof = mod.Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            Path(path).write_text(prof.output_html(), encoding="utf-8")
+        return
+
+    import cProfile
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(str(path))
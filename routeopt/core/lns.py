@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core import instrument
+from routeopt.core.bounds import gap, lower_bounds
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.solver import Construction, NightRoute, night_from_ids, service_table
+from routeopt.core.spatial import GridIndex, build_neighbors
+from routeopt.models.constraints import Constraints
+
+RUINS = ("radial", "random", "night")
+RECREATES = ("best", "regret")
+
+
+@dataclass
+class LNSStats:
+    deadhead_before: float
+    deadhead_after: float
+    nights_before: int
+    nights_after: int
+    iterations: int = 0
+    accepted: int = 0
+    improved: int = 0  # new best solutions
+    rejected_infeasible: int = 0
+    checkpoints: int = 0
+    interrupted: bool = False
+    stopped_at_gap: bool = False  # best deadhead came within gap_tolerance of its lower bound
+    elapsed_s: float = 0.0
+    ruins: dict[str, int] = field(default_factory=dict)
+
+
+def _copy(nights: list[NightRoute]) -> list[NightRoute]:
+    return [replace(n, ids=list(n.ids)) for n in nights]
+
+
+def _cost(nights: list[NightRoute]) -> float:
+    return sum(n.deadhead_miles for n in nights)
+
+
+def _input_key(matrix: DistanceMatrix) -> str | None:
+    return matrix.blocks.fingerprint() if matrix.blocks is not None else None
+
+
+def write_checkpoint(
+    path: str | Path, nights: list[NightRoute], matrix: DistanceMatrix, *, iteration: int = 0
+) -> None:
+    """Write the plan as block ids per night, tagged with its input; replaced atomically."""
+    path = Path(path)
+    data = {
+        "version": 2,
+        "input": _input_key(matrix),
+        "iteration": iteration,
+        "blocks": sum(len(n.ids) for n in nights),
+        "deadhead_miles": round(_cost(nights), 6),
+        "nights": [n.ids for n in nights],
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_checkpoint(
+    path: str | Path, constraints: Constraints, matrix: DistanceMatrix
+) -> list[NightRoute]:
+    """Nights saved by `write_checkpoint`, checked against this problem's blocks and limits."""
+
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    # Ids alone cannot tell two inputs with the same number of blocks apart.
+    if data.get("input") != _input_key(matrix):
+        raise ValueError(f"Checkpoint {path} was written for another input")
+    n = len(matrix.block_start)
+    ids = [int(k) for night in data["nights"] for k in night]
+    if sorted(ids) != list(range(n)):
+        raise ValueError(f"Checkpoint {path} does not cover the {n} blocks of this input")
+    if len(data["nights"]) > constraints.limits.max_nights:
+        raise ValueError(f"Checkpoint {path} exceeds max_nights")
+
+    build = Construction(constraints, matrix)
+    nights = [night_from_ids(matrix, build.svc_h, [int(k) for k in ns]) for ns in data["nights"]]
+    for i, night in enumerate(nights, start=1):
+        if night.hours > build.max_h + 1e-9:
+            raise ValueError(
+                f"Checkpoint {path}: night {i} takes {night.hours:.3f} h > {build.max_h}"
+            )
+    return nights
+
+
+class _LNS:
+    """Ruin-and-recreate moves over a plan; each move works on a copy of the nights."""
+
+    def __init__(self, constraints: Constraints, matrix: DistanceMatrix, rng: random.Random):
+        neighbors = build_neighbors(
+            matrix, constraints.search.neighbors_k, constraints.search.exhaustive
+        )
+        self.build = Construction(constraints, matrix, neighbors)
+        self.matrix = matrix
+        self.rng = rng
+        self.n = len(matrix.block_start)
+        lat = np.array([matrix.points[i].lat for i in matrix.block_start])
+        lon = np.array([matrix.points[i].lon for i in matrix.block_start])
+        self.lat, self.lon = lat.tolist(), lon.tolist()
+        self.grid = GridIndex(lat, lon)
+        self.open_cost = (
+            matrix.dist[DEPOT, matrix.block_start] + matrix.dist[matrix.block_end, DEPOT]
+        ).tolist()
+
+    def _near(self, k: int, q: int) -> list[int]:
+        return self.grid.nearest(self.lat[k], self.lon[k], q).tolist()
+
+    def ruin(self, nights: list[NightRoute], kind: str, q: int) -> set[int]:
+        """Blocks to remove: `q` around a random block, `q` at random, or whole nights."""
+        seed = self.rng.randrange(self.n)
+        if kind == "radial":
+            return set(self._near(seed, q))
+        if kind == "random":
+            return set(self.rng.sample(range(self.n), q))
+
+        # The seed's night plus the night of the nearest block served by another night,
+        # so the two can be merged or re-split along a better boundary.
+        night_of = {k: ni for ni, night in enumerate(nights) for k in night.ids}
+        picked = {night_of[seed]}
+        for k in self._near(seed, min(self.n, q + 1)):
+            if night_of[k] not in picked:
+                picked.add(night_of[k])
+                break
+        return {k for ni in picked for k in nights[ni].ids}
+
+    def recreate(
+        self, nights: list[NightRoute], removed: set[int], how: str
+    ) -> list[NightRoute] | None:
+        """Reinsert `removed` into the ruined plan; None if max_nights would be exceeded."""
+        build = self.build
+        kept = []
+        for night in nights:
+            if any(k in removed for k in night.ids):
+                ids = [k for k in night.ids if k not in removed]
+                if ids:
+                    kept.append(night_from_ids(self.matrix, build.svc_h, ids))
+            else:
+                kept.append(replace(night, ids=list(night.ids)))
+        build.load(kept)
+
+        todo = list(removed)
+        self.rng.shuffle(todo)
+        try:
+            if how == "best":
+                for k in todo:
+                    opts = build.options(k)
+                    build.place(k, opts[0] if opts else None)
+            else:
+                while todo:
+                    # Regret-2: the block losing most by missing its cheapest night goes first.
+                    best = None
+                    for i, k in enumerate(todo):
+                        opts = build.options(k)
+                        first = opts[0][0] if opts else self.open_cost[k]
+                        second = opts[1][0] if len(opts) > 1 else self.open_cost[k]
+                        if best is None or second - first > best[0]:
+                            best = (second - first, i, opts)
+                    _, i, opts = best
+                    build.place(todo.pop(i), opts[0] if opts else None)
+        except ValueError:
+            return None
+        return build.nights
+
+
+def lns_plan(
+    constraints: Constraints,
+    nights: list[NightRoute],
+    matrix: DistanceMatrix,
+    *,
+    time_limit: float | None = 30.0,
+    max_iters: int | None = None,
+    seed: int = 0,
+    max_remove: int = 30,
+    start_temperature: float = 0.01,
+    checkpoint: str | Path | None = None,
+    checkpoint_every: float = 30.0,
+    gap_tolerance: float = 0.0,
+) -> tuple[list[NightRoute], LNSStats]:
+    """Large neighbourhood search: ruin part of the plan, reinsert, accept by annealing.
+
+    Each iteration removes up to `max_remove` related blocks (radial, random or
+    whole-night ruin) and reinserts them by cheapest or regret-2 insertion under
+    max_hours_per_night and max_nights. Worse plans are accepted with simulated
+    annealing probability; the temperature starts at `start_temperature` times the
+    initial deadhead and cools geometrically over the time / iteration budget.
+
+    The best plan is written to `checkpoint` every `checkpoint_every` seconds and
+    at the end. Ctrl-C stops the search and returns the best plan found so far. With
+    `gap_tolerance` > 0 the search also stops once the best deadhead is within that
+    share of its lower bound (see `bounds.lower_bounds`).
+    """
+
+    if time_limit is None and max_iters is None:
+        raise ValueError("lns_plan needs a time_limit or max_iters")
+    t0 = time.perf_counter()
+    rng = random.Random(seed)
+    search = _LNS(constraints, matrix, rng)
+
+    current = _copy(nights)
+    cur_cost = best_cost = _cost(current)
+    best = _copy(current)
+    stats = LNSStats(
+        deadhead_before=cur_cost,
+        deadhead_after=cur_cost,
+        nights_before=len(nights),
+        nights_after=len(nights),
+        ruins={k: 0 for k in RUINS},
+    )
+    if search.n < 2:
+        return nights, stats
+
+    t_start = max(1e-6, start_temperature * cur_cost)
+    t_end = t_start * 1e-3
+    last_ckpt = t0
+    dirty = False
+    lo = min(search.n, 2)
+    hi = max(lo, min(search.n, max_remove))
+    bound = None
+    if gap_tolerance > 0:
+        table = service_table(constraints, matrix)
+        bound = lower_bounds(constraints, matrix, table).deadhead_miles
+        stats.stopped_at_gap = gap(best_cost, bound) <= gap_tolerance
+
+    try:
+        while not stats.stopped_at_gap:
+            elapsed = time.perf_counter() - t0
+            progress = 0.0
+            if time_limit is not None:
+                progress = elapsed / time_limit if time_limit > 0 else 1.0
+            if max_iters is not None:
+                progress = max(progress, stats.iterations / max_iters if max_iters > 0 else 1.0)
+            if progress >= 1.0:
+                break
+            temp = t_start * (t_end / t_start) ** progress
+
+            kind = rng.choice(RUINS)
+            removed = search.ruin(current, kind, rng.randint(lo, hi))
+            cand = search.recreate(current, removed, rng.choice(RECREATES))
+            stats.iterations += 1
+            stats.ruins[kind] += 1
+            if cand is None:
+                stats.rejected_infeasible += 1
+                continue
+
+            cost = _cost(cand)
+            delta = cost - cur_cost
+            if delta <= 0 or rng.random() < math.exp(-delta / temp):
+                current, cur_cost = cand, cost
+                stats.accepted += 1
+                fewer = cost <= best_cost + 1e-9 and len(cand) < len(best)
+                if cost < best_cost - 1e-9 or fewer:
+                    best, best_cost = _copy(cand), cost
+                    stats.improved += 1
+                    dirty = True
+                    if bound is not None:
+                        stats.stopped_at_gap = gap(best_cost, bound) <= gap_tolerance
+
+            due = time.perf_counter() - last_ckpt >= checkpoint_every
+            if checkpoint is not None and dirty and due:
+                write_checkpoint(checkpoint, best, matrix, iteration=stats.iterations)
+                stats.checkpoints += 1
+                last_ckpt = time.perf_counter()
+                dirty = False
+            if instrument.due():
+                instrument.progress(
+                    f"lns: {stats.iterations} iterations, {stats.accepted} accepted, "
+                    f"best {best_cost:.2f} mi ({len(best)} nights)"
+                )
+    except KeyboardInterrupt:
+        stats.interrupted = True
+
+    if checkpoint is not None:
+        write_checkpoint(checkpoint, best, matrix, iteration=stats.iterations)
+        stats.checkpoints += 1
+
+    instrument.count("lns.iterations", stats.iterations)
+    instrument.count("lns.accepted", stats.accepted)
+    instrument.count("lns.improved", stats.improved)
+    nights[:] = best
+    stats.deadhead_after = best_cost
+    stats.nights_after = len(best)
+    stats.elapsed_s = time.perf_counter() - t0
+    return nights, stats
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from routeopt.core.routing import DistTime, RoutingEngine
+from routeopt.core.tasks import BlockTable, ServiceBlock, as_block_table
+from routeopt.utils.geo import LatLon
+
+DEPOT = 0
+
+
+@dataclass
+class DistanceMatrix:
+    """Dense deadhead distance/time matrix over the depot and all block endpoints.
+
+    Point 0 is always the depot. ``block_start[k]`` / ``block_end[k]`` give the
+    point index of block ``k``'s start/end; coincident endpoints share one index
+    (unless the engine snaps by heading and the blocks run in different directions).
+    """
+
+    points: list[LatLon]
+    dist: np.ndarray  # (n, n) miles
+    time: np.ndarray  # (n, n) hours
+    block_start: np.ndarray
+    block_end: np.ndarray
+    blocks: BlockTable | None = None  # the blocks indexed by block_start/block_end
+    # Arrays derived from dist/time, kept by their users (see `bounds`). Not an init
+    # field, so replace() and submatrix() start empty rather than inherit stale entries.
+    cache: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @property
+    def size(self) -> int:
+        return len(self.points)
+
+    def leg(self, i: int, j: int) -> DistTime:
+        return DistTime(
+            distance_miles=float(self.dist[i, j]), duration_hours=float(self.time[i, j])
+        )
+
+    def submatrix(self, rows: np.ndarray) -> DistanceMatrix:
+        """The problem restricted to blocks `rows`, renumbered from 0 (depot stays point 0)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(rows)
+        used = np.concatenate(([DEPOT], self.block_start[rows], self.block_end[rows]))
+        pts, inv = np.unique(used, return_inverse=True)  # DEPOT == 0 sorts first
+        sel = np.ix_(pts, pts)
+        return DistanceMatrix(
+            points=[self.points[i] for i in pts.tolist()],
+            dist=np.ascontiguousarray(self.dist[sel]),
+            time=np.ascontiguousarray(self.time[sel]),
+            block_start=inv[1 : n + 1],
+            block_end=inv[n + 1 :],
+            blocks=self.blocks.take(rows) if self.blocks is not None else None,
+        )
+
+
+def build_matrix(
+    engine: RoutingEngine, depot: LatLon, blocks: BlockTable | list[ServiceBlock]
+) -> DistanceMatrix:
+    """Index depot + every block endpoint once and fill the full matrix.
+
+    Engines exposing ``dist_time_matrix(points)`` fill it in one call; otherwise
+    every ordered pair goes through ``engine.dist_time``. Engines that also
+    expose ``snap_points`` get each endpoint's block azimuth as its heading, so
+    it is snapped onto the carriageway the block is driven on.
+    """
+
+    table = as_block_table(blocks)
+    by_heading = hasattr(engine, "snap_points")
+    if by_heading:
+        points, headings, block_start, block_end = _heading_points(table, depot)
+    else:
+        # Table endpoints are already unique; only one coinciding with the depot merges.
+        at_depot = (table.poi_lat == depot.lat) & (table.poi_lon == depot.lon)
+        remap = np.where(at_depot, DEPOT, np.cumsum(~at_depot))
+        keep = np.flatnonzero(~at_depot)
+        points = [depot, *(table.point(i) for i in keep)]
+        block_start = remap[table.start]
+        block_end = remap[table.end]
+
+    fill = getattr(engine, "dist_time_matrix", None)
+    if fill is not None:
+        dist, time = fill(points, headings) if by_heading else fill(points)
+    else:
+        n = len(points)
+        dist = np.zeros((n, n), dtype=np.float64)
+        time = np.zeros((n, n), dtype=np.float64)
+        for i, a in enumerate(points):
+            for j, b in enumerate(points):
+                if i == j:
+                    continue
+                dt = engine.dist_time(a, b)
+                dist[i, j] = dt.distance_miles
+                time[i, j] = dt.duration_hours
+
+    return DistanceMatrix(
+        points=points,
+        dist=dist,
+        time=time,
+        block_start=block_start,
+        block_end=block_end,
+        blocks=table,
+    )
+
+
+def _heading_points(table: BlockTable, depot: LatLon):
+    """Points keyed by (endpoint, block azimuth): opposite carriageways stay apart."""
+    index: dict[tuple[int, float | None], int] = {}
+    points: list[LatLon] = [depot]
+    headings: list[float | None] = [None]
+
+    def _idx(poi: int, heading: float) -> int:
+        key = (poi, round(heading, 1))
+        i = index.get(key)
+        if i is None:
+            i = index[key] = len(points)
+            points.append(table.point(poi))
+            headings.append(heading)
+        return i
+
+    block_start = np.empty(len(table), dtype=np.int64)
+    block_end = np.empty(len(table), dtype=np.int64)
+    for k, (s, e, az) in enumerate(
+        zip(table.start.tolist(), table.end.tolist(), table.azimuth_deg.tolist())
+    ):
+        block_start[k] = _idx(s, az)
+        block_end[k] = _idx(e, az)
+    return points, headings, block_start, block_end
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.bounds import check_max_nights
+from routeopt.core.matrix import DEPOT, DistanceMatrix
+from routeopt.core.solver import Construction, NightRoute, greedy_plan, service_table
+from routeopt.core.spatial import BlockNeighbors, build_neighbors
+from routeopt.models.constraints import Constraints
+
+# Start i uses ORDERINGS[i % len(ORDERINGS)]; later rounds perturb the keys by seed.
+ORDERINGS = ("duration", "depot_distance", "sweep", "regret", "random")
+
+# Per-process problem, installed once by `_init_worker` (matrix arrays are memmaps).
+_WORKER: tuple[Constraints, DistanceMatrix, BlockNeighbors | None] | None = None
+
+
+@dataclass
+class StartResult:
+    start: int
+    ordering: str
+    seed: int
+    nights: int = 0
+    deadhead_miles: float = math.inf
+    elapsed_s: float = 0.0
+    error: str | None = None
+
+
+def start_order(
+    kind: str, constraints: Constraints, matrix: DistanceMatrix, seed: int, jitter: float
+) -> list[int]:
+    """Block insertion order for one start. `jitter` > 0 perturbs sort keys by up to that share."""
+
+    n = len(matrix.block_start)
+    rng = np.random.default_rng(seed)
+    if kind == "random":
+        return rng.permutation(n).tolist()
+
+    if kind == "duration":
+        key = service_table(constraints, matrix).service_hours
+    elif kind == "depot_distance":
+        # Farthest first: remote blocks seed nights before the easy ones fill them up.
+        key = matrix.dist[DEPOT, matrix.block_start]
+    elif kind == "sweep":
+        lat = np.array([matrix.points[i].lat for i in matrix.block_start])
+        lon = np.array([matrix.points[i].lon for i in matrix.block_start])
+        d = matrix.points[DEPOT]
+        angle = np.arctan2(lat - d.lat, (lon - d.lon) * math.cos(math.radians(d.lat)))
+        offset = rng.uniform(0.0, 2 * math.pi) if jitter else 0.0
+        # Descending key == counter-clockwise sweep starting at `offset`.
+        key = -((angle - offset) % (2 * math.pi))
+    else:
+        raise ValueError(f"Unknown ordering: {kind}")
+
+    key = np.asarray(key, dtype=np.float64)
+    if jitter:
+        key = key * (1.0 + rng.uniform(-jitter, jitter, size=n))
+    return sorted(range(n), key=key.tolist().__getitem__, reverse=True)
+
+
+def regret_plan(
+    constraints: Constraints,
+    matrix: DistanceMatrix,
+    *,
+    neighbors: BlockNeighbors | None = None,
+    k: int = 3,
+    seed: int = 0,
+) -> list[NightRoute]:
+    """Regret-k insertion: place first the block that loses most by not getting its best night.
+
+    Regret is sum(c_i - c_1, i = 2..k) over the cheapest insertions into k distinct
+    nights, opening a new night counting as an option. Scores go stale as nights
+    change, so they are refreshed lazily when a block reaches the top of the heap.
+    """
+
+    build = Construction(constraints, matrix, neighbors)
+    check_max_nights(constraints, matrix, build.table)
+    rng = random.Random(seed)
+    open_cost = matrix.dist[DEPOT, matrix.block_start] + matrix.dist[matrix.block_end, DEPOT]
+
+    def regret(b: int) -> tuple[float, list]:
+        opts = build.options(b)
+        costs = sorted([o[0] for o in opts[:k]] + [float(open_cost[b])])
+        return sum(c - costs[0] for c in costs[1:k]), opts
+
+    heap = [(-regret(b)[0], rng.random(), b) for b in range(len(open_cost))]
+    heapq.heapify(heap)
+    while heap:
+        _, tie, b = heapq.heappop(heap)
+        score, opts = regret(b)
+        if heap and -score > heap[0][0]:
+            heapq.heappush(heap, (-score, tie, b))
+            continue
+        # Cheapest existing night; a new night only when none can take the block.
+        build.place(b, opts[0] if opts else None)
+    return build.nights
+
+
+def run_start(
+    constraints: Constraints,
+    matrix: DistanceMatrix,
+    start: int,
+    *,
+    neighbors: BlockNeighbors | None = None,
+    seed: int = 0,
+) -> tuple[list[NightRoute] | None, StartResult]:
+    kind = ORDERINGS[start % len(ORDERINGS)]
+    rnd = start // len(ORDERINGS)
+    res = StartResult(start=start, ordering=kind, seed=seed + start)
+    t0 = time.perf_counter()
+    try:
+        if kind == "regret":
+            nights = regret_plan(
+                constraints, matrix, neighbors=neighbors, k=2 + rnd % 3, seed=res.seed
+            )
+        else:
+            # Start 0 is exactly the default greedy_plan ordering.
+            order = start_order(kind, constraints, matrix, res.seed, 0.1 if rnd else 0.0)
+            nights = greedy_plan(
+                constraints, matrix.blocks, matrix, order=order, neighbors=neighbors
+            )
+    except ValueError as e:
+        res.error = str(e)
+        nights = None
+    else:
+        res.nights = len(nights)
+        res.deadhead_miles = sum(n.deadhead_miles for n in nights)
+    res.elapsed_s = time.perf_counter() - t0
+    return nights, res
+
+
+def _init_worker(constraints: Constraints, skeleton: DistanceMatrix, paths: tuple[str, str]):
+    global _WORKER
+    matrix = replace(
+        skeleton,
+        dist=np.load(paths[0], mmap_mode="r"),
+        time=np.load(paths[1], mmap_mode="r"),
+    )
+    matrix.cache.update(skeleton.cache)
+    neighbors = build_neighbors(
+        matrix, constraints.search.neighbors_k, constraints.search.exhaustive
+    )
+    _WORKER = (constraints, matrix, neighbors)
+
+
+def _start_worker(args: tuple[int, int]):
+    start, seed = args
+    constraints, matrix, neighbors = _WORKER
+    return run_start(constraints, matrix, start, neighbors=neighbors, seed=seed)
+
+
+def multi_start(
+    constraints: Constraints,
+    matrix: DistanceMatrix,
+    *,
+    starts: int,
+    workers: int = 0,
+    seed: int = 0,
+) -> tuple[list[NightRoute], list[StartResult]]:
+    """Run `starts` constructions with different orderings and keep the least deadhead.
+
+    Workers share the distance matrix through read-only ``.npy`` memmaps instead of
+    each receiving a pickled copy. ``workers=0`` uses every CPU. Raises the first
+    start's error if no start finds a feasible plan.
+    """
+
+    # Fails before any start; also leaves the bounds' block-pair scan in matrix.cache.
+    check_max_nights(constraints, matrix, service_table(constraints, matrix))
+    workers = min(workers or os.cpu_count() or 1, starts)
+    if workers <= 1:
+        neighbors = build_neighbors(
+            matrix, constraints.search.neighbors_k, constraints.search.exhaustive
+        )
+        runs = [
+            run_start(constraints, matrix, s, neighbors=neighbors, seed=seed) for s in range(starts)
+        ]
+    else:
+        with tempfile.TemporaryDirectory(prefix="routeopt-") as tmp:
+            paths = (str(Path(tmp) / "dist.npy"), str(Path(tmp) / "time.npy"))
+            np.save(paths[0], matrix.dist)
+            np.save(paths[1], matrix.time)
+            skeleton = replace(matrix, dist=None, time=None)
+            skeleton.cache.update(matrix.cache)  # O(blocks) arrays; spares each worker the scan
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(constraints, skeleton, paths),
+            ) as pool:
+                runs = list(pool.map(_start_worker, [(s, seed) for s in range(starts)]))
+
+    results = [res for _, res in runs]
+    feasible = [
+        (res.deadhead_miles, res.nights, res.start, nights) for nights, res in runs if nights
+    ]
+    if not feasible:
+        raise ValueError(results[0].error)
+    return min(feasible, key=lambda r: r[:3])[3], results
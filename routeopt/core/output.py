@@ -1,81 +1,137 @@
 from __future__ import annotations
 
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from routeopt.core.bounds import gap, lower_bounds
+from routeopt.core.matrix import DEPOT, DistanceMatrix
 from routeopt.core.solver import (
     NightRoute,
-    build_engine,
     estimate_night_deadhead,
-    estimate_night_hours,
     estimate_night_service,
+    service_table,
 )
 from routeopt.models.constraints import Constraints
-from routeopt.utils.geo import LatLon
 
+FORMATS = ("json", "compact", "ndjson", "csv")
+
+CSV_COLUMNS = (
+    "night_index",
+    "step",
+    "type",
+    "from",
+    "to",
+    "distance_miles",
+    "duration_hours",
+    "roadway_id",
+    "direction",
+    "bmp",
+    "emp",
+    "azimuth_deg",
+    "passes_required",
+    "service_distance_miles",
+    "speed_limit_mph",
+)
 
-def routes_to_json(constraints: Constraints, nights: list[NightRoute]) -> dict:
-    depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
-    all_blocks = [b for n in nights for b in n.blocks]
-    engine = build_engine(constraints, depot, all_blocks)
 
-    routes = []
+def plan_meta(constraints: Constraints, nights: list[NightRoute], matrix: DistanceMatrix) -> dict:
+    """The ``meta`` block of routes.json; totals are summed night by night, as in the routes.
+
+    ``lower_bound`` holds the bounds no plan for these blocks can beat, and
+    ``deadhead_gap`` how far above its bound this plan's deadhead is (0.1 = 10%).
+    """
+    table = service_table(constraints, matrix)
     total_dead = 0.0
     total_service = 0.0
+    for night in nights:
+        total_dead += estimate_night_deadhead(matrix, night.ids).distance_miles
+        total_service += estimate_night_service(table, night.ids).distance_miles
+    lb = lower_bounds(constraints, matrix, table)
+    return {
+        "total_nights": len(nights),
+        "total_deadhead_miles": round(total_dead, 4),
+        "total_service_miles": round(total_service, 4),
+        "lower_bound": {"nights": lb.nights, "deadhead_miles": round(lb.deadhead_miles, 4)},
+        "deadhead_gap": round(gap(total_dead, lb.deadhead_miles), 4),
+        "constraints": {
+            "max_hours_per_night": constraints.limits.max_hours_per_night,
+            "max_nights": constraints.limits.max_nights,
+            "routing_engine": constraints.routing_engine,
+            "loopback_mode": constraints.loopback.mode,
+        },
+    }
+
 
-    for idx, night in enumerate(nights, start=1):
-        dead = estimate_night_deadhead(engine, depot, night.blocks)
-        svc = estimate_night_service(constraints, engine, night.blocks)
-        dur_h = estimate_night_hours(constraints, engine, depot, night.blocks)
+def iter_routes(
+    constraints: Constraints,
+    nights: list[NightRoute],
+    matrix: DistanceMatrix,
+    *,
+    start: int = 1,
+) -> Iterator[dict]:
+    """The ``routes`` entries of routes.json, built one night at a time (numbered from `start`)."""
+    starts = matrix.block_start
+    ends = matrix.block_end
+    table = service_table(constraints, matrix)
 
-        total_dead += dead.distance_miles
-        total_service += svc.distance_miles
+    for idx, night in enumerate(nights, start=start):
+        dead = estimate_night_deadhead(matrix, night.ids)
+        svc = estimate_night_service(table, night.ids)
+        blocks = [table[k] for k in night.ids]
+        dur_h = dead.duration_hours + svc.duration_hours
 
         steps = []
-        if night.blocks:
+        if blocks:
             # depot -> first
-            leg = engine.dist_time(depot, night.blocks[0].start)
+            leg = matrix.leg(DEPOT, starts[night.ids[0]])
             steps.append(
                 {
                     "type": "deadhead",
                     "from": "Depot",
-                    "to": f"{night.blocks[0].roadway_id}:{night.blocks[0].direction}:start",
+                    "to": f"{blocks[0].roadway_id}:{blocks[0].direction}:start",
                     "distance_miles": round(leg.distance_miles, 4),
                     "duration_hours": round(leg.duration_hours, 4),
                 }
             )
 
-        for i, b in enumerate(night.blocks):
-            steps.append(
-                {
-                    "type": "service_block",
-                    "roadway_id": b.roadway_id,
-                    "direction": b.direction,
-                    "azimuth_deg": round(b.azimuth_deg, 2),
-                    "passes_required": b.passes_required,
-                    "service_distance_miles": round(b.service_distance_miles, 4),
-                    "speed_limit_mph": b.speed_limit_mph,
-                }
-            )
+        for i, b in enumerate(blocks):
+            step = {
+                "type": "service_block",
+                "roadway_id": b.roadway_id,
+                "direction": b.direction,
+                "azimuth_deg": round(b.azimuth_deg, 2),
+                "passes_required": b.passes_required,
+                "service_distance_miles": round(b.service_distance_miles, 4),
+                "speed_limit_mph": b.speed_limit_mph,
+            }
+            if b.bmp is not None and b.emp is not None:
+                step["bmp"] = round(b.bmp, 4)
+                step["emp"] = round(b.emp, 4)
+            steps.append(step)
             # between blocks
-            if i + 1 < len(night.blocks):
-                leg = engine.dist_time(b.end, night.blocks[i + 1].start)
+            if i + 1 < len(blocks):
+                leg = matrix.leg(ends[night.ids[i]], starts[night.ids[i + 1]])
                 steps.append(
                     {
                         "type": "deadhead",
                         "from": f"{b.roadway_id}:{b.direction}:end",
                         "to": (
-                            f"{night.blocks[i + 1].roadway_id}:"
-                            f"{night.blocks[i + 1].direction}:start"
+                            f"{blocks[i + 1].roadway_id}:"
+                            f"{blocks[i + 1].direction}:start"
                         ),
                         "distance_miles": round(leg.distance_miles, 4),
                         "duration_hours": round(leg.duration_hours, 4),
                     }
                 )
 
-        if night.blocks:
-            leg = engine.dist_time(night.blocks[-1].end, depot)
+        if blocks:
+            leg = matrix.leg(ends[night.ids[-1]], DEPOT)
             steps.append(
                 {
                     "type": "deadhead",
-                    "from": f"{night.blocks[-1].roadway_id}:{night.blocks[-1].direction}:end",
+                    "from": f"{blocks[-1].roadway_id}:{blocks[-1].direction}:end",
                     "to": "Depot",
                     "distance_miles": round(leg.distance_miles, 4),
                     "duration_hours": round(leg.duration_hours, 4),
@@ -84,30 +140,61 @@ def routes_to_json(constraints: Constraints, nights: list[NightRoute]) -> dict:
 
         buffer_h = max(0.0, constraints.limits.max_hours_per_night - dur_h)
 
-        routes.append(
-            {
-                "night_index": idx,
-                "duration_hours": round(dur_h, 4),
-                "deadhead_miles": round(dead.distance_miles, 4),
-                "deadhead_hours": round(dead.duration_hours, 4),
-                "service_miles": round(svc.distance_miles, 4),
-                "service_hours": round(svc.duration_hours, 4),
-                "buffer_hours": round(buffer_h, 4),
-                "steps": steps,
-            }
-        )
+        yield {
+            "night_index": idx,
+            "duration_hours": round(dur_h, 4),
+            "deadhead_miles": round(dead.distance_miles, 4),
+            "deadhead_hours": round(dead.duration_hours, 4),
+            "service_miles": round(svc.distance_miles, 4),
+            "service_hours": round(svc.duration_hours, 4),
+            "buffer_hours": round(buffer_h, 4),
+            "steps": steps,
+        }
+
 
+def routes_to_json(
+    constraints: Constraints, nights: list[NightRoute], matrix: DistanceMatrix
+) -> dict:
     return {
-        "meta": {
-            "total_nights": len(nights),
-            "total_deadhead_miles": round(total_dead, 4),
-            "total_service_miles": round(total_service, 4),
-            "constraints": {
-                "max_hours_per_night": constraints.limits.max_hours_per_night,
-                "max_nights": constraints.limits.max_nights,
-                "routing_engine": constraints.routing_engine,
-                "loopback_mode": constraints.loopback.mode,
-            },
-        },
-        "routes": routes,
+        "meta": plan_meta(constraints, nights, matrix),
+        "routes": list(iter_routes(constraints, nights, matrix)),
     }
+
+
+def write_plan(path: str | Path, meta: dict, routes: Iterable[dict], fmt: str = "json") -> None:
+    """Stream a plan to `path`, one night at a time.
+
+    ``json`` is byte-for-byte what ``json.dumps(plan, indent=2)`` gives; ``compact``
+    drops the whitespace; ``ndjson`` writes ``{"meta": ...}`` and then one night
+    per line; ``csv`` writes one row per step (no meta).
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    with Path(path).open("w", encoding="utf-8", newline="" if fmt == "csv" else None) as f:
+        if fmt == "csv":
+            w = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+            w.writeheader()
+            for route in routes:
+                for i, step in enumerate(route["steps"], start=1):
+                    w.writerow({"night_index": route["night_index"], "step": i, **step})
+        elif fmt == "ndjson":
+            f.write(json.dumps({"meta": meta}, separators=(",", ":")) + "\n")
+            for route in routes:
+                f.write(json.dumps(route, separators=(",", ":")) + "\n")
+        elif fmt == "compact":
+            sep = (",", ":")
+            f.write('{"meta":' + json.dumps(meta, separators=sep) + ',"routes":[')
+            for i, route in enumerate(routes):
+                f.write(("," if i else "") + json.dumps(route, separators=sep))
+            f.write("]}")
+        else:
+            # Nested values are re-indented to their depth; JSON strings never hold raw newlines.
+            f.write('{\n  "meta": ' + json.dumps(meta, indent=2).replace("\n", "\n  "))
+            f.write(',\n  "routes": [')
+            n = 0
+            for route in routes:
+                body = json.dumps(route, indent=2).replace("\n", "\n    ")
+                f.write(("," if n else "") + "\n    " + body)
+                n += 1
+            f.write("\n  ]\n}" if n else "]\n}")
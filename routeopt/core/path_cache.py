@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.csr import array_digest
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paths (
+    fp TEXT NOT NULL,
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    dist REAL NOT NULL,
+    time REAL NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (fp, a, b)
+) WITHOUT ROWID
+"""
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def graph_fingerprint(G, deadhead_speed_mph: float) -> str:
+    """Content hash of a routing graph: every (u, v, length) edge and the deadhead speed."""
+    m = G.number_of_edges()
+    u = np.empty(m, dtype=np.int64)
+    v = np.empty(m, dtype=np.int64)
+    length = np.empty(m, dtype=np.float64)
+    for e, (a, b, data) in enumerate(G.edges(data=True)):
+        u[e], v[e], length[e] = int(a), int(b), float(data.get("length", 0.0))
+    # Sorted, so the same edges loaded in another order hash the same.
+    order = np.lexsort((length, v, u))
+    return array_digest(u[order], v[order], length[order], extra=round(deadhead_speed_mph, 6))
+
+
+class PathCache:
+    """(node_from, node_to) -> (miles, hours) cache: an in-memory LRU in front of SQLite.
+
+    Rows are tagged with the graph fingerprint, so entries computed on another
+    graph (or at another deadhead speed) are never returned; one file serves every
+    graph. Each row records when it was last written or read, and closing the cache
+    drops the least recently used rows beyond `max_rows`. New entries (and read
+    times) are buffered and written in batches. With ``path=None`` only the LRU is used.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None,
+        fingerprint: str,
+        *,
+        memory_size: int = 200_000,
+        batch_size: int = 1_000,
+        max_rows: int = 5_000_000,
+    ):
+        self.fingerprint = fingerprint
+        self.memory_size = memory_size
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self._lru: OrderedDict[tuple[int, int], tuple[float, float]] = OrderedDict()
+        self._pending: list[tuple[str, int, int, float, float, int]] = []
+        self._read: set[tuple[int, int]] = set()  # legs served from disk, to mark as used
+        self._read_rows: set[int] = set()  # whole rows (see get_row) served from disk
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            p = Path(path).expanduser()
+            p.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(p, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(_SCHEMA)
+            columns = {r[1] for r in self._db.execute("PRAGMA table_info(paths)")}
+            if "used" not in columns:  # a cache file written before rows were aged
+                self._db.execute("ALTER TABLE paths ADD COLUMN used INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS paths_used ON paths (used)")
+            self._db.commit()
+
+    def _remember(self, key: tuple[int, int], dt: tuple[float, float]) -> None:
+        self._lru[key] = dt
+        if len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def get(self, a: int, b: int) -> tuple[float, float] | None:
+        key = (a, b)
+        dt = self._lru.get(key)
+        if dt is not None:
+            self._lru.move_to_end(key)
+            self.hits_memory += 1
+            return dt
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT dist, time FROM paths WHERE fp = ? AND a = ? AND b = ?",
+                (self.fingerprint, a, b),
+            ).fetchone()
+            if row is not None:
+                dt = (row[0], row[1])
+                self._remember(key, dt)
+                self._read.add(key)
+                self.hits_disk += 1
+                return dt
+        self.misses += 1
+        return None
+
+    def put(self, a: int, b: int, dt: tuple[float, float]) -> None:
+        self._remember((a, b), dt)
+        if self._db is not None:
+            self._pending.append((self.fingerprint, a, b, dt[0], dt[1], _now()))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def get_row(self, a: int, targets: list[int]) -> dict[int, tuple[float, float]] | None:
+        """All cached legs from `a` to `targets`, or None unless every target is cached."""
+        row: dict[int, tuple[float, float]] = {}
+        missing = []
+        for b in targets:
+            dt = self._lru.get((a, b))
+            if dt is None:
+                missing.append(b)
+            else:
+                row[b] = dt
+        from_memory = len(row)
+        if missing and self._db is not None:
+            self.flush()
+            want = set(missing)
+            for b, d, t in self._db.execute(
+                "SELECT b, dist, time FROM paths WHERE fp = ? AND a = ?", (self.fingerprint, a)
+            ):
+                if b in want:
+                    row[b] = (d, t)
+                    want.discard(b)
+            missing = list(want)
+            if not missing:
+                self._read_rows.add(a)
+        if missing:
+            self.misses += len(targets)
+            return None
+        self.hits_memory += from_memory
+        self.hits_disk += len(targets) - from_memory
+        return row
+
+    def put_row(self, a: int, row: dict[int, tuple[float, float]]) -> None:
+        """Store a whole one-to-many row; written straight to disk, bypassing the LRU."""
+        if self._db is None:
+            for b, dt in row.items():
+                self._remember((a, b), dt)
+            return
+        now = _now()
+        self._pending.extend((self.fingerprint, a, b, d, t, now) for b, (d, t) in row.items())
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._db is None or not (self._pending or self._read or self._read_rows):
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO paths (fp, a, b, dist, time, used) VALUES (?, ?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        now = _now()
+        self._db.executemany(
+            "UPDATE paths SET used = ? WHERE fp = ? AND a = ? AND b = ?",
+            [(now, self.fingerprint, a, b) for a, b in self._read],
+        )
+        self._db.executemany(
+            "UPDATE paths SET used = ? WHERE fp = ? AND a = ?",
+            [(now, self.fingerprint, a) for a in self._read_rows],
+        )
+        self._db.commit()
+        self._pending.clear()
+        self._read.clear()
+        self._read_rows.clear()
+
+    def _evict(self) -> None:
+        """Drop the least recently used rows (of any graph) beyond `max_rows`."""
+        (count,) = self._db.execute("SELECT COUNT(*) FROM paths").fetchone()
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM paths WHERE (fp, a, b) IN "
+                "(SELECT fp, a, b FROM paths ORDER BY used LIMIT ?)",
+                (count - self.max_rows,),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        if self._db is not None:
+            self._evict()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
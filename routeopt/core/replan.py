@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.bounds import check_max_nights, gap
+from routeopt.core.matrix import DistanceMatrix
+from routeopt.core.solver import Construction, NightRoute, night_from_ids
+from routeopt.core.tasks import BlockTable, ServiceBlock
+from routeopt.models.constraints import Constraints
+
+
+@dataclass
+class ReplanStats:
+    frozen_nights: int = 0
+    kept_nights: int = 0  # previous nights still in the plan (possibly with blocks added/removed)
+    dissolved_nights: int = 0  # previous nights over the hour limit, re-planned block by block
+    kept_blocks: int = 0
+    changed_blocks: int = 0
+    removed_blocks: int = 0
+    inserted_blocks: int = 0  # new, changed, or from dissolved nights
+    new_nights: int = 0
+
+
+def parse_night_list(spec: str | None) -> set[int]:
+    """Night numbers from a spec such as ``"1-5,8"`` (1-based, as in routes.json)."""
+    out: set[int] = set()
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        try:
+            a, b = int(lo), int(hi or lo)
+        except ValueError as e:
+            raise ValueError(f"Invalid night list: {spec!r}") from e
+        if a < 1 or b < a:
+            raise ValueError(f"Invalid night range: {part!r}")
+        out.update(range(a, b + 1))
+    return out
+
+
+def load_previous(path: str | Path) -> list[dict]:
+    """The routes of a routes.json written by `routeopt plan`."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    routes = data.get("routes") if isinstance(data, dict) else None
+    if not isinstance(routes, list):
+        raise ValueError(f"{path} is not a routes.json file (no 'routes' list)")
+    return routes
+
+
+def _mp(v: float | None) -> float | None:
+    return None if v is None else round(float(v), 4)
+
+
+def _step_key(step: dict) -> tuple:
+    return (str(step["roadway_id"]), step["direction"], _mp(step.get("bmp")), _mp(step.get("emp")))
+
+
+def _block_key(b: ServiceBlock) -> tuple:
+    return (b.roadway_id, b.direction, _mp(b.bmp), _mp(b.emp))
+
+
+def _step_sig(step: dict) -> tuple:
+    return (
+        int(step["passes_required"]),
+        round(float(step["service_distance_miles"]), 4),
+        float(step["speed_limit_mph"]),
+    )
+
+
+def _block_sig(b: ServiceBlock) -> tuple:
+    return (b.passes_required, round(b.service_distance_miles, 4), b.speed_limit_mph)
+
+
+def _service_steps(route: dict) -> list[dict]:
+    return [s for s in route.get("steps", []) if s.get("type") == "service_block"]
+
+
+def split_frozen(routes: list[dict], frozen: set[int]) -> tuple[list[dict], list[dict]]:
+    """(frozen routes, open routes) by the routes' 1-based ``night_index``."""
+    known = {int(r["night_index"]) for r in routes}
+    missing = sorted(frozen - known)
+    if missing:
+        raise ValueError(f"Frozen nights not in the previous plan: {missing}")
+    return (
+        [r for r in routes if int(r["night_index"]) in frozen],
+        [r for r in routes if int(r["night_index"]) not in frozen],
+    )
+
+
+def pending_rows(table: BlockTable, frozen_routes: list[dict]) -> np.ndarray:
+    """Rows of `table` still to be planned: everything not already served by a frozen night.
+
+    Frozen nights have been driven, so their blocks count as done even when the
+    input changed them since.
+    """
+
+    done: dict[tuple, int] = {}
+    for route in frozen_routes:
+        for step in _service_steps(route):
+            key = _step_key(step)
+            done[key] = done.get(key, 0) + 1
+    keep = []
+    for k in range(len(table)):
+        key = _block_key(table[k])
+        if done.get(key, 0):
+            done[key] -= 1
+        else:
+            keep.append(k)
+    return np.array(keep, dtype=np.int64)
+
+
+def match_routes(routes: list[dict], table: BlockTable, stats: ReplanStats) -> list[list[int]]:
+    """Rows of `table` served by each previous route, in driving order.
+
+    Blocks are matched to service steps by roadway id, direction and BMP/EMP;
+    matches whose passes, length or speed differ count as changed and are left
+    out, as are steps with no block any more (removed).
+    """
+
+    by_key: dict[tuple, list[int]] = {}
+    for k in range(len(table)):
+        by_key.setdefault(_block_key(table[k]), []).append(k)
+    for ids in by_key.values():
+        ids.reverse()  # pop() hands out duplicates in input order
+
+    out = []
+    for route in routes:
+        ids = []
+        for step in _service_steps(route):
+            cands = by_key.get(_step_key(step))
+            if not cands:
+                stats.removed_blocks += 1
+                continue
+            k = cands.pop()
+            if _block_sig(table[k]) == _step_sig(step):
+                ids.append(k)
+            else:
+                stats.changed_blocks += 1
+        out.append(ids)
+    return out
+
+
+def replan(
+    constraints: Constraints,
+    routes: list[dict],
+    matrix: DistanceMatrix,
+    *,
+    reserved_nights: int = 0,
+) -> tuple[list[NightRoute], ReplanStats]:
+    """Carry the previous (open) nights over to the new input and insert only what changed.
+
+    Unchanged blocks (see `match_routes`) stay where they were, in the same order;
+    the rest are inserted at their cheapest feasible position (new nights only
+    when nothing fits). `reserved_nights` (the frozen ones) count towards max_nights.
+    """
+
+    stats = ReplanStats(frozen_nights=reserved_nights)
+    limits = constraints.limits.model_copy(
+        update={"max_nights": constraints.limits.max_nights - reserved_nights}
+    )
+    pending = constraints.model_copy(update={"limits": limits})
+    build = Construction(pending, matrix)
+    check_max_nights(pending, matrix, build.table)
+
+    placed: set[int] = set()
+    nights: list[NightRoute] = []
+    for ids in match_routes(routes, matrix.blocks, stats):
+        if not ids:
+            continue
+        night = night_from_ids(matrix, build.svc_h, ids)
+        if night.hours > build.max_h + 1e-9:
+            stats.dissolved_nights += 1
+            continue
+        nights.append(night)
+        placed.update(ids)
+
+    if len(nights) > limits.max_nights:
+        raise ValueError("Cannot schedule within max_nights constraint")
+    stats.kept_nights = len(nights)
+    stats.kept_blocks = len(placed)
+    build.load(nights)
+    todo = [k for k in range(len(matrix.blocks)) if k not in placed]
+    stats.inserted_blocks = len(todo)
+    for k in sorted(todo, key=build.svc_h.__getitem__, reverse=True):
+        opts = build.options(k)
+        build.place(k, opts[0] if opts else None)
+    stats.new_nights = len(build.nights) - stats.kept_nights
+    return build.nights, stats
+
+
+def with_frozen(out: dict, frozen_routes: list[dict]) -> dict:
+    """Put the frozen routes, verbatim, in front of a freshly written plan and renumber.
+
+    Totals, lower bounds and the deadhead gap in the meta then cover the whole plan.
+
+    `out` may carry the meta only (``"routes": []``) when its routes are streamed
+    separately, numbered from ``len(frozen_routes) + 1``.
+    """
+    if not frozen_routes:
+        return out
+    routes = [*frozen_routes, *out["routes"]]
+    for i, route in enumerate(routes, start=1):
+        route["night_index"] = i
+    meta = out["meta"]
+    frozen_dead = sum(float(r["deadhead_miles"]) for r in frozen_routes)
+    meta["total_nights"] += len(frozen_routes)
+    meta["total_deadhead_miles"] = round(meta["total_deadhead_miles"] + frozen_dead, 4)
+    if "lower_bound" in meta:
+        # Frozen nights are fixed: they add exactly their own nights and deadhead to the bound.
+        bound = meta["lower_bound"]
+        bound["nights"] += len(frozen_routes)
+        bound["deadhead_miles"] = round(bound["deadhead_miles"] + frozen_dead, 4)
+        meta["deadhead_gap"] = round(gap(meta["total_deadhead_miles"], bound["deadhead_miles"]), 4)
+    meta["total_service_miles"] = round(
+        meta["total_service_miles"] + sum(float(r["service_miles"]) for r in frozen_routes), 4
+    )
+    meta["frozen_nights"] = len(frozen_routes)
+    out["routes"] = routes
+    return out
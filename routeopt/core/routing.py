@@ -3,10 +3,18 @@ from __future__ import annotations
 import importlib
 import math
 from dataclasses import dataclass
-from functools import lru_cache
 from typing import TYPE_CHECKING, Protocol
 
-from routeopt.utils.geo import LatLon, haversine_miles
+import numpy as np
+
+from routeopt.core import instrument
+from routeopt.core.csr import CSRGraph
+from routeopt.core.dijkstra import build_adjacency, many_to_many
+from routeopt.core.graph_cache import BBox, GraphCache, load_graph_file
+from routeopt.core.path_cache import PathCache, graph_fingerprint
+from routeopt.core.snapping import EdgeSnapper
+from routeopt.core.spatial import GridIndex
+from routeopt.utils.geo import LatLon, haversine_miles, haversine_miles_array
 
 
 class RoutingEngine(Protocol):
@@ -29,10 +37,99 @@ class EuclideanRouting:
     deadhead_speed_mph: float
 
     def dist_time(self, a: LatLon, b: LatLon) -> DistTime:
+        instrument.count("routing.dist_time")
         mi = haversine_miles(a, b)
         h = mi / max(1e-6, self.deadhead_speed_mph)
         return DistTime(distance_miles=mi, duration_hours=h)
 
+    def dist_time_matrix(self, points: list[LatLon]) -> tuple[np.ndarray, np.ndarray]:
+        lat = np.fromiter((p.lat for p in points), dtype=np.float64, count=len(points))
+        lon = np.fromiter((p.lon for p in points), dtype=np.float64, count=len(points))
+        mi = haversine_miles_array(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        np.fill_diagonal(mi, 0.0)
+        return mi, mi / max(1e-6, self.deadhead_speed_mph)
+
+
+def _import_osmnx():
+    try:
+        return importlib.import_module("osmnx")
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError(
+            "OSM routing requires optional dependencies. Install with: pip install -e '.[osm]'"
+        ) from e
+
+
+def bbox_around(depot: LatLon, points: list[LatLon], buffer_miles: float) -> BBox:
+    all_pts = [depot, *points]
+    lats = [p.lat for p in all_pts]
+    lons = [p.lon for p in all_pts]
+
+    dlat = buffer_miles / 69.0
+    lat0 = sum(lats) / len(lats)
+    dlon = buffer_miles / (69.0 * max(1e-6, abs(math.cos(math.radians(lat0)))))
+
+    return BBox(
+        north=max(lats) + dlat,
+        south=min(lats) - dlat,
+        east=max(lons) + dlon,
+        west=min(lons) - dlon,
+    )
+
+
+def prepare_edges(G, deadhead_speed_mph: float) -> None:
+    # Cached graphs keep their edge weights; only time depends on the deadhead speed.
+    if G.graph.get("_routeopt_speed_mph") == deadhead_speed_mph:
+        return
+    for _u, _v, _k, data in G.edges(keys=True, data=True):
+        length_m = float(data.get("length", 0.0))
+        miles = length_m / 1609.344
+        data["_dist_miles"] = miles
+        data["_time_h"] = miles / deadhead_speed_mph
+    G.graph["_routeopt_speed_mph"] = deadhead_speed_mph
+
+
+def acquire_osm_graph(
+    bbox: BBox,
+    network_type: str,
+    graph_path: str | None,
+    cache_dir: str | None,
+    deadhead_speed_mph: float,
+):
+    """Offline graph file > covering cached graph > fresh download (then cached)."""
+    if graph_path:
+        ox = _import_osmnx() if graph_path.lower().endswith(".graphml") else None
+        G = load_graph_file(graph_path, ox)
+        prepare_edges(G, deadhead_speed_mph)
+        return G
+
+    cache = GraphCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        hit = cache.find(bbox, network_type)
+        if hit is not None:
+            G = load_graph_file(hit)
+            prepare_edges(G, deadhead_speed_mph)
+            return G
+
+    G = _import_osmnx().graph_from_bbox(
+        bbox.north, bbox.south, bbox.east, bbox.west, network_type=network_type
+    )
+    prepare_edges(G, deadhead_speed_mph)
+    if cache is not None:
+        cache.store(G, bbox, network_type)
+    return G
+
+
+def _snap(
+    snapper: EdgeSnapper, points: list[LatLon], headings: list[float | None] | None
+) -> np.ndarray:
+    lat = np.fromiter((p.lat for p in points), dtype=np.float64, count=len(points))
+    lon = np.fromiter((p.lon for p in points), dtype=np.float64, count=len(points))
+    instrument.count("routing.snapped_points", len(points))
+    h = None
+    if headings is not None:
+        h = np.array([np.nan if x is None else x for x in headings], dtype=np.float64)
+    return snapper.snap(lat, lon, h)
+
 
 class OSMnxRouting:
     """OSMnx-based shortest path routing (distance + time).
@@ -49,6 +146,13 @@ class OSMnxRouting:
         points: list[LatLon],
         buffer_miles: float,
         deadhead_speed_mph: float,
+        network_type: str = "drive",
+        graph_path: str | None = None,
+        cache_dir: str | None = None,
+        path_cache: str | None = None,
+        workers: int = 0,
+        snap_candidates: int = 8,
+        snap_max_angle_deg: float = 60.0,
     ):
         try:
             ox = importlib.import_module("osmnx")
@@ -61,34 +165,39 @@ class OSMnxRouting:
         self._ox = ox
         self._nx = nx
         self._deadhead_speed_mph = max(1e-6, deadhead_speed_mph)
+        self._workers = workers
 
-        all_pts = [depot, *points]
-        lats = [p.lat for p in all_pts]
-        lons = [p.lon for p in all_pts]
-
-        dlat = buffer_miles / 69.0
-        lat0 = sum(lats) / len(lats)
-        dlon = buffer_miles / (69.0 * max(1e-6, abs(math.cos(math.radians(lat0)))))
-
-        north = max(lats) + dlat
-        south = min(lats) - dlat
-        east = max(lons) + dlon
-        west = min(lons) - dlon
+        bbox = bbox_around(depot, points, buffer_miles)
+        self._G = acquire_osm_graph(
+            bbox, network_type, graph_path, cache_dir, self._deadhead_speed_mph
+        )
+        # Per-instance caches (an lru_cache on a method would pin every engine alive).
+        self._snapped: dict[tuple[float, float], int] = {}
+        self._paths = PathCache(path_cache, graph_fingerprint(self._G, self._deadhead_speed_mph))
+        self._snapper, self._snap_ids = EdgeSnapper.from_networkx(
+            self._G, k=snap_candidates, max_angle_deg=snap_max_angle_deg
+        )
+        self._csr_graph: CSRGraph | None = None
 
-        self._G = ox.graph_from_bbox(north, south, east, west, network_type="drive")
-
-        for _u, _v, _k, data in self._G.edges(keys=True, data=True):
-            length_m = float(data.get("length", 0.0))
-            miles = length_m / 1609.344
-            data["_dist_miles"] = miles
-            data["_time_h"] = miles / self._deadhead_speed_mph
-
-    @lru_cache(maxsize=100_000)
     def _nearest_node(self, lat: float, lon: float) -> int:
-        return int(self._ox.distance.nearest_nodes(self._G, X=lon, Y=lat))
+        node = self._snapped.get((lat, lon))
+        if node is None:
+            instrument.count("routing.nearest_node")
+            node = int(self._ox.distance.nearest_nodes(self._G, X=lon, Y=lat))
+            self._snapped[(lat, lon)] = node
+        return node
+
+    def snap_points(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> list[int]:
+        """Graph node per point in one batched query, on the carriageway matching `headings`."""
+        return self._snap_ids[_snap(self._snapper, points, headings)].tolist()
 
-    @lru_cache(maxsize=200_000)
     def _shortest_dist_time(self, a_node: int, b_node: int) -> DistTime:
+        hit = self._paths.get(a_node, b_node)
+        if hit is not None:
+            return DistTime(distance_miles=hit[0], duration_hours=hit[1])
+
         path = self._nx.shortest_path(self._G, a_node, b_node, weight="_dist_miles")
         dist = 0.0
         time_h = 0.0
@@ -102,9 +211,259 @@ class OSMnxRouting:
             if best:
                 dist += best[0]
                 time_h += best[1]
+        self._paths.put(a_node, b_node, (dist, time_h))
         return DistTime(distance_miles=dist, duration_hours=time_h)
 
+    def _csr(self) -> CSRGraph:
+        if self._csr_graph is None:
+            self._csr_graph = CSRGraph.from_networkx(self._G, self._deadhead_speed_mph)
+        return self._csr_graph
+
+    def path_graph(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> tuple[CSRGraph, np.ndarray]:
+        """The drive graph as CSR arrays and each point's node position, snapped as for matrices."""
+        graph = self._csr()
+        return graph, np.searchsorted(graph.node_ids, self.snap_points(points, headings))
+
     def dist_time(self, a: LatLon, b: LatLon) -> DistTime:
+        instrument.count("routing.dist_time")
         a_node = self._nearest_node(a.lat, a.lon)
         b_node = self._nearest_node(b.lat, b.lon)
         return self._shortest_dist_time(a_node, b_node)
+
+    def dist_time_matrix(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Fill the full matrix with one Dijkstra per distinct origin node.
+
+        Rows already in the routing cache are reused; unreachable pairs are inf.
+        """
+
+        nodes = self.snap_points(points, headings)
+        uniq = sorted(set(nodes))
+        col = {n: i for i, n in enumerate(uniq)}
+
+        rows: dict[int, dict[int, tuple[float, float]]] = {}
+        todo = []
+        for a in uniq:
+            row = self._paths.get_row(a, uniq)
+            if row is None:
+                todo.append(a)
+            else:
+                rows[a] = row
+        if todo:
+            adj = build_adjacency(self._G)
+            fresh = many_to_many(adj, todo, uniq, workers=self._workers)
+            for a, row in fresh.items():
+                row = {b: row.get(b, (math.inf, math.inf)) for b in uniq}
+                self._paths.put_row(a, row)
+                rows[a] = row
+            self._paths.flush()
+
+        u = len(uniq)
+        sub_d = np.full((u, u), np.inf)
+        sub_t = np.full((u, u), np.inf)
+        for a, row in rows.items():
+            i = col[a]
+            for b, (d, t) in row.items():
+                sub_d[i, col[b]] = d
+                sub_t[i, col[b]] = t
+        idx = np.fromiter((col[n] for n in nodes), dtype=np.int64, count=len(nodes))
+        dist = sub_d[np.ix_(idx, idx)]
+        time = sub_t[np.ix_(idx, idx)]
+        np.fill_diagonal(dist, 0.0)
+        np.fill_diagonal(time, 0.0)
+        return dist, time
+
+    def cache_stats(self) -> dict:
+        return self._paths.stats()
+
+    def flush(self) -> None:
+        """Write pending routing-cache entries; the engine stays usable."""
+        self._paths.flush()
+
+    def close(self) -> None:
+        """Flush pending routing-cache writes."""
+        self._paths.close()
+
+
+class CSRRouting:
+    """Shortest paths over a compact CSR copy of the OSM drive graph.
+
+    The networkx graph is converted once (and cached as ``.npz`` next to the
+    pickled graphs), then matrices are filled by ``scipy.sparse.csgraph.dijkstra``
+    over batches of sources. Requires extras: `pip install -e '.[osm]'`
+    """
+
+    def __init__(
+        self,
+        *,
+        depot: LatLon,
+        points: list[LatLon],
+        buffer_miles: float,
+        deadhead_speed_mph: float,
+        network_type: str = "drive",
+        graph_path: str | None = None,
+        cache_dir: str | None = None,
+        path_cache: str | None = None,
+        snap_candidates: int = 8,
+        snap_max_angle_deg: float = 60.0,
+    ):
+        try:
+            self._csgraph = importlib.import_module("scipy.sparse.csgraph")
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError(
+                "CSRRouting requires scipy. Install with: pip install -e '.[osm]'"
+            ) from e
+
+        speed = max(1e-6, deadhead_speed_mph)
+        bbox = bbox_around(depot, points, buffer_miles)
+        self.graph = self._acquire(bbox, network_type, graph_path, cache_dir, speed)
+        self._W = self.graph.matrix("length")
+        # Uniform deadhead speed: time along the shortest path is just distance / speed.
+        self._uniform = bool(
+            np.allclose(self.graph.time, self.graph.length / np.float32(speed), rtol=1e-5)
+        )
+        self._T = None if self._uniform else self.graph.matrix("time")
+        self._snap_index = GridIndex(self.graph.y, self.graph.x)
+        self._snapper = EdgeSnapper.from_csr(
+            self.graph, k=snap_candidates, max_angle_deg=snap_max_angle_deg
+        )
+        self._snapped: dict[tuple[float, float], int] = {}
+        self._paths = PathCache(path_cache, self.graph.fingerprint())
+
+    @staticmethod
+    def _acquire(
+        bbox: BBox,
+        network_type: str,
+        graph_path: str | None,
+        cache_dir: str | None,
+        speed: float,
+    ) -> CSRGraph:
+        if graph_path and graph_path.lower().endswith(".npz"):
+            return CSRGraph.load(graph_path).with_speed(speed)
+        cache = GraphCache(cache_dir) if cache_dir and not graph_path else None
+        if cache is not None:
+            hit = cache.find(bbox, network_type, suffix=".npz")
+            if hit is not None:
+                return CSRGraph.load(hit).with_speed(speed)
+
+        G = acquire_osm_graph(bbox, network_type, graph_path, cache_dir, speed)
+        graph = CSRGraph.from_networkx(G, speed)
+        del G  # only the CSR arrays are kept
+        if cache is not None:
+            cache.store_with(graph.save, bbox, network_type, ".npz")
+        return graph
+
+    def _nearest_node(self, lat: float, lon: float) -> int:
+        node = self._snapped.get((lat, lon))
+        if node is None:
+            instrument.count("routing.nearest_node")
+            node = int(self._snap_index.nearest(lat, lon, 1)[0])
+            self._snapped[(lat, lon)] = node
+        return node
+
+    def snap_points(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> np.ndarray:
+        """Node position per point in one batched query, on the carriageway matching `headings`."""
+        return _snap(self._snapper, points, headings)
+
+    def _batch_size(self) -> int:
+        # Keep each (batch x nodes) float64 distance block around 160 MB.
+        return max(1, min(256, 20_000_000 // max(1, self.graph.num_nodes)))
+
+    def _rows(self, sources: np.ndarray, targets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(len(sources), len(targets)) distance and time blocks."""
+        if self._uniform:
+            d = self._csgraph.dijkstra(self._W, directed=True, indices=sources)[:, targets]
+            return d, d / self.graph.speed_mph
+
+        d, pred = self._csgraph.dijkstra(
+            self._W, directed=True, indices=sources, return_predecessors=True
+        )
+        t = np.vstack([self._path_times(pred[r], s, targets) for r, s in enumerate(sources)])
+        t[~np.isfinite(d[:, targets])] = np.inf
+        return d[:, targets], t
+
+    def _path_times(self, pred: np.ndarray, source: int, targets: np.ndarray) -> np.ndarray:
+        """Sum edge times along predecessor chains, walking all targets at once."""
+        cur = np.array(targets, dtype=np.int64)
+        acc = np.zeros(len(cur), dtype=np.float64)
+        active = (cur != source) & (pred[cur] >= 0)
+        while active.any():
+            c = cur[active]
+            p = pred[c]
+            acc[active] += np.asarray(self._T[p, c], dtype=np.float64).ravel()
+            cur[active] = p
+            active = (cur != source) & (pred[cur] >= 0)
+        return acc
+
+    def path_graph(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> tuple[CSRGraph, np.ndarray]:
+        """The drive graph and each point's node position, snapped as for matrices."""
+        return self.graph, self.snap_points(points, headings)
+
+    def dist_time_matrix(
+        self, points: list[LatLon], headings: list[float | None] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        nodes = self.snap_points(points, headings)
+        uniq, inv = np.unique(nodes, return_inverse=True)
+        targets = uniq.tolist()
+        u = len(uniq)
+        sub_d = np.full((u, u), np.inf)
+        sub_t = np.full((u, u), np.inf)
+
+        todo = []
+        for i, a in enumerate(targets):
+            row = self._paths.get_row(a, targets)
+            if row is None:
+                todo.append(i)
+                continue
+            sub_d[i] = [row[b][0] for b in targets]
+            sub_t[i] = [row[b][1] for b in targets]
+
+        step = self._batch_size()
+        for lo in range(0, len(todo), step):
+            rows = np.array(todo[lo : lo + step], dtype=np.int64)
+            d, t = self._rows(uniq[rows], uniq)
+            sub_d[rows] = d
+            sub_t[rows] = t
+            for r, i in enumerate(rows.tolist()):
+                self._paths.put_row(
+                    targets[i], {b: (float(d[r, j]), float(t[r, j])) for j, b in enumerate(targets)}
+                )
+            if instrument.due():
+                done = min(lo + step, len(todo))
+                instrument.progress(f"matrix: {done}/{len(todo)} source nodes routed")
+        self._paths.flush()
+
+        dist = sub_d[np.ix_(inv, inv)]
+        time = sub_t[np.ix_(inv, inv)]
+        np.fill_diagonal(dist, 0.0)
+        np.fill_diagonal(time, 0.0)
+        return dist, time
+
+    def dist_time(self, a: LatLon, b: LatLon) -> DistTime:
+        instrument.count("routing.dist_time")
+        a_node = self._nearest_node(a.lat, a.lon)
+        b_node = self._nearest_node(b.lat, b.lon)
+        hit = self._paths.get(a_node, b_node)
+        if hit is None:
+            d, t = self._rows(np.array([a_node]), np.array([b_node]))
+            hit = (float(d[0, 0]), float(t[0, 0]))
+            self._paths.put(a_node, b_node, hit)
+        return DistTime(distance_miles=hit[0], duration_hours=hit[1])
+
+    def cache_stats(self) -> dict:
+        return self._paths.stats()
+
+    def flush(self) -> None:
+        """Write pending routing-cache entries; the engine stays usable."""
+        self._paths.flush()
+
+    def close(self) -> None:
+        """Flush pending routing-cache writes."""
+        self._paths.close()
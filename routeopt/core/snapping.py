@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import importlib
+
+import numpy as np
+
+from routeopt.core.spatial import project_miles
+
+
+def angle_diff_deg(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Absolute difference between bearings, in [0, 180]."""
+    return np.abs((np.asarray(a) - np.asarray(b) + 180.0) % 360.0 - 180.0)
+
+
+class EdgeSnapper:
+    """Bulk snapping of points onto directed graph edges.
+
+    All points are matched against the k nearest edges (by edge midpoint) in
+    one KD-tree query. When a heading is known, candidate edges whose bearing
+    differs by more than ``max_angle_deg`` are discarded, so a point on one
+    carriageway of a divided road is not snapped onto the opposite one. The
+    point then snaps to the nearer end node of the closest remaining edge.
+    """
+
+    def __init__(
+        self,
+        tail: np.ndarray,
+        head: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        *,
+        k: int = 8,
+        max_angle_deg: float = 60.0,
+    ):
+        try:
+            spatial = importlib.import_module("scipy.spatial")
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError(
+                "Edge snapping requires scipy. Install with: pip install -e '.[osm]'"
+            ) from e
+
+        self.tail = np.asarray(tail)
+        self.head = np.asarray(head)
+        self.k = max(1, min(k, len(self.tail)))
+        self.max_angle_deg = max_angle_deg
+        self._lat0 = float(np.mean(y))
+        # x/y are lon/lat of the node at each position referenced by tail/head.
+        px, py = project_miles(y, x, self._lat0)
+        self._ax, self._ay = px[self.tail], py[self.tail]
+        self._bx, self._by = px[self.head], py[self.head]
+        dx, dy = self._bx - self._ax, self._by - self._ay
+        self._len2 = dx * dx + dy * dy
+        self.bearing = np.degrees(np.arctan2(dx, dy)) % 360.0
+        mid = np.column_stack(((self._ax + self._bx) / 2.0, (self._ay + self._by) / 2.0))
+        self._tree = spatial.cKDTree(mid)
+
+    @classmethod
+    def from_csr(cls, graph, **kw) -> EdgeSnapper:
+        """Snap to CSR node positions."""
+        tail = np.repeat(np.arange(graph.num_nodes), np.diff(graph.indptr))
+        return cls(tail, graph.indices.astype(np.int64), graph.x, graph.y, **kw)
+
+    @classmethod
+    def from_networkx(cls, G, **kw) -> tuple[EdgeSnapper, np.ndarray]:
+        """Snapper over graph node positions, plus the position -> node id array."""
+        node_ids = np.array(list(G.nodes), dtype=np.int64)
+        pos = {int(n): i for i, n in enumerate(node_ids)}
+        x = np.array([float(G.nodes[n]["x"]) for n in node_ids])
+        y = np.array([float(G.nodes[n]["y"]) for n in node_ids])
+        uv = np.array([(pos[int(u)], pos[int(v)]) for u, v in G.edges()], dtype=np.int64)
+        return cls(uv[:, 0], uv[:, 1], x, y, **kw), node_ids
+
+    def snap(
+        self, lat: np.ndarray, lon: np.ndarray, heading: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Node position for every point; ``heading`` entries may be NaN (no filter)."""
+        px, py = project_miles(np.asarray(lat), np.asarray(lon), self._lat0)
+        _, cand = self._tree.query(np.column_stack((px, py)), k=self.k)
+        cand = cand.reshape(len(px), self.k)
+
+        ax, ay = self._ax[cand], self._ay[cand]
+        dx, dy = self._bx[cand] - ax, self._by[cand] - ay
+        len2 = self._len2[cand]
+        t = ((px[:, None] - ax) * dx + (py[:, None] - ay) * dy) / np.where(len2 > 0, len2, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        d2 = (ax + t * dx - px[:, None]) ** 2 + (ay + t * dy - py[:, None]) ** 2
+
+        if heading is not None:
+            h = np.asarray(heading, dtype=np.float64)
+            wrong_way = angle_diff_deg(self.bearing[cand], h[:, None]) > self.max_angle_deg
+            wrong_way &= ~np.isnan(h)[:, None]
+            # Points whose candidates all point the wrong way keep the plain nearest edge.
+            wrong_way &= ~wrong_way.all(axis=1)[:, None]
+            d2 = np.where(wrong_way, np.inf, d2)
+
+        best = np.argmin(d2, axis=1)
+        rows = np.arange(len(px))
+        edge = cand[rows, best]
+        return np.where(t[rows, best] < 0.5, self.tail[edge], self.head[edge])
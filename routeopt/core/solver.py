@@ -1,9 +1,21 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-
-from routeopt.core.routing import DistTime, EuclideanRouting, OSMnxRouting, RoutingEngine
-from routeopt.core.tasks import ServiceBlock
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from routeopt.core import instrument
+from routeopt.core.bounds import check_max_nights
+from routeopt.core.matrix import DEPOT, DistanceMatrix, build_matrix
+from routeopt.core.routing import (
+    CSRRouting,
+    DistTime,
+    EuclideanRouting,
+    OSMnxRouting,
+    RoutingEngine,
+)
+from routeopt.core.spatial import BlockNeighbors, build_neighbors
+from routeopt.core.tasks import BlockTable, ServiceBlock, as_block_table
 from routeopt.models.constraints import Constraints
 from routeopt.utils.geo import LatLon
 
@@ -16,27 +28,61 @@ class Step:
 
 @dataclass
 class NightRoute:
-    blocks: list[ServiceBlock] = field(default_factory=list)
+    ids: list[int] = field(default_factory=list)  # block indices (BlockTable / matrix rows)
+    # Cached totals, kept current by the solver on every insertion.
+    deadhead_miles: float = 0.0
+    deadhead_hours: float = 0.0
+    service_hours: float = 0.0  # service + loopback
+
+    @property
+    def hours(self) -> float:
+        return self.deadhead_hours + self.service_hours
 
 
 def build_engine(
-    constraints: Constraints, depot: LatLon, blocks: list[ServiceBlock]
+    constraints: Constraints, depot: LatLon, blocks: BlockTable | list[ServiceBlock]
 ) -> RoutingEngine:
     mph = max(1e-6, constraints.speed.deadhead_speed_mph * constraints.speed.deadhead_factor)
-    if constraints.routing_engine == "osmnx":
-        pts: list[LatLon] = []
-        for b in blocks:
-            pts.append(b.start)
-            pts.append(b.end)
-        return OSMnxRouting(
+    if constraints.routing_engine in ("osmnx", "csr"):
+        table = as_block_table(blocks)
+        pts = [table.point(i) for i in range(len(table.poi_lat))]
+        common = dict(
             depot=depot,
             points=pts,
             buffer_miles=constraints.osm_buffer_miles,
             deadhead_speed_mph=mph,
+            network_type=constraints.osm_network_type,
+            graph_path=constraints.osm_graph_path,
+            cache_dir=constraints.osm_cache_dir,
+            path_cache=constraints.routing_cache_path,
+            snap_candidates=constraints.osm_snap_candidates,
+            snap_max_angle_deg=constraints.osm_snap_max_angle_deg,
         )
+        if constraints.routing_engine == "csr":
+            return CSRRouting(**common)
+        return OSMnxRouting(**common, workers=constraints.routing_workers)
     return EuclideanRouting(deadhead_speed_mph=mph)
 
 
+def engine_settings(constraints: Constraints, *, speed: bool = True) -> tuple:
+    """Constraint fields that determine the routing engine and its matrices.
+
+    Deadhead speed only scales matrix times (distances do not depend on it);
+    ``speed=False`` leaves it out.
+    """
+    return (
+        constraints.routing_engine,
+        deadhead_speed_mph(constraints) if speed else None,
+        constraints.depot.lat,
+        constraints.depot.lon,
+        constraints.osm_network_type,
+        constraints.osm_graph_path,
+        constraints.osm_buffer_miles,
+        constraints.osm_snap_candidates,
+        constraints.osm_snap_max_angle_deg,
+    )
+
+
 def service_speed_mph(constraints: Constraints, block: ServiceBlock) -> float:
     return max(1e-6, block.speed_limit_mph * min(1.0, constraints.speed.service_factor))
 
@@ -45,21 +91,14 @@ def deadhead_speed_mph(constraints: Constraints) -> float:
     return max(1e-6, constraints.speed.deadhead_speed_mph * constraints.speed.deadhead_factor)
 
 
-def loopback_dist_time(
-    constraints: Constraints, engine: RoutingEngine, block: ServiceBlock
+def _loopback_from_leg(
+    constraints: Constraints, block: ServiceBlock, one: DistTime | None
 ) -> DistTime:
-    """Distance/time to reposition for the next pass of the same service block.
-
-    When loopback.mode=routing, compute shortest path from end->start.
-    When constant, use constant_seconds and 0 distance.
-    """
-
     extra_passes = max(0, block.passes_required - 1)
     if extra_passes == 0:
         return DistTime(distance_miles=0.0, duration_hours=0.0)
 
     if constraints.loopback.mode == "routing":
-        one = engine.dist_time(block.end, block.start)
         return DistTime(
             distance_miles=one.distance_miles * extra_passes,
             duration_hours=one.duration_hours * extra_passes,
@@ -70,98 +109,313 @@ def loopback_dist_time(
     return DistTime(distance_miles=0.0, duration_hours=sec / 3600.0)
 
 
+def loopback_dist_time(
+    constraints: Constraints, engine: RoutingEngine, block: ServiceBlock
+) -> DistTime:
+    """Distance/time to reposition for the next pass of the same service block.
+
+    When loopback.mode=routing, compute shortest path from end->start.
+    When constant, use constant_seconds and 0 distance.
+    """
+
+    one = None
+    if constraints.loopback.mode == "routing" and block.passes_required > 1:
+        one = engine.dist_time(block.end, block.start)
+    return _loopback_from_leg(constraints, block, one)
+
+
+def matrix_loopback_dist_time(
+    constraints: Constraints, matrix: DistanceMatrix, block: ServiceBlock, k: int
+) -> DistTime:
+    """Same as `loopback_dist_time`, reading the end->start leg of block `k` from the matrix."""
+
+    one = None
+    if constraints.loopback.mode == "routing" and block.passes_required > 1:
+        one = matrix.leg(matrix.block_end[k], matrix.block_start[k])
+    return _loopback_from_leg(constraints, block, one)
+
+
 def service_dist_time(constraints: Constraints, block: ServiceBlock) -> DistTime:
     mph = service_speed_mph(constraints, block)
     hours = block.service_distance_miles / mph
     return DistTime(distance_miles=block.service_distance_miles, duration_hours=hours)
 
 
-def deadhead_leg(engine: RoutingEngine, a: LatLon, b: LatLon) -> DistTime:
-    return engine.dist_time(a, b)
-
-
-def estimate_night_deadhead(
-    engine: RoutingEngine, depot: LatLon, blocks: list[ServiceBlock]
-) -> DistTime:
-    if not blocks:
+def estimate_night_deadhead(matrix: DistanceMatrix, ids: list[int]) -> DistTime:
+    if not ids:
         return DistTime(distance_miles=0.0, duration_hours=0.0)
 
+    starts = matrix.block_start
+    ends = matrix.block_end
     legs = [
-        deadhead_leg(engine, depot, blocks[0].start),
-        *(
-            deadhead_leg(engine, a.end, b.start)
-            for a, b in zip(blocks, blocks[1:])
-        ),
-        deadhead_leg(engine, blocks[-1].end, depot),
+        (DEPOT, starts[ids[0]]),
+        *((ends[a], starts[b]) for a, b in zip(ids, ids[1:])),
+        (ends[ids[-1]], DEPOT),
     ]
     return DistTime(
-        distance_miles=sum(leg.distance_miles for leg in legs),
-        duration_hours=sum(leg.duration_hours for leg in legs),
+        distance_miles=sum(float(matrix.dist[i, j]) for i, j in legs),
+        duration_hours=sum(float(matrix.time[i, j]) for i, j in legs),
     )
 
 
-def estimate_night_service(
-    constraints: Constraints, engine: RoutingEngine, blocks: list[ServiceBlock]
-) -> DistTime:
+def service_table(constraints: Constraints, matrix: DistanceMatrix) -> BlockTable:
+    """The matrix's blocks with service and loopback columns filled in for `constraints`.
+
+    Vectorized equivalent of `service_dist_time` + `matrix_loopback_dist_time` per block.
+    """
+
+    t = matrix.blocks
+    mph = np.maximum(1e-6, t.speed_limit_mph * min(1.0, constraints.speed.service_factor))
+    extra = np.maximum(0, t.passes - 1)
+    if constraints.loopback.mode == "routing":
+        leg = (matrix.block_end, matrix.block_start)
+        with np.errstate(invalid="ignore"):
+            lb_mi = np.where(extra > 0, matrix.dist[leg] * extra, 0.0)
+            lb_h = np.where(extra > 0, matrix.time[leg] * extra, 0.0)
+    else:
+        lb_mi = np.zeros(len(t))
+        lb_h = float(constraints.loopback.constant_seconds) * extra / 3600.0
+    return replace(
+        t, service_hours=t.service_miles / mph, loopback_miles=lb_mi, loopback_hours=lb_h
+    )
+
+
+def estimate_night_service(table: BlockTable, ids: list[int]) -> DistTime:
+    """Service + loopback totals of a night; `table` comes from `service_table`."""
+
     dist = 0.0
     hours = 0.0
-    for b in blocks:
-        s = service_dist_time(constraints, b)
-        lb = loopback_dist_time(constraints, engine, b)
-        dist += s.distance_miles + lb.distance_miles
-        hours += s.duration_hours + lb.duration_hours
-    return DistTime(distance_miles=dist, duration_hours=hours)
-
-
-def estimate_night_hours(
-    constraints: Constraints, engine: RoutingEngine, depot: LatLon, blocks: list[ServiceBlock]
-) -> float:
-    dead = estimate_night_deadhead(engine, depot, blocks)
-    svc = estimate_night_service(constraints, engine, blocks)
+    for k in ids:
+        dist += table.service_miles[k] + table.loopback_miles[k]
+        hours += table.service_hours[k] + table.loopback_hours[k]
+    return DistTime(distance_miles=float(dist), duration_hours=float(hours))
+
+
+def estimate_night_hours(constraints: Constraints, matrix: DistanceMatrix, ids: list[int]) -> float:
+    dead = estimate_night_deadhead(matrix, ids)
+    svc = estimate_night_service(service_table(constraints, matrix), ids)
     return dead.duration_hours + svc.duration_hours
 
 
-def greedy_plan(constraints: Constraints, blocks: list[ServiceBlock]) -> list[NightRoute]:
-    depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
-    max_h = constraints.limits.max_hours_per_night
+def block_service_hours(constraints: Constraints, matrix: DistanceMatrix) -> list[float]:
+    """Service + loopback hours of every block, indexed like the matrix."""
+
+    table = service_table(constraints, matrix)
+    return (table.service_hours + table.loopback_hours).tolist()
+
+
+def insertion_delta(
+    matrix: DistanceMatrix, ids: list[int], pos: int, k: int
+) -> tuple[float, float]:
+    """Deadhead (miles, hours) added by inserting block `k` at `pos` of a night.
+
+    Replaces the leg prev.end->next.start with prev.end->k.start and k.end->next.start.
+    """
+
+    prev = matrix.block_end[ids[pos - 1]] if pos else DEPOT
+    nxt = matrix.block_start[ids[pos]] if pos < len(ids) else DEPOT
+    s = matrix.block_start[k]
+    e = matrix.block_end[k]
+    dist = matrix.dist
+    time = matrix.time
+    return (
+        float(dist[prev, s] + dist[e, nxt] - dist[prev, nxt]),
+        float(time[prev, s] + time[e, nxt] - time[prev, nxt]),
+    )
 
-    # Build one engine for the whole solve so we don't rebuild OSM graphs inside loops.
-    engine = build_engine(constraints, depot, blocks)
 
-    blocks_sorted = sorted(
-        blocks,
-        key=lambda b: service_dist_time(constraints, b).duration_hours,
-        reverse=True,
+def night_from_ids(matrix: DistanceMatrix, svc_h: list[float], ids: list[int]) -> NightRoute:
+    """A night visiting `ids` in order, with its cached totals recomputed."""
+    dead = estimate_night_deadhead(matrix, ids)
+    return NightRoute(
+        ids=list(ids),
+        deadhead_miles=dead.distance_miles,
+        deadhead_hours=dead.duration_hours,
+        service_hours=sum((svc_h[k] for k in ids), 0.0),
     )
 
-    nights: list[NightRoute] = []
 
-    for blk in blocks_sorted:
-        best = None
+def insert_block(
+    night: NightRoute, pos: int, k: int, delta: tuple[float, float], service_hours: float
+) -> None:
+    night.ids.insert(pos, k)
+    night.deadhead_miles += delta[0]
+    night.deadhead_hours += delta[1]
+    night.service_hours += service_hours
+
+
+def all_slots(nights: list[NightRoute], min_added_h: float, max_h: float):
+    """Every (night, position) pair, skipping nights that cannot absorb `min_added_h` hours."""
+    for ni, night in enumerate(nights):
+        if night.hours + min_added_h > max_h:
+            continue
+        for pos in range(len(night.ids) + 1):
+            yield ni, pos
+
+
+def neighbor_slots(
+    neighbors: BlockNeighbors, night_of: list[int], nights: list[NightRoute], k: int
+) -> list[tuple[int, int]]:
+    """Positions right after blocks ending near k's start / before blocks starting near
+    k's end, plus the depot-adjacent positions of those nights."""
+
+    slots: set[tuple[int, int]] = set()
+    for j, after in (
+        *((j, 1) for j in neighbors.predecessors(k)),
+        *((j, 0) for j in neighbors.successors(k)),
+    ):
+        ni = night_of[j]
+        if ni < 0:
+            continue
+        ids = nights[ni].ids
+        slots.update(((ni, ids.index(j) + after), (ni, 0), (ni, len(ids))))
+    return sorted(slots)
+
+
+def best_insertion(
+    matrix: DistanceMatrix,
+    nights: list[NightRoute],
+    slots,
+    k: int,
+    svc_h: float,
+    max_h: float,
+):
+    """Cheapest feasible (night deadhead, night, pos, delta) among `slots`, or None."""
+
+    best = None
+    trials = 0
+    for ni, pos in slots:
+        trials += 1
+        night = nights[ni]
+        d_mi, d_h = insertion_delta(matrix, night.ids, pos, k)
+        if night.hours + svc_h + d_h > max_h:
+            continue
+        dead = night.deadhead_miles + d_mi
+        if best is None or dead < best[0]:
+            best = (dead, ni, pos, (d_mi, d_h))
+    instrument.count("insertion_trials", trials)
+    return best
+
+
+class Construction:
+    """A plan under construction: nights plus the block -> night index, filled by insertion."""
+
+    def __init__(
+        self,
+        constraints: Constraints,
+        matrix: DistanceMatrix,
+        neighbors: BlockNeighbors | None = None,
+    ):
+        self.constraints = constraints
+        self.matrix = matrix
+        self.max_h = constraints.limits.max_hours_per_night
+        self.table = service_table(constraints, matrix)
+        self.svc_h = (self.table.service_hours + self.table.loopback_hours).tolist()
+        self.neighbors = neighbors
+        self.nights: list[NightRoute] = []
+        self.night_of = [-1] * len(self.table)
+
+    def load(self, nights: list[NightRoute]) -> None:
+        """Continue from existing (possibly partial) nights; they are modified in place."""
+        self.nights = nights
+        self.night_of = [-1] * len(self.table)
         for ni, night in enumerate(nights):
-            for pos in range(len(night.blocks) + 1):
-                cand = night.blocks[:pos] + [blk] + night.blocks[pos:]
-                h = estimate_night_hours(constraints, engine, depot, cand)
-                if h > max_h:
+            for k in night.ids:
+                self.night_of[k] = ni
+
+    def _slot_lists(self, k: int):
+        """Nearby slots first (when pruning), then every night that could take `k`."""
+        if self.neighbors is not None:
+            yield neighbor_slots(self.neighbors, self.night_of, self.nights, k)
+        # By the triangle inequality an insertion adds at least svc - time(start->end) hours.
+        m = self.matrix
+        min_h = self.svc_h[k] - float(m.time[m.block_start[k], m.block_end[k]])
+        yield all_slots(self.nights, min_h, self.max_h)
+
+    def best_for(self, k: int):
+        """Cheapest feasible (night deadhead, night, pos, delta) for block `k`, or None."""
+        for slots in self._slot_lists(k):
+            best = best_insertion(self.matrix, self.nights, slots, k, self.svc_h[k], self.max_h)
+            if best is not None:
+                return best
+        return None
+
+    def options(self, k: int) -> list[tuple[float, int, int, tuple[float, float]]]:
+        """Cheapest feasible (added miles, night, pos, delta) per night, cheapest first."""
+        per_night: dict[int, tuple[float, int, int, tuple[float, float]]] = {}
+        trials = 0
+        for slots in self._slot_lists(k):
+            for ni, pos in slots:
+                trials += 1
+                night = self.nights[ni]
+                d_mi, d_h = insertion_delta(self.matrix, night.ids, pos, k)
+                if night.hours + self.svc_h[k] + d_h > self.max_h:
                     continue
-                dead = estimate_night_deadhead(engine, depot, cand)
-                if best is None or dead.distance_miles < best[0]:
-                    best = (dead.distance_miles, ni, pos)
-
+                cur = per_night.get(ni)
+                if cur is None or d_mi < cur[0]:
+                    per_night[ni] = (d_mi, ni, pos, (d_mi, d_h))
+            if per_night:
+                break
+        instrument.count("insertion_trials", trials)
+        return sorted(per_night.values())
+
+    def place(self, k: int, best=None) -> None:
+        """Insert block `k` at `best` (from `best_for`), or open a new night for it."""
         if best is not None:
-            _, ni, pos = best
-            nights[ni].blocks.insert(pos, blk)
-            continue
-
-        h_single = estimate_night_hours(constraints, engine, depot, [blk])
-        if h_single > max_h:
+            _, ni, pos, delta = best
+            insert_block(self.nights[ni], pos, k, delta, self.svc_h[k])
+            self.night_of[k] = ni
+            return
+
+        night = NightRoute()
+        delta = insertion_delta(self.matrix, night.ids, 0, k)
+        h_single = delta[1] + self.svc_h[k]
+        if h_single > self.max_h:
             raise ValueError(
-                f"Single service block cannot fit in a night (hours={h_single:.3f} > {max_h}). "
-                "Consider splitting geometry or adjusting constraints."
+                f"Single service block cannot fit in a night (hours={h_single:.3f} > "
+                f"{self.max_h}). Consider splitting geometry or adjusting constraints."
             )
 
-        if len(nights) + 1 > constraints.limits.max_nights:
+        if len(self.nights) + 1 > self.constraints.limits.max_nights:
             raise ValueError("Cannot schedule within max_nights constraint")
-        nights.append(NightRoute(blocks=[blk]))
+        insert_block(night, 0, k, delta, self.svc_h[k])
+        self.night_of[k] = len(self.nights)
+        self.nights.append(night)
+
+
+def greedy_plan(
+    constraints: Constraints,
+    blocks: BlockTable | list[ServiceBlock],
+    matrix: DistanceMatrix | None = None,
+    *,
+    order: list[int] | None = None,
+    neighbors: BlockNeighbors | None = None,
+) -> list[NightRoute]:
+    """Insert blocks one by one at their cheapest feasible position.
+
+    Blocks go in `order` (default: longest service first). `neighbors` may be passed
+    in to reuse a prebuilt pruning index. Raises ValueError up front when max_nights
+    is below the nights lower bound.
+    """
+
+    if matrix is None:
+        depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
+        matrix = build_matrix(build_engine(constraints, depot, blocks), depot, blocks)
 
-    return nights
+    if neighbors is None:
+        neighbors = build_neighbors(
+            matrix, constraints.search.neighbors_k, constraints.search.exhaustive
+        )
+    build = Construction(constraints, matrix, neighbors)
+    check_max_nights(constraints, matrix, build.table)
+    if order is None:
+        svc = build.table.service_hours.tolist()
+        order = sorted(range(len(svc)), key=svc.__getitem__, reverse=True)
+
+    for i, k in enumerate(order):
+        build.place(k, build.best_for(k))
+        if instrument.due():
+            instrument.progress(
+                f"construct: {i + 1}/{len(order)} blocks, {len(build.nights)} nights"
+            )
+    return build.nights
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover
+    from routeopt.core.matrix import DistanceMatrix
+
+_MILES_PER_DEG_LAT = 69.0
+
+
+def project_miles(lat: np.ndarray, lon: np.ndarray, lat0: float) -> tuple[np.ndarray, np.ndarray]:
+    """Equirectangular projection to local miles around latitude `lat0`."""
+    kx = _MILES_PER_DEG_LAT * max(1e-6, math.cos(math.radians(lat0)))
+    return np.asarray(lon, dtype=np.float64) * kx, np.asarray(lat, dtype=np.float64) * (
+        _MILES_PER_DEG_LAT
+    )
+
+
+class GridIndex:
+    """Uniform grid over projected points supporting k-nearest queries.
+
+    Cells are sized for a handful of points each, so a query only visits the
+    rings of cells around the probe until the k-th hit is provably closest.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, *, per_cell: float = 4.0):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.size = len(lat)
+        self._lat0 = float(lat.mean()) if self.size else 0.0
+        self.x, self.y = project_miles(lat, lon, self._lat0)
+
+        if self.size:
+            x0, y0 = float(self.x.min()), float(self.y.min())
+            span = max(float(self.x.max()) - x0, float(self.y.max()) - y0, 1e-6)
+        else:
+            x0 = y0 = 0.0
+            span = 1.0
+        cells_per_side = max(1, int(math.sqrt(self.size / per_cell)))
+        self.cell = span / cells_per_side
+        self._x0, self._y0 = x0, y0
+
+        cx = ((self.x - x0) // self.cell).astype(np.int64)
+        cy = ((self.y - y0) // self.cell).astype(np.int64)
+        self._side = int(max(cx.max(initial=0), cy.max(initial=0))) + 1
+        order = np.lexsort((cy, cx))
+        keys = cx[order] * (self._side + 1) + cy[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        self._cells: dict[tuple[int, int], np.ndarray] = {}
+        for chunk in np.split(order, bounds) if self.size else []:
+            self._cells[(int(cx[chunk[0]]), int(cy[chunk[0]]))] = chunk
+
+    def _ring(self, cx: int, cy: int, r: int):
+        """Grid cells at Chebyshev distance exactly `r` from (cx, cy), clipped to the grid."""
+        last = self._side - 1
+        if r == 0:
+            yield cx, cy
+            return
+        x_lo, x_hi = max(cx - r, 0), min(cx + r, last)
+        for y in (cy - r, cy + r):
+            if 0 <= y <= last:
+                for x in range(x_lo, x_hi + 1):
+                    yield x, y
+        y_lo, y_hi = max(cy - r + 1, 0), min(cy + r - 1, last)
+        for x in (cx - r, cx + r):
+            if 0 <= x <= last:
+                for y in range(y_lo, y_hi + 1):
+                    yield x, y
+
+    def nearest(self, lat: float, lon: float, k: int) -> np.ndarray:
+        """Indices of the (up to) k points nearest to (lat, lon), closest first."""
+        if not self.size or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        (px,), (py,) = project_miles(np.array([lat]), np.array([lon]), self._lat0)
+        cx = int((px - self._x0) // self.cell)
+        cy = int((py - self._y0) // self.cell)
+        # Rings closer than the grid's nearest cell are empty; start from there.
+        last = self._side - 1
+        r = max(0, -cx, -cy, cx - last, cy - last)
+
+        found: list[np.ndarray] = []
+        count = 0
+        while True:
+            for key in self._ring(cx, cy, r):
+                pts = self._cells.get(key)
+                if pts is not None:
+                    found.append(pts)
+                    count += len(pts)
+            # Everything within r * cell of the probe has been visited.
+            if count >= min(k, self.size):
+                cand = np.concatenate(found)
+                d2 = (self.x[cand] - px) ** 2 + (self.y[cand] - py) ** 2
+                keep = np.argsort(d2, kind="stable")[:k]
+                if count >= self.size or d2[keep[-1]] <= (r * self.cell) ** 2:
+                    return cand[keep]
+            r += 1
+
+
+class BlockNeighbors:
+    """k-nearest block lookups over block start/end points, memoized per block."""
+
+    def __init__(self, matrix: DistanceMatrix, k: int):
+        lat = np.fromiter((p.lat for p in matrix.points), dtype=np.float64)
+        lon = np.fromiter((p.lon for p in matrix.points), dtype=np.float64)
+        self.k = k
+        self._s_lat, self._s_lon = lat[matrix.block_start], lon[matrix.block_start]
+        self._e_lat, self._e_lon = lat[matrix.block_end], lon[matrix.block_end]
+        self._starts = GridIndex(self._s_lat, self._s_lon)
+        self._ends = GridIndex(self._e_lat, self._e_lon)
+        self._pred: dict[int, list[int]] = {}
+        self._succ: dict[int, list[int]] = {}
+        self._near: dict[int, list[int]] = {}
+
+    def predecessors(self, b: int) -> list[int]:
+        """Blocks whose end is nearest to block `b`'s start."""
+        out = self._pred.get(b)
+        if out is None:
+            hits = self._ends.nearest(self._s_lat[b], self._s_lon[b], self.k + 1)
+            out = self._pred[b] = [int(j) for j in hits if j != b][: self.k]
+        return out
+
+    def successors(self, b: int) -> list[int]:
+        """Blocks whose start is nearest to block `b`'s end."""
+        out = self._succ.get(b)
+        if out is None:
+            hits = self._starts.nearest(self._e_lat[b], self._e_lon[b], self.k + 1)
+            out = self._succ[b] = [int(j) for j in hits if j != b][: self.k]
+        return out
+
+    def similar(self, b: int) -> list[int]:
+        """Blocks whose start is nearest to block `b`'s start (swap partners)."""
+        out = self._near.get(b)
+        if out is None:
+            hits = self._starts.nearest(self._s_lat[b], self._s_lon[b], self.k + 1)
+            out = self._near[b] = [int(j) for j in hits if j != b][: self.k]
+        return out
+
+
+def build_neighbors(matrix: DistanceMatrix, neighbors_k: int, exhaustive: bool):
+    """`BlockNeighbors` for pruned search, or None when search is exhaustive."""
+    if exhaustive or neighbors_k <= 0:
+        return None
+    return BlockNeighbors(matrix, neighbors_k)
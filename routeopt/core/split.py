@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
+
+import numpy as np
+
+from routeopt.core.tasks import split_lanes_balanced
+from routeopt.models.constraints import Constraints
+from routeopt.models.network import Segment
+from routeopt.utils.geo import haversine_miles_array
+
+
+def _cumulative_miles(coords: np.ndarray) -> np.ndarray:
+    leg = haversine_miles_array(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0])
+    return np.concatenate(([0.0], np.cumsum(leg)))
+
+
+def cut_segment(seg: Segment, pieces: int) -> list[Segment]:
+    """Cut a segment into `pieces` parts of equal length along its geometry.
+
+    Cut points are interpolated between vertices; BMP/EMP are interpolated the
+    same way so every part keeps its own milepost sub-range.
+    """
+
+    if pieces <= 1:
+        return [seg]
+    cum = _cumulative_miles(seg.coords)
+    total = float(cum[-1])
+    if total <= 0.0:
+        return [seg]
+    marks = np.linspace(0.0, total, pieces + 1)
+    x = np.interp(marks, cum, seg.coords[:, 0])
+    y = np.interp(marks, cum, seg.coords[:, 1])
+    has_mp = seg.bmp is not None and seg.emp is not None
+
+    out = []
+    for i in range(pieces):
+        lo, hi = marks[i], marks[i + 1]
+        inner = np.flatnonzero((cum > lo) & (cum < hi))
+        coords = np.vstack(([x[i], y[i]], seg.coords[inner], [x[i + 1], y[i + 1]]))
+        bmp = emp = None
+        if has_mp:
+            bmp = seg.bmp + (seg.emp - seg.bmp) * lo / total
+            emp = seg.bmp + (seg.emp - seg.bmp) * hi / total
+        out.append(replace(seg, coords=coords, bmp=bmp, emp=emp))
+    return out
+
+
+def _direction_rates(constraints: Constraints, seg: Segment) -> list[tuple[int, float, float]]:
+    """(passes, hours per geometry mile, fixed hours) of each direction's block."""
+    svc_mph = max(1e-6, seg.speed_limit_mph * min(1.0, constraints.speed.service_factor))
+    dead_mph = max(1e-6, constraints.speed.deadhead_speed_mph * constraints.speed.deadhead_factor)
+    if seg.oneway:
+        passes = [seg.total_lanes]
+    else:
+        passes = [p for p in split_lanes_balanced(seg.total_lanes) if p > 0]
+
+    rates = []
+    for p in passes:
+        extra = p - 1
+        if constraints.loopback.mode == "routing":
+            # The loopback leg is about as long as the block itself.
+            per_mile = p / svc_mph + extra * constraints.split.circuity / dead_mph
+            rates.append((p, per_mile, 0.0))
+        else:
+            fixed = extra * float(constraints.loopback.constant_seconds) / 3600.0
+            rates.append((p, p / svc_mph, fixed))
+    return rates
+
+
+def _pieces_fit(constraints: Constraints, seg: Segment, cum: np.ndarray, pieces: int) -> bool:
+    """Whether cutting `seg` into `pieces` equal parts makes every block fit in a night."""
+    dead_mph = max(1e-6, constraints.speed.deadhead_speed_mph * constraints.speed.deadhead_factor)
+    svc_mph = max(1e-6, seg.speed_limit_mph * min(1.0, constraints.speed.service_factor))
+    marks = np.linspace(0.0, float(cum[-1]), pieces + 1)
+    lat = np.interp(marks, cum, seg.coords[:, 1])
+    lon = np.interp(marks, cum, seg.coords[:, 0])
+    depot = haversine_miles_array(constraints.depot.lat, constraints.depot.lon, lat, lon)
+    # Depot -> one end of the piece, other end -> depot (the same for both directions).
+    round_trip_h = (depot[:-1] + depot[1:]) * constraints.split.circuity / dead_mph
+    piece = float(cum[-1]) / pieces
+    cap = constraints.split.max_block_hours
+    max_h = constraints.limits.max_hours_per_night
+    for passes, per_mile, fixed in _direction_rates(constraints, seg):
+        if cap is not None and piece * passes / svc_mph > cap:
+            return False
+        if np.any(piece * per_mile + fixed + round_trip_h > max_h):
+            return False
+    return True
+
+
+def pieces_needed(constraints: Constraints, seg: Segment, *, min_piece_miles: float = 0.01) -> int:
+    """Fewest equal pieces whose blocks all fit in a night (1 = no split needed).
+
+    Returns 0 when even pieces of `min_piece_miles` do not fit, e.g. because part
+    of the segment is out of round-trip reach of the depot.
+    """
+
+    cum = _cumulative_miles(seg.coords)
+    if _pieces_fit(constraints, seg, cum, 1):
+        return 1
+    most = max(1, math.ceil(float(cum[-1]) / min_piece_miles))
+    if most == 1 or not _pieces_fit(constraints, seg, cum, most):
+        return 0
+    # Grow until it fits, then bisect back down to the smallest fitting count.
+    lo, hi = 1, 2
+    while hi < most and not _pieces_fit(constraints, seg, cum, hi):
+        lo, hi = hi, min(most, hi * 2)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if _pieces_fit(constraints, seg, cum, mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def split_segments(segments: Iterable[Segment], constraints: Constraints) -> Iterator[Segment]:
+    """Virtual split: cut segments whose blocks would not fit in a night.
+
+    Each piece must fit together with its depot round trip, estimated as the
+    straight-line distance to both piece ends times ``split.circuity``. Segments
+    that cannot be made to fit pass through unchanged and are reported by the
+    solver.
+    """
+
+    for seg in segments:
+        n = pieces_needed(constraints, seg) if constraints.split.enabled else 1
+        if n <= 1:
+            yield seg
+        else:
+            yield from cut_segment(seg, n)
@@ -1,29 +1,304 @@
 from __future__ import annotations
 
+import hashlib
 import math
-from dataclasses import dataclass
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, fields, replace
+from itertools import islice
 
-from routeopt.models.network import Segment
-from routeopt.utils.geo import LatLon, bearing_deg, haversine_miles
+import numpy as np
+
+from routeopt.models.network import Segment, pack_coords
+from routeopt.utils.geo import LatLon, bearing_deg_array, polyline_lengths_miles
+
+# Segments are measured in batches of this size so streamed input stays bounded.
+BATCH_SEGMENTS = 65_536
+
+
+DIRECTIONS = ("A", "B")
+# Filled per constraints by ``solver.service_table``; not part of a table's identity.
+_SERVICE_COLUMNS = ("service_hours", "loopback_miles", "loopback_hours")
+
+
+@dataclass
+class BlockTable:
+    """Columnar store of service blocks; row ``k`` is block ``k`` everywhere in the solver.
+
+    Endpoints are deduplicated into the ``poi_lat``/``poi_lon`` table and referenced
+    by ``start``/``end``. The service/loopback columns depend on the constraints and
+    are filled by ``solver.service_table``.
+    """
+
+    roadway_names: list[str]
+    roadway: np.ndarray  # int32 code into roadway_names
+    direction: np.ndarray  # int8 index into DIRECTIONS
+    azimuth_deg: np.ndarray
+    passes: np.ndarray  # int32
+    speed_limit_mph: np.ndarray
+    poi_lat: np.ndarray
+    poi_lon: np.ndarray
+    start: np.ndarray  # int64 index into poi_*
+    end: np.ndarray
+    service_miles: np.ndarray
+    bmp: np.ndarray  # NaN when the input had no BMP/EMP
+    emp: np.ndarray
+    service_hours: np.ndarray | None = None
+    loopback_miles: np.ndarray | None = None
+    loopback_hours: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.roadway)
+
+    def __getitem__(self, k: int) -> ServiceBlock:
+        return ServiceBlock.view(self, int(k))
+
+    def __iter__(self) -> Iterator[ServiceBlock]:
+        return (ServiceBlock.view(self, k) for k in range(len(self)))
+
+    def roadway_id(self, k: int) -> str:
+        return self.roadway_names[self.roadway[k]]
+
+    def point(self, i: int) -> LatLon:
+        return LatLon(lat=float(self.poi_lat[i]), lon=float(self.poi_lon[i]))
+
+    def fingerprint(self) -> str:
+        """Digest of the blocks themselves (not the constraint-dependent service columns)."""
+        h = hashlib.sha1()
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name in _SERVICE_COLUMNS or value is None:
+                continue
+            h.update(f.name.encode())
+            h.update(value.tobytes() if isinstance(value, np.ndarray) else repr(value).encode())
+        return h.hexdigest()
+
+    def take(self, rows: np.ndarray) -> BlockTable:
+        """Table of blocks `rows` (renumbered from 0); endpoint and roadway lookups are shared."""
+        cols = {
+            f.name: getattr(self, f.name)[rows]
+            for f in fields(self)
+            if f.name not in ("roadway_names", "poi_lat", "poi_lon")
+            and getattr(self, f.name) is not None
+        }
+        return replace(self, **cols)
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[ServiceBlock]) -> BlockTable:
+        b = _TableBuilder()
+        for blk in blocks:
+            b.add(
+                blk.roadway_id,
+                blk.direction,
+                blk.azimuth_deg,
+                blk.passes_required,
+                blk.speed_limit_mph,
+                blk.start,
+                blk.end,
+                blk.service_distance_miles,
+                blk.bmp,
+                blk.emp,
+            )
+        return b.build()
+
+
+def as_block_table(blocks: BlockTable | list[ServiceBlock]) -> BlockTable:
+    """`blocks` as a table, reusing the backing table when `blocks` is a full view of it."""
+    if isinstance(blocks, BlockTable):
+        return blocks
+    if blocks:
+        table = blocks[0]._table
+        if len(table) == len(blocks) and all(
+            b._table is table and b._k == k for k, b in enumerate(blocks)
+        ):
+            return table
+    return BlockTable.from_blocks(blocks)
 
 
-@dataclass(frozen=True)
 class ServiceBlock:
-    roadway_id: str
-    direction: str  # 'A' or 'B'
-    azimuth_deg: float
-    passes_required: int
-    speed_limit_mph: float
-    start: LatLon
-    end: LatLon
-    service_distance_miles: float
+    """One block: a thin view of a `BlockTable` row.
+
+    Constructing one directly (keyword fields, as before) backs it by a one-row table.
+    """
+
+    __slots__ = ("_table", "_k")
+
+    def __init__(
+        self,
+        roadway_id: str,
+        direction: str,
+        azimuth_deg: float,
+        passes_required: int,
+        speed_limit_mph: float,
+        start: LatLon,
+        end: LatLon,
+        service_distance_miles: float,
+        bmp: float | None = None,
+        emp: float | None = None,
+    ):
+        b = _TableBuilder()
+        b.add(
+            roadway_id,
+            direction,
+            azimuth_deg,
+            passes_required,
+            speed_limit_mph,
+            start,
+            end,
+            service_distance_miles,
+            bmp,
+            emp,
+        )
+        self._table = b.build()
+        self._k = 0
+
+    @classmethod
+    def view(cls, table: BlockTable, k: int) -> ServiceBlock:
+        blk = cls.__new__(cls)
+        blk._table = table
+        blk._k = k
+        return blk
+
+    @property
+    def roadway_id(self) -> str:
+        return self._table.roadway_id(self._k)
+
+    @property
+    def direction(self) -> str:  # 'A' or 'B'
+        return DIRECTIONS[self._table.direction[self._k]]
+
+    @property
+    def azimuth_deg(self) -> float:
+        return float(self._table.azimuth_deg[self._k])
+
+    @property
+    def passes_required(self) -> int:
+        return int(self._table.passes[self._k])
+
+    @property
+    def speed_limit_mph(self) -> float:
+        return float(self._table.speed_limit_mph[self._k])
+
+    @property
+    def start(self) -> LatLon:
+        return self._table.point(self._table.start[self._k])
+
+    @property
+    def end(self) -> LatLon:
+        return self._table.point(self._table.end[self._k])
 
+    @property
+    def service_distance_miles(self) -> float:
+        return float(self._table.service_miles[self._k])
 
-def linestring_length_miles(coords: list[LatLon]) -> float:
-    dist = 0.0
-    for a, b in zip(coords, coords[1:]):
-        dist += haversine_miles(a, b)
-    return dist
+    @property
+    def bmp(self) -> float | None:
+        v = float(self._table.bmp[self._k])
+        return None if math.isnan(v) else v
+
+    @property
+    def emp(self) -> float | None:
+        v = float(self._table.emp[self._k])
+        return None if math.isnan(v) else v
+
+    def _key(self) -> tuple:
+        return (
+            self.roadway_id,
+            self.direction,
+            self.azimuth_deg,
+            self.passes_required,
+            self.speed_limit_mph,
+            self.start,
+            self.end,
+            self.service_distance_miles,
+            self.bmp,
+            self.emp,
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ServiceBlock):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return (
+            f"ServiceBlock(roadway_id={self.roadway_id!r}, direction={self.direction!r}, "
+            f"passes_required={self.passes_required}, "
+            f"service_distance_miles={self.service_distance_miles!r})"
+        )
+
+
+class _TableBuilder:
+    """Row-at-a-time accumulator for a `BlockTable`."""
+
+    def __init__(self):
+        self._roads: dict[str, int] = {}
+        self._pois: dict[tuple[float, float], int] = {}
+        self.roadway: list[int] = []
+        self.direction: list[int] = []
+        self.azimuth: list[float] = []
+        self.passes: list[int] = []
+        self.speed: list[float] = []
+        self.start: list[int] = []
+        self.end: list[int] = []
+        self.miles: list[float] = []
+        self.bmp: list[float] = []
+        self.emp: list[float] = []
+
+    def _poi(self, lat: float, lon: float) -> int:
+        return self._pois.setdefault((lat, lon), len(self._pois))
+
+    def add(
+        self,
+        roadway_id: str,
+        direction: str,
+        azimuth_deg: float,
+        passes: int,
+        speed_limit_mph: float,
+        start: LatLon,
+        end: LatLon,
+        service_miles: float,
+        bmp: float | None = None,
+        emp: float | None = None,
+    ) -> None:
+        self.roadway.append(self._roads.setdefault(roadway_id, len(self._roads)))
+        self.direction.append(DIRECTIONS.index(direction))
+        self.azimuth.append(azimuth_deg)
+        self.passes.append(passes)
+        self.speed.append(speed_limit_mph)
+        self.start.append(self._poi(start.lat, start.lon))
+        self.end.append(self._poi(end.lat, end.lon))
+        self.miles.append(service_miles)
+        self.bmp.append(math.nan if bmp is None else bmp)
+        self.emp.append(math.nan if emp is None else emp)
+
+    def build(self) -> BlockTable:
+        poi = np.array(list(self._pois), dtype=np.float64).reshape(-1, 2)
+        return BlockTable(
+            roadway_names=list(self._roads),
+            roadway=np.array(self.roadway, dtype=np.int32),
+            direction=np.array(self.direction, dtype=np.int8),
+            azimuth_deg=np.array(self.azimuth, dtype=np.float64),
+            passes=np.array(self.passes, dtype=np.int32),
+            speed_limit_mph=np.array(self.speed, dtype=np.float64),
+            poi_lat=poi[:, 0].copy(),
+            poi_lon=poi[:, 1].copy(),
+            start=np.array(self.start, dtype=np.int64),
+            end=np.array(self.end, dtype=np.int64),
+            service_miles=np.array(self.miles, dtype=np.float64),
+            bmp=np.array(self.bmp, dtype=np.float64),
+            emp=np.array(self.emp, dtype=np.float64),
+        )
+
+
+def linestring_length_miles(coords: np.ndarray | list[LatLon]) -> float:
+    if not isinstance(coords, np.ndarray):
+        coords = np.array([(c.lon, c.lat) for c in coords], dtype=np.float64)
+    if len(coords) < 2:
+        return 0.0
+    return float(polyline_lengths_miles(coords, np.array([0, len(coords)]))[0])
 
 
 def split_lanes_balanced(total_lanes: int) -> tuple[int, int]:
@@ -32,51 +307,65 @@ def split_lanes_balanced(total_lanes: int) -> tuple[int, int]:
     return a, b
 
 
-def build_service_blocks(segments: list[Segment]) -> list[ServiceBlock]:
-    blocks: list[ServiceBlock] = []
-    for s in segments:
-        seg_len = linestring_length_miles(s.coords)
-        az = bearing_deg(s.start, s.end)
-
-        if s.oneway:
-            blocks.append(
-                ServiceBlock(
-                    roadway_id=s.roadway_id,
-                    direction="A",
-                    azimuth_deg=az,
-                    passes_required=s.total_lanes,
-                    speed_limit_mph=s.speed_limit_mph,
-                    start=s.start,
-                    end=s.end,
-                    service_distance_miles=seg_len * s.total_lanes,
-                )
-            )
-            continue
-
-        lanes_a, lanes_b = split_lanes_balanced(s.total_lanes)
-        blocks.append(
-            ServiceBlock(
-                roadway_id=s.roadway_id,
-                direction="A",
-                azimuth_deg=az,
-                passes_required=lanes_a,
-                speed_limit_mph=s.speed_limit_mph,
-                start=s.start,
-                end=s.end,
-                service_distance_miles=seg_len * lanes_a,
-            )
-        )
-        blocks.append(
-            ServiceBlock(
-                roadway_id=s.roadway_id,
-                direction="B",
-                azimuth_deg=(az + 180.0) % 360.0,
-                passes_required=lanes_b,
-                speed_limit_mph=s.speed_limit_mph,
-                start=s.end,
-                end=s.start,
-                service_distance_miles=seg_len * lanes_b,
-            )
+def _batches(segments: Iterable[Segment], size: int) -> Iterator[list[Segment]]:
+    it = iter(segments)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _measure(batch: list[Segment]) -> tuple[list[float], list[float]]:
+    """Length (miles) and start->end bearing of every segment, in one vectorized pass."""
+    xy, offsets = pack_coords(batch)
+    first = xy[offsets[:-1]]
+    last = xy[offsets[1:] - 1]
+    az = bearing_deg_array(first[:, 1], first[:, 0], last[:, 1], last[:, 0])
+    return polyline_lengths_miles(xy, offsets).tolist(), az.tolist()
+
+
+def build_block_table(segments: Iterable[Segment]) -> BlockTable:
+    table = _TableBuilder()
+    for batch in _batches(segments, BATCH_SEGMENTS):
+        lengths, azimuths = _measure(batch)
+        for s, seg_len, az in zip(batch, lengths, azimuths):
+            _add_blocks(table, s, seg_len, az)
+    return table.build()
+
+
+def build_service_blocks(segments: Iterable[Segment]) -> list[ServiceBlock]:
+    return list(build_block_table(segments))
+
+
+def _add_blocks(table: _TableBuilder, s: Segment, seg_len: float, az: float) -> None:
+    start, end = s.start, s.end
+    ranges = (s.bmp, s.emp)
+    if s.oneway:
+        table.add(
+            s.roadway_id,
+            "A",
+            az,
+            s.total_lanes,
+            s.speed_limit_mph,
+            start,
+            end,
+            seg_len * s.total_lanes,
+            *ranges,
         )
+        return
+
+    lanes_a, lanes_b = split_lanes_balanced(s.total_lanes)
+    table.add(
+        s.roadway_id, "A", az, lanes_a, s.speed_limit_mph, start, end, seg_len * lanes_a, *ranges
+    )
     # drop any zero-pass blocks (e.g., total_lanes=1 => B gets 0)
-    return [b for b in blocks if b.passes_required > 0]
+    if lanes_b > 0:
+        table.add(
+            s.roadway_id,
+            "B",
+            (az + 180.0) % 360.0,
+            lanes_b,
+            s.speed_limit_mph,
+            end,
+            start,
+            seg_len * lanes_b,
+            *ranges,
+        )
@@ -35,6 +35,22 @@ class Loopback(BaseModel):
     constant_seconds: float = 60.0
 
 
+class Split(BaseModel):
+    # Cut segments whose blocks cannot fit in a night (depot round trip included).
+    enabled: bool = True
+    # Also cut blocks longer than this many service hours; null cuts only what must be cut.
+    max_block_hours: float | None = None
+    # Assumed road distance / straight-line distance for the depot round trip estimate.
+    circuity: float = 1.3
+
+
+class Search(BaseModel):
+    # Only try insertion/move positions next to the k nearest blocks; 0 disables pruning.
+    neighbors_k: int = 16
+    # Try every position in every night (slow on large inputs).
+    exhaustive: bool = False
+
+
 class Objective(BaseModel):
     primary: Literal["min_deadhead_distance"] = "min_deadhead_distance"
     secondary: Literal["min_deadhead_time"] = "min_deadhead_time"
@@ -48,9 +64,24 @@ class Constraints(BaseModel):
     oneway: Oneway = Field(default_factory=Oneway)
     loopback: Loopback = Field(default_factory=Loopback)
     objective: Objective = Field(default_factory=Objective)
+    search: Search = Field(default_factory=Search)
+    split: Split = Field(default_factory=Split)
 
     # Optional: bounding box buffer for future OSM graph build
     osm_buffer_miles: float = 2.0
-
-    # Reserved for future routing engines
-    routing_engine: Literal["euclidean", "osmnx"] = "euclidean"
+    osm_network_type: str = "drive"
+    # Endpoints snap to the nearest of k candidate edges whose bearing is within
+    # this angle of the block azimuth (keeps blocks on their own carriageway).
+    osm_snap_candidates: int = 8
+    osm_snap_max_angle_deg: float = 60.0
+    # Processed OSM graphs are cached here and reused when they cover the bbox; null disables.
+    osm_cache_dir: str | None = "~/.cache/routeopt/osm"
+    # Offline mode: load this GraphML/pickle graph instead of downloading.
+    osm_graph_path: str | None = None
+    # SQLite shortest-path cache shared across runs; null keeps it in memory only.
+    routing_cache_path: str | None = "~/.cache/routeopt/paths.sqlite"
+    # Processes for one-to-many matrix routing; 0 uses every CPU.
+    routing_workers: int = 0
+
+    # osmnx: networkx Dijkstra; csr: same OSM graph as SciPy CSR arrays (less memory, faster)
+    routing_engine: Literal["euclidean", "osmnx", "csr"] = "euclidean"
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
+import numpy as np
+
 from routeopt.utils.geo import LatLon
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False)
 class Segment:
     roadway_id: str
     bmp: float | None
@@ -13,12 +15,21 @@ class Segment:
     total_lanes: int
     speed_limit_mph: float
     oneway: bool
-    coords: list[LatLon]  # ordered geometry
+    coords: np.ndarray  # (n, 2) float64 lon/lat, ordered geometry (GeoJSON axis order)
 
     @property
     def start(self) -> LatLon:
-        return self.coords[0]
+        return LatLon(lat=float(self.coords[0, 1]), lon=float(self.coords[0, 0]))
 
     @property
     def end(self) -> LatLon:
-        return self.coords[-1]
+        return LatLon(lat=float(self.coords[-1, 1]), lon=float(self.coords[-1, 0]))
+
+
+def pack_coords(segments: list[Segment]) -> tuple[np.ndarray, np.ndarray]:
+    """One shared (n, 2) coordinate buffer plus offsets: segment i is xy[off[i]:off[i + 1]]."""
+    offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum([len(s.coords) for s in segments], out=offsets[1:])
+    if not segments:
+        return np.zeros((0, 2)), offsets
+    return np.concatenate([s.coords for s in segments]), offsets
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+from routeopt.core.improve import improve_plan
+from routeopt.core.ingest import iter_segments_features, iter_segments_geojson
+from routeopt.core.lns import lns_plan
+from routeopt.core.matrix import DistanceMatrix, build_matrix
+from routeopt.core.multistart import multi_start
+from routeopt.core.output import routes_to_json
+from routeopt.core.replan import (
+    ReplanStats,
+    match_routes,
+    parse_night_list,
+    pending_rows,
+    replan,
+    split_frozen,
+    with_frozen,
+)
+from routeopt.core.routing import bbox_around
+from routeopt.core.solver import (
+    block_service_hours,
+    build_engine,
+    engine_settings,
+    greedy_plan,
+    night_from_ids,
+)
+from routeopt.core.split import split_segments
+from routeopt.core.tasks import BlockTable, build_block_table
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon
+
+MAX_BODY_BYTES = 512 << 20
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+# Endpoints and the options each accepts (replan takes the same ones as `routeopt replan`).
+_OPS = {
+    "plan": {"starts", "lns", "improve", "time_limit", "max_iters", "seed"},
+    "replan": {"improve", "time_limit"},
+    "evaluate": set(),
+}
+
+# Matrices loaded by this (worker) process, keyed by their .npy path prefix.
+_LOADED: OrderedDict[str, DistanceMatrix] = OrderedDict()
+_LOADED_MAX = 8
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _MatrixRef:
+    """A cached matrix as shipped to workers: everything but dist/time, plus the .npy prefix."""
+
+    key: str
+    skeleton: DistanceMatrix
+    prefix: str
+
+
+def _load_matrix(ref: _MatrixRef) -> DistanceMatrix:
+    m = _LOADED.get(ref.prefix)
+    if m is None:
+        m = replace(
+            ref.skeleton,
+            dist=np.load(ref.prefix + ".dist.npy", mmap_mode="r"),
+            time=np.load(ref.prefix + ".time.npy", mmap_mode="r"),
+        )
+        _LOADED[ref.prefix] = m
+        while len(_LOADED) > _LOADED_MAX:
+            _LOADED.popitem(last=False)
+    _LOADED.move_to_end(ref.prefix)
+    return m
+
+
+def _solve(job: dict) -> dict:
+    """Run one plan/replan/evaluate request against a cached matrix (in a worker)."""
+    constraints: Constraints = job["constraints"]
+    matrix = _load_matrix(job["matrix"])
+    opts = job["options"]
+    time_limit = float(opts.get("time_limit", 5.0))
+    extra: dict = {}
+
+    if job["op"] == "evaluate":
+        stats = ReplanStats()
+        svc_h = block_service_hours(constraints, matrix)
+        nights = [
+            night_from_ids(matrix, svc_h, ids)
+            for ids in match_routes(job["routes"], matrix.blocks, stats)
+            if ids
+        ]
+        max_h = constraints.limits.max_hours_per_night
+        served = sum(len(n.ids) for n in nights)
+        over = [i for i, n in enumerate(nights, start=1) if n.hours > max_h + 1e-9]
+        too_many = len(nights) > constraints.limits.max_nights
+        extra["evaluation"] = {
+            "feasible": not over and not too_many and served == len(matrix.blocks),
+            "nights_over_hours": over,
+            "exceeds_max_nights": too_many,
+            "unserved_blocks": len(matrix.blocks) - served,
+            "changed_blocks": stats.changed_blocks,
+            "removed_blocks": stats.removed_blocks,
+        }
+        return {**routes_to_json(constraints, nights, matrix), **extra}
+
+    if job["op"] == "replan":
+        nights, stats = replan(
+            constraints, job["routes"], matrix, reserved_nights=len(job["frozen"])
+        )
+        extra["replan"] = vars(stats)
+    else:
+        seed = int(opts.get("seed", 0))
+        starts = int(opts.get("starts", 1))
+        if starts > 1:
+            nights, _ = multi_start(constraints, matrix, starts=starts, workers=1, seed=seed)
+        else:
+            nights = greedy_plan(constraints, matrix.blocks, matrix)
+        if opts.get("lns"):
+            max_iters = opts.get("max_iters")
+            nights, _ = lns_plan(
+                constraints,
+                nights,
+                matrix,
+                time_limit=time_limit,
+                max_iters=None if max_iters is None else int(max_iters),
+                seed=seed,
+            )
+    if opts.get("improve"):
+        nights, _ = improve_plan(constraints, nights, matrix, time_limit=time_limit)
+    out = routes_to_json(constraints, nights, matrix)
+    if job["op"] == "replan":
+        out = with_frozen(out, job["frozen"])
+    return {**out, **extra}
+
+
+def _digest(*parts) -> str:
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class PlanningService:
+    """Planning requests against warm per-region caches.
+
+    Kept resident between requests:
+
+    * block tables, keyed by input content and the ingest/split settings;
+    * routing engines (OSM graph, snapping index, shortest-path cache), keyed by
+      the engine settings and reused while their graph bbox covers a request;
+    * distance matrices, keyed by engine and block endpoints, stored as ``.npy``
+      files that solve workers memory-map instead of receiving copies.
+
+    Routing runs on one thread and concurrent requests for the same matrix wait
+    for a single build. Solves run in a process pool (``workers`` processes; 1
+    runs them on a thread of this process).
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 0,
+        max_tables: int = 16,
+        max_matrices: int = 16,
+        max_engines: int = 4,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self._tmp = tempfile.TemporaryDirectory(prefix="routeopt-serve-")
+        self._tables: OrderedDict[str, BlockTable] = OrderedDict()
+        self._matrices: OrderedDict[str, _MatrixRef] = OrderedDict()
+        self._engines: OrderedDict[tuple, list[tuple]] = OrderedDict()
+        self._building: dict[str, asyncio.Future] = {}
+        self.max_tables, self.max_matrices, self.max_engines = max_tables, max_matrices, max_engines
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "table_hits": 0, "matrix_hits": 0, "engine_hits": 0}
+        # Engines are not thread-safe: every graph / matrix build runs on this one thread.
+        self._routing = ThreadPoolExecutor(max_workers=1, thread_name_prefix="routeopt-routing")
+        self._pool: Executor
+        if self.workers <= 1:
+            self._pool = ThreadPoolExecutor(max_workers=1)
+        else:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        self._routing.shutdown()
+        for engines in self._engines.values():
+            for _, engine in engines:
+                if hasattr(engine, "close"):
+                    engine.close()
+        self._tmp.cleanup()
+
+    # -- caches ------------------------------------------------------------------
+
+    def _blocks(self, req: dict, constraints: Constraints) -> BlockTable:
+        settings = (constraints.oneway.default, constraints.split.model_dump_json())
+        if "geojson" in req:
+            features = req["geojson"]
+            if isinstance(features, dict):
+                features = features.get("features", [])
+            key = _digest(json.dumps(features, sort_keys=True).encode(), settings)
+        elif "input" in req:
+            st = Path(req["input"]).stat()
+            key = _digest(str(Path(req["input"]).resolve()), st.st_mtime_ns, st.st_size, settings)
+        else:
+            raise ValueError("Request needs 'geojson' (a FeatureCollection) or 'input' (a path)")
+
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                self.stats["table_hits"] += 1
+                return table
+
+        oneway = constraints.oneway.default
+        if "geojson" in req:
+            segments = iter_segments_features(features, default_oneway=oneway)
+        else:
+            segments = iter_segments_geojson(req["input"], default_oneway=oneway)
+        table = build_block_table(split_segments(segments, constraints))
+        if not len(table):
+            raise ValueError("GeoJSON contains no usable LineString features")
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+
+    def _engine(self, constraints: Constraints, blocks: BlockTable):
+        """Engine for `constraints`, reusing one whose graph covers these blocks."""
+        settings = engine_settings(constraints)
+        depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
+        pts = [blocks.point(i) for i in range(len(blocks.poi_lat))]
+        bbox = bbox_around(depot, pts, constraints.osm_buffer_miles)
+        with self._lock:
+            for have, engine in self._engines.get(settings, []):
+                if have.covers(bbox):
+                    self._engines.move_to_end(settings)
+                    self.stats["engine_hits"] += 1
+                    return engine
+        engine = build_engine(constraints, depot, blocks)
+        with self._lock:
+            self._engines.setdefault(settings, []).append((bbox, engine))
+            while len(self._engines) > self.max_engines:
+                _, old = self._engines.popitem(last=False)
+                for _, e in old:
+                    if hasattr(e, "close"):
+                        e.close()
+        return engine
+
+    def _build_matrix(self, key: str, constraints: Constraints, blocks: BlockTable) -> _MatrixRef:
+        engine = self._engine(constraints, blocks)
+        depot = LatLon(lat=constraints.depot.lat, lon=constraints.depot.lon)
+        matrix = build_matrix(engine, depot, blocks)
+        if hasattr(engine, "flush"):
+            engine.flush()  # new shortest paths reach the persistent cache right away
+        prefix = str(Path(self._tmp.name) / key)
+        np.save(prefix + ".dist.npy", matrix.dist)
+        np.save(prefix + ".time.npy", matrix.time)
+        return _MatrixRef(key=key, skeleton=replace(matrix, dist=None, time=None), prefix=prefix)
+
+    async def _matrix(
+        self, constraints: Constraints, blocks: BlockTable
+    ) -> tuple[_MatrixRef, bool]:
+        """The matrix for these blocks, and whether it was cached (or already being built)."""
+        key = _digest(engine_settings(constraints), blocks.fingerprint())
+        ref = self._matrices.get(key)
+        if ref is not None:
+            self._matrices.move_to_end(key)
+            self.stats["matrix_hits"] += 1
+            return ref, True
+        pending = self._building.get(key)
+        if pending is not None:
+            self.stats["matrix_hits"] += 1
+            return await asyncio.shield(pending), True
+
+        fut = asyncio.get_running_loop().create_future()
+        self._building[key] = fut
+        try:
+            ref = await asyncio.get_running_loop().run_in_executor(
+                self._routing, self._build_matrix, key, constraints, blocks
+            )
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._building.pop(key, None)
+        fut.set_result(ref)
+        self._matrices[key] = ref
+        while len(self._matrices) > self.max_matrices:
+            # Workers that still have the files mapped keep reading them after unlink.
+            _, old = self._matrices.popitem(last=False)
+            for suffix in (".dist.npy", ".time.npy"):
+                Path(old.prefix + suffix).unlink(missing_ok=True)
+        return ref, False
+
+    # -- requests -----------------------------------------------------------------
+
+    async def handle(self, op: str, req: dict) -> dict:
+        t0 = time.perf_counter()
+        self.stats["requests"] += 1
+        if "constraints" not in req:
+            raise ValueError("Request needs 'constraints'")
+        options = req.get("options") or {}
+        if not isinstance(options, dict):
+            raise ValueError("'options' must be a JSON object")
+        unsupported = sorted(set(options) - _OPS[op])
+        if unsupported:
+            raise ValueError(f"/{op} does not support options: {', '.join(unsupported)}")
+        constraints = Constraints.model_validate(req["constraints"])
+        blocks = await asyncio.to_thread(self._blocks, req, constraints)
+        job = {"op": op, "constraints": constraints, "options": options}
+
+        if op in ("replan", "evaluate"):
+            previous = req.get("previous") if op == "replan" else req.get("routes")
+            if isinstance(previous, dict):
+                previous = previous.get("routes")
+            if not isinstance(previous, list):
+                field = "previous" if op == "replan" else "routes"
+                raise ValueError(f"Request needs '{field}' (a routes.json object)")
+            job["routes"] = previous
+            if op == "replan":
+                frozen, job["routes"] = split_frozen(previous, parse_night_list(req.get("frozen")))
+                blocks = blocks.take(pending_rows(blocks, frozen))
+                job["frozen"] = frozen
+
+        job["matrix"], cached = await self._matrix(constraints, blocks)
+        out = await asyncio.get_running_loop().run_in_executor(self._pool, _solve, job)
+        out.setdefault("meta", {})["server"] = {
+            "elapsed_s": round(time.perf_counter() - t0, 4),
+            "matrix_cached": cached,
+        }
+        return out
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/health":
+            return 200, {"status": "ok", "workers": self.workers, **self.stats}
+        op = path.lstrip("/")
+        if op not in _OPS:
+            return 404, {"error": f"Unknown endpoint: {path}"}
+        if method != "POST":
+            return 405, {"error": f"{path} expects POST"}
+        try:
+            req = json.loads(body or b"{}")
+            if not isinstance(req, dict):
+                raise ValueError("Request body must be a JSON object")
+            return 200, await self.handle(op, req)
+        except (ValueError, OSError, KeyError, TypeError) as e:
+            # pydantic's ValidationError is a ValueError.
+            return 400, {"error": str(e)}
+        except Exception as e:
+            # Missing optional dependencies, a broken worker pool, MemoryError, ...
+            log.exception("%s %s failed", method, path)
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                line = await reader.readline()
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                size = int(headers.get("content-length", "0"))
+                if size > MAX_BODY_BYTES:
+                    status, payload = 400, {"error": "Request body too large"}
+                else:
+                    body = await reader.readexactly(size) if size else b""
+                    status, payload = await self.dispatch(method.upper(), target, body)
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status, payload = 400, {"error": f"Malformed HTTP request: {e}"}
+            except Exception as e:
+                log.exception("Unhandled error serving a request")
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            data = json.dumps(payload).encode("utf-8")
+            head = (
+                f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + data)
+            await writer.drain()
+        except ConnectionError:
+            pass  # the client went away before reading the reply
+        finally:
+            writer.close()
+
+    async def start(self, *, host: str = "127.0.0.1", port: int = 8765, socket: str | None = None):
+        """Start listening on TCP `host`:`port`, or on the Unix socket `socket`."""
+        if socket:
+            return await asyncio.start_unix_server(self._connection, path=socket)
+        return await asyncio.start_server(self._connection, host=host, port=port)
+
+
+def serve(
+    *, host: str = "127.0.0.1", port: int = 8765, socket: str | None = None, workers: int = 0
+):
+    """Run the planning service until interrupted."""
+
+    async def main():
+        service = PlanningService(workers=workers)
+        server = await service.start(host=host, port=port, socket=socket)
+        where = socket or f"http://{host}:{port}"
+        print(f"routeopt serve: listening on {where} ({service.workers} workers)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
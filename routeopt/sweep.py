@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import copy
+import csv
+import itertools
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from routeopt.core.improve import improve_plan
+from routeopt.core.ingest import iter_segments_geojson
+from routeopt.core.matrix import DistanceMatrix, build_matrix
+from routeopt.core.output import iter_routes, plan_meta, write_plan
+from routeopt.core.routing import bbox_around
+from routeopt.core.solver import build_engine, deadhead_speed_mph, engine_settings, greedy_plan
+from routeopt.core.split import split_segments
+from routeopt.core.tasks import BlockTable, build_block_table
+from routeopt.models.constraints import Constraints
+from routeopt.models.network import Segment
+from routeopt.utils.geo import LatLon
+
+# Matrices memory-mapped by this (worker) process, keyed by their .npy path prefix.
+_LOADED: dict[str, DistanceMatrix] = {}
+
+
+@dataclass
+class Scenario:
+    index: int
+    values: dict  # varied constraint path -> value
+    constraints: Constraints
+
+
+@dataclass
+class ScenarioResult:
+    index: int
+    values: dict
+    nights: int = 0
+    deadhead_miles: float = math.inf
+    deadhead_hours: float = 0.0
+    service_hours: float = 0.0
+    blocks: int = 0
+    elapsed_s: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class SweepStats:
+    """What the scenarios shared: each count is work done once rather than per scenario."""
+
+    scenarios: int = 0
+    segment_reads: int = 0
+    block_tables: int = 0
+    matrices: int = 0
+    prepare_s: float = 0.0
+    solve_s: float = 0.0
+    results: list[ScenarioResult] = field(default_factory=list)
+
+
+def parse_vary(spec: str) -> tuple[str, list]:
+    """``limits.max_hours_per_night=3.5,4`` -> (path, [3.5, 4]); values are YAML scalars."""
+    path, sep, raw = spec.partition("=")
+    path = path.strip()
+    if not sep or not path or not raw.strip():
+        raise ValueError(f"--vary expects path=value[,value...], got: {spec}")
+    return path, [yaml.safe_load(v.strip()) for v in raw.split(",")]
+
+
+def scenarios(base: Constraints, vary: list[tuple[str, list]]) -> list[Scenario]:
+    """Every combination of the varied values applied to `base` (first --vary varies slowest)."""
+    data = base.model_dump()
+    for path, _ in vary:
+        node = data
+        for part in path.split("."):
+            if not isinstance(node, dict) or part not in node:
+                raise ValueError(f"Unknown constraint in --vary: {path}")
+            node = node[part]
+        if isinstance(node, dict):
+            raise ValueError(f"--vary needs a single setting, not a section: {path}")
+    paths = [path for path, _ in vary]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Each constraint may be varied only once")
+
+    out = []
+    for i, combo in enumerate(itertools.product(*(values for _, values in vary)), start=1):
+        d = copy.deepcopy(data)
+        for path, value in zip(paths, combo):
+            *parents, leaf = path.split(".")
+            node = d
+            for part in parents:
+                node = node[part]
+            node[leaf] = value
+        out.append(Scenario(i, dict(zip(paths, combo)), Constraints.model_validate(d)))
+    return out
+
+
+def _block_settings(c: Constraints) -> tuple:
+    """Constraint fields the block table depends on (ingest, then the virtual split)."""
+    if not c.split.enabled:
+        return (c.oneway.default,)
+    return (
+        c.oneway.default,
+        c.split.model_dump_json(),
+        c.limits.max_hours_per_night,
+        c.speed.model_dump_json(),
+        c.loopback.model_dump_json(),
+        c.depot.lat,
+        c.depot.lon,
+    )
+
+
+@dataclass
+class _SharedMatrix:
+    matrix: DistanceMatrix
+    mph: float  # deadhead speed the matrix times were computed with
+    prefix: str = ""  # .npy files for worker processes, once saved
+
+
+def prepare(
+    input_path: str, runs: list[Scenario], stats: SweepStats
+) -> dict[int, tuple[_SharedMatrix, float]]:
+    """Build each distinct block table and matrix once; scenario index -> (matrix, time scale).
+
+    Segments are read once per ``oneway.default``. Block tables are rebuilt only for
+    scenarios whose split settings differ, and identical tables are merged. Matrices
+    are keyed by the engine settings without the deadhead speed: a scenario with a
+    different speed reuses the matrix with its times rescaled.
+    """
+
+    segments: dict[bool, list[Segment]] = {}
+    tables: dict[tuple, BlockTable] = {}
+    by_content: dict[str, BlockTable] = {}
+    engines: dict[tuple, list[tuple]] = {}  # settings -> [(bbox, engine, mph)]
+    matrices: dict[tuple, _SharedMatrix] = {}
+    out = {}
+    try:
+        for run in runs:
+            c = run.constraints
+            bkey = _block_settings(c)
+            table = tables.get(bkey)
+            if table is None:
+                oneway = c.oneway.default
+                if oneway not in segments:
+                    segments[oneway] = list(
+                        iter_segments_geojson(input_path, default_oneway=oneway)
+                    )
+                    stats.segment_reads += 1
+                table = build_block_table(split_segments(segments[oneway], c))
+                if not len(table):
+                    raise ValueError("GeoJSON contains no usable LineString features")
+                table = tables[bkey] = by_content.setdefault(table.fingerprint(), table)
+                stats.block_tables = len(by_content)
+
+            settings = engine_settings(c, speed=False)
+            mkey = (settings, table.fingerprint())
+            shared = matrices.get(mkey)
+            if shared is None:
+                depot = LatLon(lat=c.depot.lat, lon=c.depot.lon)
+                pts = [table.point(i) for i in range(len(table.poi_lat))]
+                bbox = bbox_around(depot, pts, c.osm_buffer_miles)
+                # One engine (graph, snapping index) serves every table whose points it covers.
+                found = [(e, mph) for b, e, mph in engines.get(settings, []) if b.covers(bbox)]
+                if found:
+                    engine, mph = found[0]
+                else:
+                    engine, mph = build_engine(c, depot, table), deadhead_speed_mph(c)
+                    engines.setdefault(settings, []).append((bbox, engine, mph))
+                matrix = build_matrix(engine, depot, table)
+                shared = matrices[mkey] = _SharedMatrix(matrix, mph)
+                stats.matrices += 1
+            out[run.index] = (shared, shared.mph / deadhead_speed_mph(c))
+    finally:
+        for items in engines.values():
+            for _, engine, _ in items:
+                if hasattr(engine, "close"):
+                    engine.close()
+    return out
+
+
+def run_scenario(
+    run: Scenario,
+    matrix: DistanceMatrix,
+    *,
+    improve: bool = False,
+    time_limit: float = 10.0,
+    plans_dir: str | None = None,
+) -> ScenarioResult:
+    """Plan one scenario on its (shared) matrix; infeasible scenarios report their error."""
+    c = run.constraints
+    res = ScenarioResult(run.index, run.values, blocks=len(matrix.blocks))
+    t0 = time.perf_counter()
+    try:
+        nights = greedy_plan(c, matrix.blocks, matrix)
+        if improve:
+            nights, _ = improve_plan(c, nights, matrix, time_limit=time_limit)
+    except ValueError as e:
+        res.error = str(e)
+    else:
+        res.nights = len(nights)
+        res.deadhead_miles = sum(n.deadhead_miles for n in nights)
+        res.deadhead_hours = sum(n.deadhead_hours for n in nights)
+        res.service_hours = sum(n.service_hours for n in nights)
+        if plans_dir:
+            tag = {"scenario": run.index, "values": run.values}
+            meta = {**plan_meta(c, nights, matrix), "sweep": tag}
+            path = Path(plans_dir) / f"scenario_{run.index:03d}.json"
+            write_plan(path, meta, iter_routes(c, nights, matrix))
+    res.elapsed_s = time.perf_counter() - t0
+    return res
+
+
+def _scaled(matrix: DistanceMatrix, scale: float) -> DistanceMatrix:
+    return matrix if scale == 1.0 else replace(matrix, time=matrix.time * scale)
+
+
+def _solve_worker(job: tuple) -> ScenarioResult:
+    run, skeleton, prefix, scale, kwargs = job
+    m = _LOADED.get(prefix)
+    if m is None:
+        m = _LOADED[prefix] = replace(
+            skeleton,
+            dist=np.load(prefix + ".dist.npy", mmap_mode="r"),
+            time=np.load(prefix + ".time.npy", mmap_mode="r"),
+        )
+    return run_scenario(run, _scaled(m, scale), **kwargs)
+
+
+def sweep(
+    input_path: str,
+    base: Constraints,
+    vary: list[tuple[str, list]],
+    *,
+    workers: int = 0,
+    improve: bool = False,
+    time_limit: float = 10.0,
+    plans_dir: str | None = None,
+) -> SweepStats:
+    """Plan every combination of the `vary` values, sharing ingest, blocks and matrices.
+
+    Scenarios run in `workers` processes (0: every CPU) that memory-map the shared
+    matrices. With `plans_dir`, each feasible scenario's plan is written there as
+    ``scenario_NNN.json``.
+    """
+
+    runs = scenarios(base, vary)
+    stats = SweepStats(scenarios=len(runs))
+    t0 = time.perf_counter()
+    shared = prepare(input_path, runs, stats)
+    stats.prepare_s = time.perf_counter() - t0
+    if plans_dir:
+        Path(plans_dir).mkdir(parents=True, exist_ok=True)
+    kwargs = {"improve": improve, "time_limit": time_limit, "plans_dir": plans_dir}
+
+    t0 = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(runs))
+    if workers <= 1:
+        stats.results = [
+            run_scenario(run, _scaled(shared[run.index][0].matrix, shared[run.index][1]), **kwargs)
+            for run in runs
+        ]
+    else:
+        with tempfile.TemporaryDirectory(prefix="routeopt-sweep-") as tmp:
+            jobs = []
+            saved = 0
+            for run in runs:
+                sm, scale = shared[run.index]
+                if not sm.prefix:
+                    sm.prefix = str(Path(tmp) / f"m{saved}")
+                    saved += 1
+                    np.save(sm.prefix + ".dist.npy", sm.matrix.dist)
+                    np.save(sm.prefix + ".time.npy", sm.matrix.time)
+                skeleton = replace(sm.matrix, dist=None, time=None)
+                jobs.append((run, skeleton, sm.prefix, scale, kwargs))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                stats.results = list(pool.map(_solve_worker, jobs))
+    stats.solve_s = time.perf_counter() - t0
+    return stats
+
+
+_COLUMNS = ("nights", "deadhead_miles", "deadhead_hours", "service_hours", "blocks", "elapsed_s")
+
+
+def result_rows(stats: SweepStats) -> list[dict]:
+    """One flat row per scenario: its varied values, then the plan totals (or the error)."""
+    rows = []
+    for r in stats.results:
+        row = {"scenario": r.index, **r.values}
+        feasible = r.error is None
+        row.update(
+            nights=r.nights if feasible else None,
+            deadhead_miles=round(r.deadhead_miles, 2) if feasible else None,
+            deadhead_hours=round(r.deadhead_hours, 2) if feasible else None,
+            service_hours=round(r.service_hours, 2) if feasible else None,
+            blocks=r.blocks,
+            elapsed_s=round(r.elapsed_s, 2),
+            error=r.error or "",
+        )
+        rows.append(row)
+    return rows
+
+
+def format_table(rows: list[dict]) -> str:
+    """The rows as an aligned text table (a trailing error column only when one failed)."""
+    if not rows:
+        return ""
+    cols = [k for k in rows[0] if k != "error" or any(r["error"] for r in rows)]
+    cells = [["-" if r[k] is None else str(r[k]) for k in cols] for r in rows]
+    width = [max(len(k), *(len(c[i]) for c in cells)) for i, k in enumerate(cols)]
+    lines = ["  ".join(k.ljust(w) for k, w in zip(cols, width)).rstrip()]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(c, width)).rstrip() for c in cells]
+    return "\n".join(lines)
+
+
+def write_csv(path: str | Path, rows: list[dict]) -> None:
+    with Path(path).open("w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["scenario"])
+        w.writeheader()
+        w.writerows(rows)
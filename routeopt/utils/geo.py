@@ -3,6 +3,8 @@ from __future__ import annotations
 import math
 from dataclasses import dataclass
 
+import numpy as np
+
 
 @dataclass(frozen=True)
 class LatLon:
@@ -30,3 +32,35 @@ def bearing_deg(a: LatLon, b: LatLon) -> float:
     x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
     brng = math.degrees(math.atan2(y, x))
     return (brng + 360.0) % 360.0
+
+
+def haversine_miles_array(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine; inputs are degrees and broadcast like NumPy arrays."""
+    r = 3958.7613
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * r * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def bearing_deg_array(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized `bearing_deg`; inputs are degrees and broadcast like NumPy arrays."""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360.0) % 360.0
+
+
+def polyline_lengths_miles(xy: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Length of every polyline packed in one (n, 2) lon/lat buffer.
+
+    Polyline ``i`` is ``xy[offsets[i]:offsets[i + 1]]``; each needs >= 2 vertices.
+    """
+    leg = haversine_miles_array(xy[:-1, 1], xy[:-1, 0], xy[1:, 1], xy[1:, 0])
+    # Legs joining the last vertex of one polyline to the first of the next don't count.
+    leg[offsets[1:-1] - 1] = 0.0
+    return np.add.reduceat(leg, offsets[:-1]) if len(leg) else np.zeros(len(offsets) - 1)
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from routeopt.core.matrix import build_matrix
+from routeopt.core.routing import EuclideanRouting
+from routeopt.core.tasks import ServiceBlock
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon
+
+
+def _random_blocks(
+    n,
+    seed=0,
+    *,
+    spread=0.2,
+    passes=(1, 3),
+    miles=(0.5, 3.0),
+    step=(0.01, 0.0),
+    mileposts=False,
+):
+    """`n` blocks scattered within `spread` degrees of (0, 0).
+
+    Each ends `step` (dlat, dlon) from its start, or a random offset of up to 0.02
+    degrees each way with ``step=None``. With `mileposts`, two blocks in three
+    carry bmp/emp.
+    """
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n):
+        lat, lon = rng.uniform(-spread, spread), rng.uniform(-spread, spread)
+        count = rng.randint(*passes)
+        if step is None:
+            end = LatLon(lat + rng.uniform(0.0, 0.02), lon + rng.uniform(0.0, 0.02))
+        else:
+            end = LatLon(lat + step[0], lon + step[1])
+        blocks.append(
+            ServiceBlock(
+                roadway_id=f"R{i}",
+                direction="A",
+                azimuth_deg=0.0,
+                passes_required=count,
+                speed_limit_mph=30.0,
+                start=LatLon(lat, lon),
+                end=end,
+                service_distance_miles=rng.uniform(*miles),
+                bmp=0.0 if mileposts and i % 3 else None,
+                emp=1.0 if mileposts and i % 3 else None,
+            )
+        )
+    return blocks
+
+
+def _random_problem(n=60, seed=5, *, max_hours=3.0, depot=(0.0, 0.0), **kwargs):
+    """(constraints, blocks, matrix): `_random_blocks` served from `depot` (lat, lon), 45 mph."""
+    blocks = _random_blocks(n, seed, **kwargs)
+    lat, lon = depot
+    c = Constraints.model_validate(
+        {"depot": {"lat": lat, "lon": lon}, "limits": {"max_hours_per_night": max_hours}}
+    )
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=45.0), LatLon(lat, lon), blocks)
+    return c, blocks, m
+
+
+@pytest.fixture
+def random_blocks():
+    """Factory for reproducible random `ServiceBlock` lists (see `_random_blocks`)."""
+    return _random_blocks
+
+
+@pytest.fixture
+def random_problem():
+    """Factory for reproducible random planning problems (see `_random_problem`)."""
+    return _random_problem
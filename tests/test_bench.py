@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from routeopt.bench import (
+    Case,
+    compare,
+    drive_graph,
+    load_suite,
+    run_case,
+    synthetic_network,
+    write_geojson,
+)
+from routeopt.core.ingest import iter_segments_geojson
+
+
+@pytest.mark.parametrize("layout", ["grid", "radial"])
+def test_synthetic_network_is_reproducible_and_connected(layout):
+    csgraph = pytest.importorskip("scipy.sparse.csgraph")
+    a = synthetic_network(layout, 300, seed=4)
+    b = synthetic_network(layout, 300, seed=4)
+    assert len(a.served) == 300
+    assert np.array_equal(a.edges, b.edges) and np.array_equal(a.served, b.served)
+    assert not np.array_equal(a.served, synthetic_network(layout, 300, seed=5).served)
+
+    g = drive_graph(a)
+    assert csgraph.connected_components(g.matrix(), directed=True, connection="strong")[0] == 1
+
+
+def test_write_geojson_round_trips(tmp_path):
+    net = synthetic_network("grid", 50, seed=1)
+    path = write_geojson(net, tmp_path / "n.geojson", seed=1)
+    segs = list(iter_segments_geojson(path, default_oneway=False))
+    assert len(segs) == 50
+    assert all(s.total_lanes >= 1 and s.emp > 0 for s in segs)
+    assert json.loads(path.read_text())["type"] == "FeatureCollection"
+
+
+def test_run_case_and_compare(tmp_path):
+    pytest.importorskip("scipy")  # the csr engine
+    case = Case(name="tiny", layout="grid", segments=30, engine="csr", improve_seconds=30.0)
+    res = run_case(case, tmp_path, memory=True)
+    assert list(res["stages"]) == ["ingest", "blocks", "matrix", "construct", "improve"]
+    assert all("seconds" in r and "peak_mb" in r for r in res["stages"].values())
+    q = res["quality"]
+    assert q["improve"]["converged"]
+    assert q["improve"]["deadhead_miles"] <= q["construct"]["deadhead_miles"]
+
+    # Deterministic: a second run reproduces the plan.
+    again = run_case(case, tmp_path, memory=False)
+    assert again["quality"] == q
+    assert compare({"cases": {"tiny": res}}, {"cases": {"tiny": res}}) == []
+
+
+def test_compare_flags_regressions():
+    base = {
+        "cases": {
+            "c": {
+                "stages": {"matrix": {"seconds": 1.0, "peak_mb": 10.0}},
+                "quality": {
+                    "construct": {"nights": 5, "deadhead_miles": 100.0},
+                    "improve": {"nights": 5, "deadhead_miles": 50.0, "converged": True},
+                },
+            }
+        }
+    }
+    cur = {
+        "cases": {
+            "c": {
+                "stages": {"matrix": {"seconds": 2.0, "peak_mb": 10.5}},
+                "quality": {
+                    "construct": {"nights": 6, "deadhead_miles": 100.5},
+                    "improve": {"nights": 5, "deadhead_miles": 60.0, "converged": False},
+                },
+            }
+        }
+    }
+    out = compare(cur, base)
+    assert out == ["c/matrix: 1.000s -> 2.000s", "c/construct: nights 5 -> 6"]
+
+
+def test_load_suite_rejects_gapped_stages(tmp_path):
+    path = tmp_path / "suite.json"
+    path.write_text(json.dumps([{"name": "x", "layout": "grid", "segments": 10}]))
+    assert load_suite(path)[0].stages[-1] == "improve"
+    path.write_text(
+        json.dumps([{"name": "x", "layout": "grid", "segments": 10, "stages": ["matrix"]}])
+    )
+    with pytest.raises(ValueError):
+        load_suite(path)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from routeopt.core.tasks import (
+    BlockTable,
+    ServiceBlock,
+    as_block_table,
+    build_block_table,
+    build_service_blocks,
+)
+from routeopt.models.network import Segment
+from routeopt.utils.geo import LatLon
+
+
+def _seg(rid, coords, lanes=3, oneway=False):
+    return Segment(rid, None, None, lanes, 40.0, oneway, np.array(coords, dtype=np.float64))
+
+
+def test_block_table_columns_and_views():
+    segs = [
+        _seg("R1", [[-82.40, 28.00], [-82.40, 28.01]]),
+        _seg("R2", [[-82.40, 28.01], [-82.39, 28.01]], lanes=1),
+    ]
+    table = build_block_table(segs)
+
+    assert len(table) == 3  # R1 A/B, R2 A only
+    assert table.passes.tolist() == [2, 1, 1]
+    assert table.roadway_names == ["R1", "R2"]
+    # Shared endpoints are stored once: R1's end is R2's start.
+    assert len(table.poi_lat) == 3
+    assert table.end[0] == table.start[2]
+
+    b = table[1]
+    assert (b.roadway_id, b.direction, b.passes_required) == ("R1", "B", 1)
+    assert b.start == LatLon(28.01, -82.40)
+    assert b.azimuth_deg == (table[0].azimuth_deg + 180.0) % 360.0
+
+
+def test_service_block_views_round_trip_through_table():
+    blocks = build_service_blocks([_seg("R1", [[-82.4, 28.0], [-82.4, 28.01]])])
+    assert as_block_table(blocks) is blocks[0]._table
+
+    standalone = ServiceBlock(
+        roadway_id="R1",
+        direction="A",
+        azimuth_deg=blocks[0].azimuth_deg,
+        passes_required=2,
+        speed_limit_mph=40.0,
+        start=blocks[0].start,
+        end=blocks[0].end,
+        service_distance_miles=blocks[0].service_distance_miles,
+    )
+    assert standalone == blocks[0]
+    table = BlockTable.from_blocks([standalone, blocks[1]])
+    assert list(table) == blocks
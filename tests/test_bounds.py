@@ -0,0 +1,101 @@
+import itertools
+from dataclasses import replace
+
+import pytest
+
+from routeopt.core import bounds
+from routeopt.core.bounds import check_max_nights, gap, lower_bounds
+from routeopt.core.improve import improve_plan
+from routeopt.core.output import plan_meta
+from routeopt.core.solver import block_service_hours, greedy_plan, night_from_ids, service_table
+
+
+def _optimum(c, m):
+    """Fewest nights and least deadhead over every feasible plan (all orders, all cuts)."""
+    svc_h = block_service_hours(c, m)
+    n = len(svc_h)
+    best_nights, best_dead = None, None
+    for perm in itertools.permutations(range(n)):
+        for cuts in itertools.product((False, True), repeat=n - 1):
+            nights, cur = [], [perm[0]]
+            for k, cut in zip(perm[1:], cuts):
+                if cut:
+                    nights.append(cur)
+                    cur = []
+                cur.append(k)
+            nights.append(cur)
+            plan = [night_from_ids(m, svc_h, ids) for ids in nights]
+            if any(night.hours > c.limits.max_hours_per_night + 1e-9 for night in plan):
+                continue
+            dead = sum(night.deadhead_miles for night in plan)
+            best_nights = min(best_nights or len(plan), len(plan))
+            best_dead = min(best_dead or dead, dead)
+    return best_nights, best_dead
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_bounds_never_exceed_the_exact_optimum(seed, random_problem):
+    c, _, m = random_problem(5, seed, max_hours=1.5, spread=0.3)
+    nights, dead = _optimum(c, m)
+    lb = lower_bounds(c, m, service_table(c, m))
+    assert 1 <= lb.nights <= nights
+    assert 0.0 < lb.deadhead_miles <= dead + 1e-9
+
+
+def test_infeasible_max_nights_fails_before_construction(random_problem):
+    c, blocks, m = random_problem(80, 3, max_hours=2.0, spread=0.3)
+    lb = lower_bounds(c, m, service_table(c, m))
+    nights = greedy_plan(c, blocks, m)
+    assert lb.nights <= len(nights)
+    assert lb.deadhead_miles <= sum(n.deadhead_miles for n in nights)
+
+    c.limits.max_nights = lb.nights - 1
+    with pytest.raises(ValueError, match=f"at least {lb.nights} nights"):
+        check_max_nights(c, m, service_table(c, m))
+    with pytest.raises(ValueError, match="max_nights"):
+        greedy_plan(c, blocks, m)
+
+
+def test_gap_is_reported_and_stops_improvement(random_problem):
+    c, blocks, m = random_problem(40, 1, max_hours=2.0, spread=0.3)
+    nights = greedy_plan(c, blocks, m)
+    meta = plan_meta(c, nights, m)
+    lb = lower_bounds(c, m, service_table(c, m))
+    assert meta["lower_bound"]["nights"] == lb.nights
+    assert meta["deadhead_gap"] == pytest.approx(
+        gap(meta["total_deadhead_miles"], lb.deadhead_miles), abs=1e-4
+    )
+    assert gap(10.0, 8.0) == pytest.approx(0.2) and gap(5.0, 8.0) == 0.0
+
+
+def test_improvement_stops_within_a_realistic_gap(random_problem):
+    # A compact area 70 miles from the depot: the nights' depot legs dominate deadhead.
+    c, blocks, m = random_problem(30, 5, max_hours=5.0, depot=(1.0, 0.0), spread=0.05)
+    bound = lower_bounds(c, m, service_table(c, m)).deadhead_miles
+    nights = greedy_plan(c, blocks, m)
+    assert gap(sum(n.deadhead_miles for n in nights), bound) > 0.08
+
+    _, stats = improve_plan(c, [replace(n, ids=list(n.ids)) for n in nights], m, gap_tolerance=0.08)
+    assert stats.stopped_at_gap and stats.passes > 0
+    assert gap(stats.deadhead_after, bound) <= 0.08
+    _, stats = improve_plan(c, nights, m)
+    assert not stats.stopped_at_gap
+
+
+def test_block_pair_scan_runs_once_per_matrix(random_problem, monkeypatch):
+    c, _, m = random_problem(30, 2, max_hours=2.0, spread=0.3)
+    table = service_table(c, m)
+    first = lower_bounds(c, m, table)
+    assert set(m.cache) == {("between_blocks", "dist"), ("between_blocks", "time")}
+
+    monkeypatch.setattr(bounds, "_CHUNK", None)  # any further scan would fail
+    assert lower_bounds(c, m, table) == first
+    check_max_nights(c, m, table)
+
+    # A matrix with other times starts without the cached scan.
+    monkeypatch.undo()
+    slower = replace(m, time=m.time * 2.0)
+    assert slower.cache == {}
+    lower_bounds(c, slower, table)
+    key = ("between_blocks", "time")
+    assert slower.cache[key][0] == pytest.approx(2.0 * m.cache[key][0])
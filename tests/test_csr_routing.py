@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from routeopt.core.csr import CSRGraph
+from routeopt.core.routing import CSRRouting
+from routeopt.utils.geo import LatLon
+
+
+def _grid_graph(n=6, step=0.01):
+    g = nx.MultiDiGraph()
+    for i in range(n):
+        for j in range(n):
+            g.add_node(i * n + j, x=-82.4 + j * step, y=28.0 + i * step)
+    for i in range(n):
+        for j in range(n):
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                a, b = i + di, j + dj
+                if 0 <= a < n and 0 <= b < n:
+                    g.add_edge(i * n + j, a * n + b, length=1000.0)
+    g.add_edge(0, 1, length=5000.0)  # longer parallel edge must be ignored
+    return g
+
+
+def test_csr_graph_collapses_parallel_edges_and_round_trips(tmp_path: Path):
+    g = _grid_graph()
+    csr = CSRGraph.from_networkx(g, 30.0)
+    assert csr.num_edges == g.number_of_edges() - 1
+    row = csr.indices[csr.indptr[0] : csr.indptr[1]].tolist()
+    assert row.count(1) == 1
+    assert csr.length[csr.indptr[0] + row.index(1)] == pytest.approx(1000.0 / 1609.344)
+
+    p = tmp_path / "g.npz"
+    csr.save(p)
+    back = CSRGraph.load(p)
+    assert np.array_equal(back.indptr, csr.indptr)
+    assert back.fingerprint() == csr.fingerprint()
+    assert csr.with_speed(45.0).fingerprint() != csr.fingerprint()
+
+    # Moving length between two edges keeps every total but changes shortest paths.
+    moved = CSRGraph.load(p)
+    moved.length = moved.length.copy()
+    moved.length[:2] += np.float32([0.25, -0.25])
+    assert moved.fingerprint() != csr.fingerprint()
+
+
+def test_csr_routing_matrix_matches_networkx(tmp_path: Path):
+    pytest.importorskip("scipy")  # the csr engine
+    g = _grid_graph()
+    p = tmp_path / "g.npz"
+    CSRGraph.from_networkx(g, 30.0).save(p)
+    pts = [LatLon(28.0, -82.4), LatLon(28.05, -82.35), LatLon(28.02, -82.39)]
+    eng = CSRRouting(
+        depot=pts[0], points=pts[1:], buffer_miles=1.0, deadhead_speed_mph=30.0, graph_path=str(p)
+    )
+    dist, time = eng.dist_time_matrix(pts)
+
+    nodes = [0, 35, 13]
+    for i, a in enumerate(nodes):
+        for j, b in enumerate(nodes):
+            meters = nx.shortest_path_length(g, a, b, weight="length")
+            assert dist[i, j] == pytest.approx(meters / 1609.344, rel=1e-5)
+            assert time[i, j] == pytest.approx(meters / 1609.344 / 30.0, rel=1e-5)
+    assert eng.dist_time(pts[1], pts[0]).distance_miles == pytest.approx(dist[1, 0])
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from routeopt.core.decompose import cluster_blocks, decomposed_plan, merge_light_nights
+from routeopt.core.solver import Construction, block_service_hours, greedy_plan, night_from_ids
+
+
+@pytest.mark.parametrize("method", ["kmeans", "sweep"])
+def test_clusters_partition_blocks(method, random_problem):
+    c, blocks, m = random_problem(120, 7, spread=0.3)
+    clusters = cluster_blocks(c, m, nights_per_cluster=1, method=method)
+    assert len(clusters) > 2
+    assert sorted(np.concatenate(clusters).tolist()) == list(range(len(blocks)))
+
+
+def test_submatrix_keeps_distances_and_service_hours(random_problem):
+    c, _blocks, m = random_problem(120, 7, spread=0.3)
+    rows = np.array([5, 17, 3, 90])
+    sub = m.submatrix(rows)
+    assert sub.points[0] == m.points[0]
+    for i, k in enumerate(rows):
+        assert sub.dist[0, sub.block_start[i]] == m.dist[0, m.block_start[k]]
+        assert sub.dist[sub.block_end[i], 0] == m.dist[m.block_end[k], 0]
+        assert sub.blocks[i] == m.blocks[k]
+    assert block_service_hours(c, sub) == [block_service_hours(c, m)[k] for k in rows]
+
+
+@pytest.mark.parametrize("method", ["kmeans", "sweep"])
+def test_decomposed_plan_is_complete_and_feasible(method, random_problem):
+    c, blocks, m = random_problem(120, 7, spread=0.3)
+    nights, results = decomposed_plan(
+        c, m, nights_per_cluster=1, method=method, workers=1, cluster_time_limit=1.0
+    )
+    assert len(results) > 2
+    assert sorted(k for n in nights for k in n.ids) == list(range(len(blocks)))
+    assert all(n.hours <= 3.0 + 1e-9 for n in nights)
+    for n in nights:
+        fresh = night_from_ids(m, Construction(c, m).svc_h, n.ids)
+        assert n.deadhead_miles == pytest.approx(fresh.deadhead_miles)
+
+    again, _ = decomposed_plan(
+        c, m, nights_per_cluster=1, method=method, workers=2, cluster_time_limit=1.0
+    )
+    assert [n.ids for n in again] == [n.ids for n in nights]
+
+
+def test_merge_light_nights_folds_a_split_night_back(random_problem):
+    c, blocks, m = random_problem(20, 7, spread=0.3)
+    nights = greedy_plan(c, blocks, m)
+    svc_h = Construction(c, m).svc_h
+    # Split the first night's last block off into a night of its own.
+    first = nights[0]
+    nights[0] = night_from_ids(m, svc_h, first.ids[:-1])
+    nights.append(night_from_ids(m, svc_h, first.ids[-1:]))
+    before = len(nights)
+    assert merge_light_nights(c, nights, m) >= 1
+    assert len(nights) < before
+    assert sorted(k for n in nights for k in n.ids) == list(range(len(blocks)))
@@ -0,0 +1,47 @@
+import random
+
+import networkx as nx
+import pytest
+
+from routeopt.core.dijkstra import build_adjacency, many_to_many, one_to_many
+
+
+def _random_graph(n=60, seed=0):
+    rng = random.Random(seed)
+    g = nx.MultiDiGraph()
+    for _ in range(n * 4):
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            d = rng.uniform(0.1, 2.0)
+            g.add_edge(u, v, _dist_miles=d, _time_h=d / 30.0)
+    return g
+
+
+def test_one_to_many_matches_networkx():
+    g = _random_graph()
+    adj = build_adjacency(g)
+    targets = set(range(0, 60, 3))
+    row = one_to_many(adj, 0, targets)
+    expected = nx.single_source_dijkstra_path_length(g, 0, weight="_dist_miles")
+    for t in targets:
+        if t in expected:
+            assert row[t][0] == pytest.approx(expected[t])
+            assert row[t][1] == pytest.approx(expected[t] / 30.0)
+        else:
+            assert t not in row
+
+
+def test_build_adjacency_keeps_shortest_parallel_edge():
+    g = nx.MultiDiGraph()
+    g.add_edge(1, 2, _dist_miles=2.0, _time_h=0.1)
+    g.add_edge(1, 2, _dist_miles=1.0, _time_h=0.2)
+    assert build_adjacency(g) == {1: [(2, 1.0, 0.2)]}
+
+
+def test_many_to_many_pool_matches_in_process():
+    adj = build_adjacency(_random_graph(seed=1))
+    sources = list(range(40))
+    targets = list(range(0, 60, 2))
+    serial = many_to_many(adj, sources, targets, workers=1)
+    pooled = many_to_many(adj, sources, targets, workers=2, chunk=4)
+    assert serial == pooled
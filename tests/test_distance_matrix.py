@@ -0,0 +1,55 @@
+import pytest
+
+from routeopt.core import solver
+from routeopt.core.matrix import DEPOT, build_matrix
+from routeopt.core.output import routes_to_json
+from routeopt.core.routing import EuclideanRouting
+from routeopt.core.solver import greedy_plan
+from routeopt.core.tasks import ServiceBlock
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon, haversine_miles
+
+
+def _blk(rid, start, end):
+    return ServiceBlock(
+        roadway_id=rid,
+        direction="A",
+        azimuth_deg=0.0,
+        passes_required=1,
+        speed_limit_mph=30.0,
+        start=start,
+        end=end,
+        service_distance_miles=1.0,
+    )
+
+
+def test_matrix_indexes_depot_and_shared_endpoints():
+    depot = LatLon(0.0, 0.0)
+    a, b, c = LatLon(0.0, 0.1), LatLon(0.1, 0.1), LatLon(0.2, 0.1)
+    blocks = [_blk("R1", a, b), _blk("R2", b, c)]
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=30.0), depot, blocks)
+
+    assert m.points[DEPOT] == depot
+    assert m.size == 4  # depot + a, b, c
+    assert m.block_end[0] == m.block_start[1]
+    leg = m.leg(DEPOT, m.block_start[0])
+    assert leg.distance_miles == pytest.approx(haversine_miles(depot, a))
+    assert leg.duration_hours == pytest.approx(leg.distance_miles / 30.0)
+    assert m.dist[1, 1] == 0.0
+
+
+def test_output_reuses_matrix_without_rebuilding_engine(monkeypatch):
+    c = Constraints.model_validate({"depot": {"lat": 0.0, "lon": 0.0}})
+    depot = LatLon(0.0, 0.0)
+    blocks = [_blk("R1", LatLon(0.0, 0.1), LatLon(0.1, 0.1))]
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=45.0), depot, blocks)
+    nights = greedy_plan(c, blocks, m)
+
+    def _no_engine(*_a, **_k):
+        raise AssertionError("writer must not rebuild the routing engine")
+
+    monkeypatch.setattr(solver, "build_engine", _no_engine)
+    out = routes_to_json(c, nights, m)
+    steps = out["routes"][0]["steps"]
+    assert steps[0]["distance_miles"] == pytest.approx(round(float(m.dist[0, 1]), 4))
+    assert out["meta"]["total_nights"] == 1
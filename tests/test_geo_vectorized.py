@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from routeopt.core.tasks import linestring_length_miles
+from routeopt.models.network import Segment, pack_coords
+from routeopt.utils.geo import (
+    LatLon,
+    bearing_deg,
+    bearing_deg_array,
+    haversine_miles,
+    polyline_lengths_miles,
+)
+
+
+def _seg(rid, coords):
+    return Segment(rid, None, None, 2, 40.0, False, np.array(coords, dtype=np.float64))
+
+
+def test_packed_lengths_match_scalar_haversine():
+    rng = np.random.default_rng(3)
+    segs = [
+        _seg(f"R{i}", np.column_stack((-82.4 + rng.random(n) / 50, 28.0 + rng.random(n) / 50)))
+        for i, n in enumerate((2, 5, 3, 9))
+    ]
+    xy, offsets = pack_coords(segs)
+    assert offsets.tolist() == [0, 2, 7, 10, 19]
+
+    lengths = polyline_lengths_miles(xy, offsets)
+    for s, got in zip(segs, lengths):
+        pts = [LatLon(lat=lat, lon=lon) for lon, lat in s.coords]
+        want = sum(haversine_miles(a, b) for a, b in zip(pts, pts[1:]))
+        assert got == pytest.approx(want, rel=1e-12)
+        assert linestring_length_miles(pts) == pytest.approx(want, rel=1e-12)
+
+
+def test_bearing_array_matches_scalar():
+    a, b = LatLon(28.0, -82.4), LatLon(27.9, -82.5)
+    got = bearing_deg_array(a.lat, a.lon, np.array([b.lat, a.lat]), np.array([b.lon, -82.3]))
+    assert got[0] == pytest.approx(bearing_deg(a, b))
+    assert got[1] == pytest.approx(bearing_deg(a, LatLon(28.0, -82.3)))
@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pytest
+
+from routeopt.core.csr import CSRGraph
+from routeopt.core.geometry import night_legs, write_geometry
+from routeopt.core.matrix import build_matrix
+from routeopt.core.solver import build_engine, greedy_plan
+from routeopt.core.tasks import BlockTable, ServiceBlock
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon, haversine_miles
+
+
+def _grid(n=8, step=0.01):
+    """Two-way street grid whose edge lengths are the straight-line distances."""
+    ids = np.arange(n * n)
+    x = np.tile(np.arange(n), n) * step - 82.4
+    y = np.repeat(np.arange(n), n) * step + 28.0
+    rows, cols = [], []
+    for i in range(n):
+        for j in range(n):
+            for a, b in ((i, j + 1), (i + 1, j)):
+                if a < n and b < n:
+                    u, v = i * n + j, a * n + b
+                    rows += [u, v]
+                    cols += [v, u]
+    miles = [haversine_miles(LatLon(y[u], x[u]), LatLon(y[v], x[v])) for u, v in zip(rows, cols)]
+    return CSRGraph.from_edges(ids, x, y, np.array(rows), np.array(cols), np.array(miles), 30.0)
+
+
+def _blocks(step=0.01):
+    out = []
+    for k, (i, j, az) in enumerate(((1, 1, 90.0), (5, 2, 90.0), (3, 6, 0.0), (6, 5, 0.0))):
+        a = LatLon(28.0 + i * step, -82.4 + j * step)
+        b = LatLon(a.lat, a.lon + step) if az == 90.0 else LatLon(a.lat + step, a.lon)
+        out.append(
+            ServiceBlock(
+                roadway_id=f"R{k}",
+                direction="A",
+                azimuth_deg=az,
+                passes_required=2 if k == 2 else 1,
+                speed_limit_mph=30.0,
+                start=a,
+                end=b,
+                service_distance_miles=haversine_miles(a, b),
+            )
+        )
+    return BlockTable.from_blocks(out)
+
+
+def _constraints(engine, **extra):
+    return Constraints.model_validate(
+        {
+            "depot": {"lat": 28.0, "lon": -82.4},
+            "routing_engine": engine,
+            "loopback": {"mode": "routing"},
+            "limits": {"max_hours_per_night": 0.4},
+            **extra,
+        }
+    )
+
+
+def _read(out_dir):
+    return {p.name: json.loads(p.read_text()) for p in sorted(out_dir.iterdir())}
+
+
+def test_csr_paths_follow_the_graph_and_match_the_matrix(tmp_path):
+    pytest.importorskip("scipy")  # the csr engine
+    gp = tmp_path / "g.npz"
+    _grid().save(gp)
+    c = _constraints("csr", osm_graph_path=str(gp))
+    depot = LatLon(28.0, -82.4)
+    table = _blocks()
+    engine = build_engine(c, depot, table)
+    matrix = build_matrix(engine, depot, table)
+    nights = greedy_plan(c, table, matrix)
+    assert len(nights) > 1
+
+    n = write_geometry(tmp_path / "geo", c, nights, matrix, engine, workers=1)
+    files = _read(tmp_path / "geo")
+    assert list(files) == [f"night_{i:03d}.geojson" for i in range(1, len(nights) + 1)]
+    features = [f for fc in files.values() for f in fc["features"]]
+    assert len(features) == n
+    assert {f["properties"]["type"] for f in features} == {"deadhead", "loopback", "service_block"}
+
+    for f in features:
+        p = f["properties"]
+        coords = f["geometry"]["coordinates"]
+        if p["type"] == "service_block":
+            assert len(coords) == 2
+            continue
+        assert p["routed"]
+        # Endpoints sit on grid nodes, so the drawn polyline is the routed length.
+        drawn = sum(
+            haversine_miles(LatLon(a[1], a[0]), LatLon(b[1], b[0]))
+            for a, b in zip(coords, coords[1:])
+        )
+        assert drawn == pytest.approx(p["distance_miles"], abs=1e-3)
+
+    first = files["night_001.geojson"]["features"]
+    assert first[0]["properties"]["from"] == "Depot"
+    assert first[-1]["properties"]["to"] == "Depot"
+    assert [f["properties"]["step"] for f in first if f["properties"]["type"] == "deadhead"] == [
+        1 + 2 * i for i in range(len(nights[0].ids) + 1)
+    ]
+
+
+def test_euclidean_legs_are_straight_and_workers_agree(tmp_path):
+    c = _constraints("euclidean")
+    depot = LatLon(28.0, -82.4)
+    table = _blocks()
+    engine = build_engine(c, depot, table)
+    matrix = build_matrix(engine, depot, table)
+    nights = greedy_plan(c, table, matrix)
+
+    write_geometry(tmp_path / "a", c, nights, matrix, engine, workers=1, start=3)
+    write_geometry(tmp_path / "b", c, nights, matrix, engine, workers=2, start=3)
+    a, b = _read(tmp_path / "a"), _read(tmp_path / "b")
+    assert a == b
+    assert min(a) == "night_003.geojson"
+    for fc in a.values():
+        for f in fc["features"]:
+            assert len(f["geometry"]["coordinates"]) == 2
+            assert f["properties"]["night_index"] >= 3
+
+    legs = night_legs(c, matrix, nights[0].ids)
+    dead = [leg for leg in legs if leg.kind == "deadhead"]
+    assert sum(leg.miles for leg in dead) == pytest.approx(nights[0].deadhead_miles)
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import networkx as nx
+
+from routeopt.core.graph_cache import BBox, GraphCache, load_graph_file
+
+
+def _graph():
+    g = nx.MultiDiGraph()
+    g.add_edge(1, 2, length=1609.344)
+    return g
+
+
+def test_graph_cache_hit_when_cached_bbox_covers_request(tmp_path: Path):
+    cache = GraphCache(tmp_path)
+    big = BBox(north=29.0, south=27.0, east=-81.0, west=-83.0)
+    path = cache.store(_graph(), big, "drive")
+
+    inner = BBox(north=28.5, south=27.5, east=-81.5, west=-82.5)
+    assert cache.find(inner, "drive") == path
+    assert cache.find(inner, "walk") is None
+    outside = BBox(north=30.0, south=27.5, east=-81.5, west=-82.5)
+    assert cache.find(outside, "drive") is None
+
+    g = load_graph_file(path)
+    assert g.number_of_edges() == 1
+
+
+def test_graph_cache_prefers_smallest_covering_graph(tmp_path: Path):
+    cache = GraphCache(tmp_path)
+    cache.store(_graph(), BBox(north=30.0, south=26.0, east=-80.0, west=-84.0), "drive")
+    small = cache.store(_graph(), BBox(north=28.6, south=27.4, east=-81.4, west=-82.6), "drive")
+    assert cache.find(BBox(north=28.5, south=27.5, east=-81.5, west=-82.5), "drive") == small
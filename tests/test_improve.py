@@ -0,0 +1,27 @@
+import pytest
+
+from routeopt.core.improve import improve_plan
+from routeopt.core.solver import (
+    estimate_night_deadhead,
+    estimate_night_service,
+    greedy_plan,
+    service_table,
+)
+
+
+def test_improve_plan_reduces_deadhead_and_keeps_feasibility(random_problem):
+    c, blocks, m = random_problem(60, 7)
+    c.loopback.mode = "routing"
+    nights = greedy_plan(c, blocks, m)
+
+    nights, stats = improve_plan(c, nights, m, time_limit=5.0)
+
+    assert stats.deadhead_after <= stats.deadhead_before
+    assert stats.nights_after <= stats.nights_before
+    assert sorted(k for n in nights for k in n.ids) == list(range(len(blocks)))
+    table = service_table(c, m)
+    for night in nights:
+        dead = estimate_night_deadhead(m, night.ids)
+        svc = estimate_night_service(table, night.ids)
+        assert night.deadhead_miles == pytest.approx(dead.distance_miles)
+        assert dead.duration_hours + svc.duration_hours <= c.limits.max_hours_per_night + 1e-9
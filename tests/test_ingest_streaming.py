@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from routeopt.core import ingest
+from routeopt.core.ingest import iter_segments_geojson, load_segments_geojson
+
+
+def _feature(rid, lanes=2):
+    return {
+        "type": "Feature",
+        "properties": {"roadway_id": rid, "total_lanes": lanes, "speed_limit": 40},
+        "geometry": {"type": "LineString", "coordinates": [[-82.41, 28.05], [-82.41, 28.06]]},
+    }
+
+
+def test_streaming_matches_full_load_with_tiny_chunks(tmp_path: Path, monkeypatch):
+    # "type" after "features" and a foreign member before it must both be accepted.
+    gj = {
+        "name": "roads",
+        "features": [_feature(f"R{i}") for i in range(50)],
+        "type": "FeatureCollection",
+    }
+    p = tmp_path / "in.geojson"
+    p.write_text(json.dumps(gj), encoding="utf-8")
+    monkeypatch.setattr(ingest, "_CHUNK", 7)
+    segs = list(iter_segments_geojson(p, default_oneway=False))
+    assert [s.roadway_id for s in segs] == [f"R{i}" for i in range(50)]
+
+
+def test_ndjson_and_feature_index_in_errors(tmp_path: Path):
+    p = tmp_path / "in.geojsonl"
+    lines = [json.dumps(_feature("R0")), "", json.dumps(_feature("R1", lanes=0))]
+    p.write_text("\n".join(lines), encoding="utf-8")
+    it = iter_segments_geojson(p, default_oneway=False)
+    assert next(it).roadway_id == "R0"
+    with pytest.raises(ValueError, match=r"^Feature 1: Invalid total_lanes"):
+        next(it)
+
+
+def test_truncated_file_reports_feature(tmp_path: Path):
+    text = json.dumps({"type": "FeatureCollection", "features": [_feature("R0"), _feature("R1")]})
+    p = tmp_path / "in.geojson"
+    p.write_text(text[:-40], encoding="utf-8")
+    with pytest.raises(ValueError, match=r"^Feature 1: Invalid GeoJSON"):
+        load_segments_geojson(p, default_oneway=False)
+
+    p.write_text(json.dumps({"type": "Feature", "features": []}), encoding="utf-8")
+    with pytest.raises(ValueError, match="FeatureCollection"):
+        load_segments_geojson(p, default_oneway=False)
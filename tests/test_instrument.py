@@ -0,0 +1,74 @@
+import json
+import pstats
+
+from routeopt.cli import main
+from routeopt.core import instrument
+from routeopt.core.instrument import Profiler, code_profiler, profiling
+
+
+def test_spans_nest_and_counters_add_up():
+    prof = Profiler()
+    with profiling(prof):
+        with instrument.span("plan"):
+            for _ in range(2):
+                with instrument.span("matrix"):
+                    instrument.count("routing.dist_time", 3)
+            instrument.count("routing.dist_time")
+    rep = prof.report()
+    assert [(s["name"], s["calls"]) for s in rep["spans"]] == [("plan", 1), ("plan/matrix", 2)]
+    assert rep["counters"] == {"routing.dist_time": 7}
+
+
+def test_disabled_instrumentation_is_a_no_op():
+    with profiling(None):
+        with instrument.span("x"):
+            instrument.count("y")
+        assert not instrument.due()
+    assert instrument._active is None
+
+
+def test_progress_is_rate_limited():
+    lines = []
+    prof = Profiler(progress_every=3600.0, log=lines.append)
+    with profiling(prof):
+        assert not instrument.due()
+        prof._next = 0.0
+        assert instrument.due() and not instrument.due()
+        instrument.progress("halfway")
+    assert len(lines) == 1 and lines[0].endswith("halfway")
+
+
+def test_plan_writes_profile_and_cprofile_dump(tmp_path):
+    out, report, dump = tmp_path / "routes.json", tmp_path / "p.json", tmp_path / "p.pstats"
+    main(
+        [
+            "plan",
+            "--input",
+            "examples/sample.geojson",
+            "--constraints",
+            "examples/constraints.euclidean.yaml",
+            "--output",
+            str(out),
+            "--improve",
+            "--time-limit",
+            "1",
+            "--profile",
+            str(report),
+            "--profile-dump",
+            str(dump),
+        ]
+    )
+    rep = json.loads(report.read_text())
+    names = [s["name"] for s in rep["spans"]]
+    for phase in ("ingest", "matrix", "construct", "improve", "output"):
+        assert f"plan/{phase}" in names
+    assert rep["counters"]["insertion_trials"] > 0
+    assert rep["counters"]["matrix.points"] > 1
+    assert pstats.Stats(str(dump)).total_calls > 0
+    assert instrument._active is None
+
+
+def test_code_profiler_without_path_does_nothing(tmp_path):
+    with code_profiler(None):
+        pass
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from routeopt.core import lns
+from routeopt.core.lns import lns_plan, read_checkpoint, write_checkpoint
+from routeopt.core.solver import greedy_plan
+
+
+def _check(c, nights, n):
+    assert sorted(k for night in nights for k in night.ids) == list(range(n))
+    assert all(night.hours <= c.limits.max_hours_per_night + 1e-9 for night in nights)
+    assert len(nights) <= c.limits.max_nights
+
+
+def test_lns_never_returns_worse_and_stays_feasible(tmp_path, random_problem):
+    c, blocks, m = random_problem()
+    nights = greedy_plan(c, blocks, m)
+    before = sum(n.deadhead_miles for n in nights)
+    ckpt = tmp_path / "best.json"
+
+    out, stats = lns_plan(c, nights, m, time_limit=None, max_iters=200, seed=1, checkpoint=ckpt)
+    _check(c, out, len(blocks))
+    assert stats.iterations == 200
+    assert stats.deadhead_after <= before + 1e-9
+    assert stats.deadhead_after == pytest.approx(sum(n.deadhead_miles for n in out))
+
+    # The checkpoint restores exactly the returned plan, with totals recomputed.
+    data = json.loads(ckpt.read_text())
+    assert data["nights"] == [n.ids for n in out]
+    restored = read_checkpoint(ckpt, c, m)
+    assert [n.deadhead_miles for n in restored] == pytest.approx([n.deadhead_miles for n in out])
+
+
+def test_lns_respects_max_nights(random_problem):
+    c, blocks, m = random_problem()
+    nights = greedy_plan(c, blocks, m)
+    c.limits.max_nights = len(nights)
+    out, _ = lns_plan(c, nights, m, time_limit=None, max_iters=100, seed=2)
+    _check(c, out, len(blocks))
+
+
+def test_ctrl_c_returns_best_so_far_and_saves_it(tmp_path, monkeypatch, random_problem):
+    c, blocks, m = random_problem()
+    nights = greedy_plan(c, blocks, m)
+    real = lns._LNS.recreate
+    calls = []
+
+    def interrupt_later(self, *a):
+        calls.append(1)
+        if len(calls) > 30:
+            raise KeyboardInterrupt
+        return real(self, *a)
+
+    monkeypatch.setattr(lns._LNS, "recreate", interrupt_later)
+    ckpt = tmp_path / "best.json"
+    out, stats = lns_plan(c, nights, m, time_limit=60.0, seed=3, checkpoint=ckpt)
+    assert stats.interrupted and stats.iterations == 30
+    _check(c, out, len(blocks))
+    assert [n.ids for n in read_checkpoint(ckpt, c, m)] == [n.ids for n in out]
+
+
+def test_checkpoint_for_other_input_is_rejected(tmp_path, random_problem):
+    c, blocks, m = random_problem()
+    ckpt = tmp_path / "x.json"
+    write_checkpoint(ckpt, greedy_plan(c, blocks, m), m)
+    assert len(read_checkpoint(ckpt, c, m)) > 1
+
+    # Same number of blocks, other input: the ids would fit, the fingerprint does not.
+    c2, blocks2, m2 = random_problem(seed=6)
+    assert len(blocks2) == len(blocks)
+    with pytest.raises(ValueError, match="another input"):
+        read_checkpoint(ckpt, c2, m2)
+
+    data = json.loads(ckpt.read_text())
+    ckpt.write_text(json.dumps({**data, "nights": [[0, 1]]}))
+    with pytest.raises(ValueError, match="does not cover"):
+        read_checkpoint(ckpt, c, m)
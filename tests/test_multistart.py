@@ -0,0 +1,32 @@
+import pytest
+
+from routeopt.core.multistart import ORDERINGS, multi_start, regret_plan, run_start
+from routeopt.core.solver import greedy_plan
+
+
+def test_every_start_builds_a_complete_feasible_plan(random_problem):
+    c, blocks, m = random_problem()
+    base = greedy_plan(c, blocks, m)
+    for s in range(len(ORDERINGS)):
+        nights, res = run_start(c, m, s)
+        assert res.error is None
+        assert sorted(k for n in nights for k in n.ids) == list(range(len(blocks)))
+        assert all(n.hours <= 3.0 + 1e-9 for n in nights)
+        if s == 0:
+            assert [n.ids for n in nights] == [n.ids for n in base]
+    assert regret_plan(c, m, k=3)
+
+
+def test_multi_start_pool_matches_in_process_and_picks_least_deadhead(random_problem):
+    c, _blocks, m = random_problem()
+    best, results = multi_start(c, m, starts=7, workers=1, seed=3)
+    assert len(results) == 7
+    assert sum(n.deadhead_miles for n in best) == pytest.approx(
+        min(r.deadhead_miles for r in results)
+    )
+
+    best2, results2 = multi_start(c, m, starts=7, workers=2, seed=3)
+    assert [r.deadhead_miles for r in results2] == pytest.approx(
+        [r.deadhead_miles for r in results]
+    )
+    assert [n.ids for n in best2] == [n.ids for n in best]
@@ -0,0 +1,57 @@
+import csv
+import json
+from itertools import chain
+
+import pytest
+
+from routeopt.core.output import iter_routes, plan_meta, routes_to_json, write_plan
+from routeopt.core.replan import with_frozen
+from routeopt.core.solver import greedy_plan
+
+
+@pytest.mark.parametrize("empty", [False, True])
+def test_streamed_json_is_identical_to_dumps(tmp_path, empty, random_problem):
+    c, blocks, m = random_problem(30, mileposts=True)
+    nights = greedy_plan(c, blocks, m)
+    if empty:
+        nights = []
+    path = tmp_path / "routes.json"
+    write_plan(path, plan_meta(c, nights, m), iter_routes(c, nights, m))
+    assert path.read_text() == json.dumps(routes_to_json(c, nights, m), indent=2)
+
+
+def test_compact_ndjson_and_csv_hold_the_same_plan(tmp_path, random_problem):
+    c, blocks, m = random_problem(30, mileposts=True)
+    nights = greedy_plan(c, blocks, m)
+    plan = routes_to_json(c, nights, m)
+    assert len(plan["routes"]) > 1
+
+    write_plan(tmp_path / "p.json", plan["meta"], iter(plan["routes"]), "compact")
+    assert json.loads((tmp_path / "p.json").read_text()) == plan
+
+    write_plan(tmp_path / "p.ndjson", plan["meta"], iter(plan["routes"]), "ndjson")
+    lines = (tmp_path / "p.ndjson").read_text().splitlines()
+    assert json.loads(lines[0]) == {"meta": plan["meta"]}
+    assert [json.loads(line) for line in lines[1:]] == plan["routes"]
+
+    write_plan(tmp_path / "p.csv", plan["meta"], iter(plan["routes"]), "csv")
+    with (tmp_path / "p.csv").open(newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == sum(len(r["steps"]) for r in plan["routes"])
+    served = [r["roadway_id"] for r in rows if r["type"] == "service_block"]
+    assert sorted(served) == sorted(f"R{i}" for i in range(30))
+
+    with pytest.raises(ValueError):
+        write_plan(tmp_path / "p.x", plan["meta"], [], "xml")
+
+
+def test_streamed_frozen_prefix_matches_with_frozen(tmp_path, random_problem):
+    c, blocks, m = random_problem(30, mileposts=True)
+    nights = greedy_plan(c, blocks, m)
+    frozen = routes_to_json(c, nights[:2], m)["routes"]
+    want = with_frozen(routes_to_json(c, nights[2:], m), json.loads(json.dumps(frozen)))
+
+    head = with_frozen({"meta": plan_meta(c, nights[2:], m), "routes": []}, frozen)
+    routes = chain(head["routes"], iter_routes(c, nights[2:], m, start=len(frozen) + 1))
+    write_plan(tmp_path / "r.json", head["meta"], routes)
+    assert json.loads((tmp_path / "r.json").read_text()) == want
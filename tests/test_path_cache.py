@@ -0,0 +1,107 @@
+import sqlite3
+from pathlib import Path
+
+import networkx as nx
+
+from routeopt.core import path_cache
+from routeopt.core.path_cache import PathCache, graph_fingerprint
+
+
+def test_path_cache_persists_across_instances(tmp_path: Path):
+    db = tmp_path / "paths.sqlite"
+    c1 = PathCache(db, "fp1", batch_size=2)
+    assert c1.get(1, 2) is None
+    c1.put(1, 2, (1.5, 0.05))
+    c1.close()
+
+    c2 = PathCache(db, "fp1")
+    assert c2.get(1, 2) == (1.5, 0.05)
+    assert c2.get(1, 2) == (1.5, 0.05)
+    assert c2.stats() == {
+        "hits": 2,
+        "hits_memory": 1,
+        "hits_disk": 1,
+        "misses": 0,
+        "hit_rate": 1.0,
+    }
+    c2.close()
+
+    # Entries from another graph fingerprint are never served.
+    c3 = PathCache(db, "fp2")
+    assert c3.get(1, 2) is None
+    c3.close()
+    # ... nor dropped: one file holds every graph's paths.
+    c4 = PathCache(db, "fp1")
+    assert c4.get(1, 2) == (1.5, 0.05)
+    c4.close()
+
+
+def test_path_cache_evicts_least_recently_used_rows(tmp_path: Path, monkeypatch):
+    db = tmp_path / "paths.sqlite"
+    clock = iter(range(100, 200))
+    monkeypatch.setattr(path_cache, "_now", lambda: next(clock))
+    c = PathCache(db, "a", max_rows=3)
+    c.put(1, 2, (1.0, 0.1))
+    c.put_row(3, {4: (2.0, 0.2)})
+    c.close()
+    c = PathCache(db, "a", max_rows=3)
+    assert c.get(1, 2) == (1.0, 0.1)  # read again: now newer than 3 -> 4
+    c.close()
+
+    # Another graph's rows push the file over max_rows; the stalest row goes.
+    c = PathCache(db, "b", max_rows=3)
+    c.put_row(6, {7: (4.0, 0.4), 8: (5.0, 0.5)})
+    c.close()
+    c = PathCache(db, "a")
+    assert c.get_row(3, [4]) is None
+    assert c.get(1, 2) == (1.0, 0.1)
+    c.close()
+    assert PathCache(db, "b").get_row(6, [7, 8]) == {7: (4.0, 0.4), 8: (5.0, 0.5)}
+
+
+def test_path_cache_memory_tier_is_bounded():
+    c = PathCache(None, "fp", memory_size=2)
+    for i in range(3):
+        c.put(i, i + 1, (float(i), 0.0))
+    assert c.get(0, 1) is None
+    assert c.get(2, 3) == (2.0, 0.0)
+
+
+def test_graph_fingerprint_changes_with_edges_and_speed():
+    g = nx.MultiDiGraph()
+    g.add_edge(1, 2, length=100.0)
+    fp = graph_fingerprint(g, 45.0)
+    assert graph_fingerprint(g, 30.0) != fp
+    g.add_edge(2, 1, length=100.0)
+    assert graph_fingerprint(g, 45.0) != fp
+
+
+def test_graph_fingerprint_sees_edge_lengths_not_just_totals():
+    a, b = nx.MultiDiGraph(), nx.MultiDiGraph()
+    a.add_edge(1, 2, length=100.0)
+    a.add_edge(2, 3, length=100.0)
+    a.add_edge(1, 3, length=300.0)
+    # Same counts, node range and total length; shortest 1 -> 3 is 100 instead of 200.
+    b.add_edge(1, 2, length=200.0)
+    b.add_edge(2, 3, length=200.0)
+    b.add_edge(1, 3, length=100.0)
+    assert graph_fingerprint(a, 45.0) != graph_fingerprint(b, 45.0)
+
+    same = nx.MultiDiGraph()
+    for u, v, d in reversed(list(a.edges(data=True))):
+        same.add_edge(u, v, **d)
+    assert graph_fingerprint(same, 45.0) == graph_fingerprint(a, 45.0)
+
+
+def test_path_cache_opens_files_without_access_times(tmp_path: Path):
+    db = tmp_path / "paths.sqlite"
+    with sqlite3.connect(db) as con:
+        con.execute(
+            "CREATE TABLE paths (fp TEXT NOT NULL, a INTEGER NOT NULL, b INTEGER NOT NULL, "
+            "dist REAL NOT NULL, time REAL NOT NULL, PRIMARY KEY (fp, a, b)) WITHOUT ROWID"
+        )
+        con.execute("INSERT INTO paths VALUES ('fp', 1, 2, 1.5, 0.05)")
+    c = PathCache(db, "fp")
+    assert c.get(1, 2) == (1.5, 0.05)
+    c.put(2, 3, (1.0, 0.02))
+    c.close()
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from routeopt.core.bounds import gap
+from routeopt.core.matrix import build_matrix
+from routeopt.core.output import routes_to_json
+from routeopt.core.replan import (
+    parse_night_list,
+    pending_rows,
+    replan,
+    split_frozen,
+    with_frozen,
+)
+from routeopt.core.routing import EuclideanRouting
+from routeopt.core.solver import greedy_plan
+from routeopt.core.tasks import BlockTable, ServiceBlock
+from routeopt.models.constraints import Constraints
+from routeopt.utils.geo import LatLon
+
+DEPOT = LatLon(0.0, 0.0)
+
+
+def _blk(rid, lat, lon, miles, passes=1):
+    return ServiceBlock(
+        roadway_id=rid,
+        direction="A",
+        azimuth_deg=0.0,
+        passes_required=passes,
+        speed_limit_mph=30.0,
+        start=LatLon(lat, lon),
+        end=LatLon(lat + 0.01, lon),
+        service_distance_miles=miles,
+    )
+
+
+def _blocks(n=40, seed=3):
+    rng = random.Random(seed)
+    return [
+        _blk(f"R{i}", rng.uniform(-0.2, 0.2), rng.uniform(-0.2, 0.2), rng.uniform(0.5, 3.0))
+        for i in range(n)
+    ]
+
+
+def _setup(blocks):
+    c = Constraints.model_validate(
+        {"depot": {"lat": 0.0, "lon": 0.0}, "limits": {"max_hours_per_night": 3.0}}
+    )
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=45.0), DEPOT, blocks)
+    return c, m
+
+
+def _served(out):
+    return sorted(
+        s["roadway_id"] for r in out["routes"] for s in r["steps"] if s["type"] == "service_block"
+    )
+
+
+def test_parse_night_list():
+    assert parse_night_list("1-3, 7") == {1, 2, 3, 7}
+    assert parse_night_list(None) == set()
+    with pytest.raises(ValueError):
+        parse_night_list("3-1")
+
+
+def test_unchanged_input_reproduces_previous_plan():
+    blocks = _blocks()
+    c, m = _setup(blocks)
+    prev = routes_to_json(c, greedy_plan(c, blocks, m), m)
+    nights, st = replan(c, prev["routes"], m)
+    assert routes_to_json(c, nights, m) == prev
+    assert st.inserted_blocks == 0 and st.kept_blocks == len(blocks)
+
+
+def test_changes_are_inserted_and_untouched_nights_keep_their_order():
+    blocks = _blocks()
+    c, m = _setup(blocks)
+    prev = routes_to_json(c, greedy_plan(c, blocks, m), m)
+
+    new = [b for b in blocks if b.roadway_id != "R0"]  # removed
+    new = [_blk("R1", 0.05, 0.05, 1.0, passes=2) if b.roadway_id == "R1" else b for b in new]
+    new.append(_blk("NEW", 0.01, 0.01, 0.5))
+    c, m2 = _setup(new)
+    nights, st = replan(c, prev["routes"], m2)
+    out = routes_to_json(c, nights, m2)
+
+    assert (st.removed_blocks, st.changed_blocks, st.inserted_blocks) == (1, 1, 2)
+    assert _served(out) == sorted(b.roadway_id for b in new)
+    assert all(r["duration_hours"] <= 3.0 + 1e-9 for r in out["routes"])
+    touched = {"R0", "R1"}
+    for before in prev["routes"]:
+        ids = [s["roadway_id"] for s in before["steps"] if s["type"] == "service_block"]
+        if touched.isdisjoint(ids):
+            kept = [
+                [s["roadway_id"] for s in r["steps"] if s["type"] == "service_block"]
+                for r in out["routes"]
+            ]
+            # Untouched nights keep every block in order; insertions may add to them.
+            assert any([x for x in k if x in ids] == ids for k in kept)
+
+
+def test_frozen_nights_are_kept_verbatim_and_their_blocks_done():
+    blocks = _blocks()
+    c, m = _setup(blocks)
+    prev = routes_to_json(c, greedy_plan(c, blocks, m), m)
+    frozen, open_routes = split_frozen(prev["routes"], {1, 2})
+
+    # A frozen block changed after it was driven: it is still done.
+    first = next(s for s in frozen[0]["steps"] if s["type"] == "service_block")["roadway_id"]
+    new = [_blk(b.roadway_id, 0.1, 0.1, 9.0) if b.roadway_id == first else b for b in blocks]
+    table = BlockTable.from_blocks(new)
+    rows = pending_rows(table, frozen)
+    assert len(rows) == len(new) - sum(
+        1 for r in frozen for s in r["steps"] if s["type"] == "service_block"
+    )
+
+    c, m2 = _setup(table.take(rows))
+    nights, st = replan(c, open_routes, m2, reserved_nights=len(frozen))
+    pending = routes_to_json(c, nights, m2)["meta"]
+    out = with_frozen(routes_to_json(c, nights, m2), frozen)
+    assert out["routes"][:2] == frozen
+    meta = out["meta"]
+    assert meta["total_nights"] == len(nights) + 2
+    # Bounds and gap cover the frozen nights too, like the totals beside them.
+    frozen_dead = sum(r["deadhead_miles"] for r in frozen)
+    assert meta["lower_bound"]["nights"] == pending["lower_bound"]["nights"] + 2
+    assert meta["lower_bound"]["deadhead_miles"] == pytest.approx(
+        pending["lower_bound"]["deadhead_miles"] + frozen_dead, abs=1e-3
+    )
+    assert meta["deadhead_gap"] == pytest.approx(
+        gap(meta["total_deadhead_miles"], meta["lower_bound"]["deadhead_miles"]), abs=1e-4
+    )
+    assert _served(out) == sorted(b.roadway_id for b in new)
+    assert st.inserted_blocks == 0
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+from routeopt.server import PlanningService
+
+CONSTRAINTS = {"depot": {"lat": 28.0, "lon": -82.4}, "limits": {"max_hours_per_night": 4.0}}
+
+
+def _geojson(n=12):
+    feats = []
+    for i in range(n):
+        lon = -82.4 + 0.01 * i
+        feats.append(
+            {
+                "type": "Feature",
+                "properties": {"roadway_id": f"R{i}", "total_lanes": 2, "speed_limit": 45},
+                "geometry": {"type": "LineString", "coordinates": [[lon, 28.01], [lon, 28.02]]},
+            }
+        )
+    return {"type": "FeatureCollection", "features": feats}
+
+
+async def _http(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data)
+
+
+def test_plan_replan_evaluate_share_warm_caches():
+    async def run():
+        service = PlanningService(workers=1)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            req = {"constraints": CONSTRAINTS, "geojson": _geojson()}
+            status, first = await _http(port, "POST", "/plan", req)
+            assert status == 200
+            assert first["meta"]["server"]["matrix_cached"] is False
+
+            what_if = {**req, "constraints": {**CONSTRAINTS, "limits": {"max_hours_per_night": 2}}}
+            status, second = await _http(port, "POST", "/plan", what_if)
+            assert status == 200 and second["meta"]["server"]["matrix_cached"] is True
+            assert second["meta"]["total_nights"] >= first["meta"]["total_nights"]
+
+            status, ev = await _http(port, "POST", "/evaluate", {**what_if, "routes": first})
+            assert status == 200
+            assert ev["evaluation"]["unserved_blocks"] == 0
+            assert ev["evaluation"]["feasible"] == (
+                max(r["duration_hours"] for r in first["routes"]) <= 2
+            )
+
+            rp = {**req, "previous": first, "frozen": "1"}
+            status, again = await _http(port, "POST", "/replan", rp)
+            assert status == 200
+            assert again["routes"][0] == first["routes"][0]
+            assert again["replan"]["inserted_blocks"] == 0
+
+            status, health = await _http(port, "GET", "/health")
+            assert status == 200 and health["requests"] == 4 and health["table_hits"] == 3
+
+            status, err = await _http(port, "POST", "/plan", {"geojson": _geojson()})
+            assert status == 400 and "constraints" in err["error"]
+            # replan has no multi-start or LNS stage; these would be silently ignored.
+            bad = {**rp, "options": {"lns": True, "starts": 4, "seed": 1, "improve": True}}
+            status, err = await _http(port, "POST", "/replan", bad)
+            assert status == 400 and "lns, seed, starts" in err["error"]
+            status, _ = await _http(port, "POST", "/nope", {})
+            assert status == 404
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_requests_build_one_matrix():
+    async def run():
+        service = PlanningService(workers=1)
+        try:
+            req = {"constraints": CONSTRAINTS, "geojson": _geojson(30)}
+            outs = await asyncio.gather(*(service.handle("plan", req) for _ in range(4)))
+            assert len({json.dumps(o["routes"]) for o in outs}) == 1
+            assert service.stats["matrix_hits"] == 3
+            cached = sorted(o["meta"]["server"]["matrix_cached"] for o in outs)
+            assert cached == [False, True, True, True]
+        finally:
+            service.close()
+
+    asyncio.run(run())
+
+
+def test_unexpected_errors_get_a_500_reply():
+    async def run():
+        service = PlanningService(workers=1)
+
+        async def broken(op, req):
+            raise RuntimeError("osmnx is not installed")
+
+        service.handle = broken
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, err = await _http(port, "POST", "/plan", {"constraints": CONSTRAINTS})
+            assert status == 500 and "osmnx is not installed" in err["error"]
+            status, health = await _http(port, "GET", "/health")
+            assert status == 200
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    asyncio.run(run())
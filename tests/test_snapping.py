@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from routeopt.core.snapping import EdgeSnapper, angle_diff_deg
+
+
+def _divided_road():
+    # Eastbound carriageway (nodes 0 -> 1) slightly south of the westbound one (3 -> 2).
+    x = np.array([-82.50, -82.49, -82.50, -82.49])
+    y = np.array([28.0000, 28.0000, 28.0004, 28.0004])
+    tail = np.array([0, 3])
+    head = np.array([1, 2])
+    return EdgeSnapper(tail, head, x, y, k=2)
+
+
+def test_angle_diff_wraps():
+    assert angle_diff_deg(np.array([350.0]), np.array([10.0]))[0] == 20.0
+    assert angle_diff_deg(np.array([90.0]), np.array([270.0]))[0] == 180.0
+
+
+def test_snap_uses_heading_to_pick_carriageway():
+    pytest.importorskip("scipy")  # the cKDTree snapper
+    snap = _divided_road()
+    lat = np.array([28.0003, 28.0003, 28.0001])
+    lon = np.array([-82.4990, -82.4990, -82.4990])
+    heading = np.array([90.0, np.nan, 270.0])
+
+    nodes = snap.snap(lat, lon, heading)
+    # Closer to the westbound edge, but heading east: stays on the eastbound one.
+    assert nodes[0] in (0, 1)
+    # No heading: plain nearest edge.
+    assert nodes[1] in (2, 3)
+    assert nodes[2] in (2, 3)
+    # Snaps to the nearer end of the chosen edge.
+    assert snap.snap(np.array([28.0]), np.array([-82.4999]))[0] == 0
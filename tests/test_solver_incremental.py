@@ -0,0 +1,36 @@
+import pytest
+
+from routeopt.core.solver import (
+    estimate_night_deadhead,
+    estimate_night_service,
+    greedy_plan,
+    insertion_delta,
+    service_table,
+)
+
+
+def test_insertion_delta_matches_full_rewalk(random_problem):
+    _, _, m = random_problem(5, 0)
+    ids = [0, 1, 2, 3]
+    before = estimate_night_deadhead(m, ids)
+    for pos in range(len(ids) + 1):
+        d_mi, d_h = insertion_delta(m, ids, pos, 4)
+        after = estimate_night_deadhead(m, ids[:pos] + [4] + ids[pos:])
+        assert before.distance_miles + d_mi == pytest.approx(after.distance_miles)
+        assert before.duration_hours + d_h == pytest.approx(after.duration_hours)
+
+
+def test_greedy_cached_night_totals_match_recomputed(random_problem):
+    c, blocks, m = random_problem(40, 3, max_hours=4.0)
+    c.loopback.mode = "routing"
+    nights = greedy_plan(c, blocks, m)
+
+    assert sorted(k for n in nights for k in n.ids) == list(range(len(blocks)))
+    table = service_table(c, m)
+    for night in nights:
+        dead = estimate_night_deadhead(m, night.ids)
+        svc = estimate_night_service(table, night.ids)
+        assert night.deadhead_miles == pytest.approx(dead.distance_miles)
+        assert night.deadhead_hours == pytest.approx(dead.duration_hours)
+        assert night.service_hours == pytest.approx(svc.duration_hours)
+        assert night.hours <= c.limits.max_hours_per_night + 1e-9
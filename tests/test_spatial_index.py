@@ -0,0 +1,30 @@
+import numpy as np
+
+from routeopt.core.spatial import GridIndex, project_miles
+from routeopt.models.constraints import Constraints
+
+
+def test_grid_index_nearest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat = 28.0 + rng.uniform(-0.5, 0.5, 500)
+    lon = -82.0 + rng.uniform(-0.5, 0.5, 500)
+    idx = GridIndex(lat, lon)
+    x, y = project_miles(lat, lon, float(lat.mean()))
+
+    for _ in range(50):
+        qlat, qlon = 28.0 + rng.uniform(-0.8, 0.8), -82.0 + rng.uniform(-0.8, 0.8)
+        got = idx.nearest(qlat, qlon, 7)
+        (px,), (py,) = project_miles(np.array([qlat]), np.array([qlon]), float(lat.mean()))
+        d2 = (x - px) ** 2 + (y - py) ** 2
+        assert np.allclose(d2[got], np.sort(d2)[:7])
+
+
+def test_grid_index_degenerate_points_far_probe():
+    idx = GridIndex(np.full(20, 28.0), np.full(20, -82.0))
+    assert len(idx.nearest(29.0, -81.0, 3)) == 3
+
+
+def test_search_defaults_prune_with_neighbors():
+    c = Constraints.model_validate({"depot": {"lat": 0.0, "lon": 0.0}})
+    assert c.search.neighbors_k > 0
+    assert c.search.exhaustive is False
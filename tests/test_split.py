@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from routeopt.core.matrix import build_matrix
+from routeopt.core.routing import EuclideanRouting
+from routeopt.core.solver import greedy_plan
+from routeopt.core.split import cut_segment, split_segments
+from routeopt.core.tasks import build_block_table, linestring_length_miles
+from routeopt.models.constraints import Constraints
+from routeopt.models.network import Segment
+from routeopt.utils.geo import LatLon
+
+
+def _corridor(miles_north=60.0, lanes=6):
+    # Straight two-way corridor heading north from near the depot.
+    lat1 = 28.0 + miles_north / 69.0
+    coords = np.column_stack((np.full(7, -82.4), np.linspace(28.0, lat1, 7)))
+    return Segment("I75", 100.0, 100.0 + miles_north, lanes, 60.0, False, coords)
+
+
+def test_cut_segment_keeps_length_and_milepost_subranges():
+    seg = _corridor(120.0)
+    parts = cut_segment(seg, 4)
+    total = linestring_length_miles(seg.coords)
+    lengths = [linestring_length_miles(p.coords) for p in parts]
+    assert sum(lengths) == pytest.approx(total, rel=1e-9)
+    assert lengths == pytest.approx([total / 4] * 4, rel=1e-6)
+    assert [(p.bmp, p.emp) for p in parts] == pytest.approx(
+        [(100.0, 130.0), (130.0, 160.0), (160.0, 190.0), (190.0, 220.0)]
+    )
+    assert np.array_equal(parts[0].coords[0], seg.coords[0])
+    assert np.array_equal(parts[-1].coords[-1], seg.coords[-1])
+
+
+def test_long_corridor_is_split_into_feasible_nights():
+    c = Constraints.model_validate(
+        {
+            "depot": {"lat": 28.0, "lon": -82.4},
+            "limits": {"max_hours_per_night": 4.0},
+            "split": {"circuity": 1.0},
+        }
+    )
+    seg = _corridor()
+    blocks = build_block_table(split_segments([seg], c))
+    assert len(blocks) > 2
+    depot = LatLon(28.0, -82.4)
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=45.0), depot, blocks)
+    nights = greedy_plan(c, blocks, m)
+    assert all(n.hours <= 4.0 + 1e-9 for n in nights)
+
+    c.split.enabled = False
+    blocks = build_block_table(split_segments([seg], c))
+    m = build_matrix(EuclideanRouting(deadhead_speed_mph=45.0), depot, blocks)
+    with pytest.raises(ValueError, match="Single service block"):
+        greedy_plan(c, blocks, m)
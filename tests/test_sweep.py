@@ -0,0 +1,78 @@
+import pytest
+
+from routeopt.bench import CENTER, synthetic_network, write_geojson
+from routeopt.core.ingest import iter_segments_geojson
+from routeopt.core.matrix import build_matrix
+from routeopt.core.solver import build_engine, greedy_plan
+from routeopt.core.split import split_segments
+from routeopt.core.tasks import build_block_table
+from routeopt.models.constraints import Constraints
+from routeopt.sweep import format_table, parse_vary, result_rows, scenarios, sweep
+from routeopt.utils.geo import LatLon
+
+
+def _base():
+    return Constraints.model_validate(
+        {"depot": {"lat": CENTER[0], "lon": CENTER[1]}, "limits": {"max_nights": 1000}}
+    )
+
+
+def _direct(path, c):
+    blocks = build_block_table(split_segments(iter_segments_geojson(path, default_oneway=False), c))
+    depot = LatLon(c.depot.lat, c.depot.lon)
+    m = build_matrix(build_engine(c, depot, blocks), depot, blocks)
+    return greedy_plan(c, blocks, m)
+
+
+def test_parse_vary_and_unknown_paths():
+    assert parse_vary("limits.max_hours_per_night=3.5, 4") == (
+        "limits.max_hours_per_night",
+        [3.5, 4],
+    )
+    assert parse_vary("split.enabled=false,true")[1] == [False, True]
+    with pytest.raises(ValueError):
+        parse_vary("limits.max_hours_per_night")
+    with pytest.raises(ValueError, match="Unknown constraint"):
+        scenarios(_base(), [("limits.max_hour", [1])])
+    with pytest.raises(ValueError, match="section"):
+        scenarios(_base(), [("limits", [1])])
+    runs = scenarios(_base(), [("limits.max_hours_per_night", [3, 4]), ("search.neighbors_k", [8])])
+    assert [r.values for r in runs] == [
+        {"limits.max_hours_per_night": 3, "search.neighbors_k": 8},
+        {"limits.max_hours_per_night": 4, "search.neighbors_k": 8},
+    ]
+    assert runs[0].constraints.limits.max_hours_per_night == 3.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_shares_one_matrix_and_matches_separate_plans(tmp_path, workers):
+    path = write_geojson(synthetic_network("grid", 100), tmp_path / "grid.geojson")
+    vary = [
+        ("limits.max_hours_per_night", [3.0, 4.0]),
+        ("speed.deadhead_speed_mph", [30.0, 45.0]),
+        ("speed.service_factor", [0.9, 1.0]),
+    ]
+    stats = sweep(str(path), _base(), vary, workers=workers, plans_dir=str(tmp_path / "plans"))
+    assert stats.scenarios == 8
+    assert (stats.segment_reads, stats.block_tables, stats.matrices) == (1, 1, 1)
+    assert len(list((tmp_path / "plans").glob("scenario_*.json"))) == 8
+
+    for run, res in zip(scenarios(_base(), vary), stats.results):
+        nights = _direct(str(path), run.constraints)
+        assert res.error is None
+        assert res.nights == len(nights)
+        assert res.deadhead_miles == pytest.approx(sum(n.deadhead_miles for n in nights))
+        assert res.deadhead_hours == pytest.approx(sum(n.deadhead_hours for n in nights))
+
+    rows = result_rows(stats)
+    assert rows[0]["speed.service_factor"] == 0.9
+    assert "error" not in format_table(rows).splitlines()[0]
+
+
+def test_infeasible_scenarios_are_reported(tmp_path):
+    path = write_geojson(synthetic_network("grid", 100), tmp_path / "grid.geojson")
+    stats = sweep(str(path), _base(), [("limits.max_nights", [1, 1000])], workers=1)
+    bad, ok = result_rows(stats)
+    assert "max_nights" in bad["error"] and bad["nights"] is None
+    assert ok["error"] == "" and ok["nights"] > 1
+    assert format_table([bad, ok]).splitlines()[0].endswith("error")